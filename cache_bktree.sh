@@ -1,4 +1,8 @@
 #!/bin/bash
+# 生成所有 BK-TREE 的二进制树文件，参数直接传给 scripts/cache_all_bk_trees.py。
+# 设置了 BKTREE_NEXUS_URL 时先从 nexus 下载已有的树文件，生成以后再上传新生成的树文件；
+# 没有设置时完全在本地生成，例如：
+#   ./cache_bktree.sh --tree_dir /opt/bk_tree --check
 
 DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" >/dev/null 2>&1 && pwd)"
 
@@ -6,42 +10,51 @@ BKROOT="${DIR}/ocr_structuring/core/utils/bk_tree"
 BKDATA="${BKROOT}/data"
 BKCACHE="${BKROOT}/.tree"
 
-declare -a sources_md5
-declare -a cached_md5
-
-for filepath in "${BKDATA}"/*.txt; do
-    sources_md5+=("$(md5sum -b "${filepath}" | awk '{print $1}')")
+# 与 scripts/cache_all_bk_trees.py 的 --tree_dir 参数保持一致
+args=("$@")
+for ((i = 0; i < ${#args[@]}; i++)); do
+    if [[ "${args[$i]}" == "--tree_dir" ]]; then
+        BKCACHE="${args[$((i + 1))]}"
+    fi
 done
 
 mkdir -p "${BKCACHE}"
-for md5 in "${sources_md5[@]}"; do
-    curl -sSL --fail \
-        -o "${BKCACHE}/${md5}.json" \
-        "https://nexus-h.tianrang-inc.com/repository/assets/tianshi/cache/ocr-structuring/bktree/${md5}.json"
-    
-    ret=$?
-    if [[ $ret == 0 ]]; then
-        cached_md5+=("${md5}")
-        echo "Cache HIT: ${md5}.json"
-    elif [[ $ret == 22 ]]; then
-        echo "Cache MISS: ${md5}.json"
-        rm -rf "${BKCACHE}/${md5}.json"
-    fi
-done
+
+if [[ -n "${BKTREE_NEXUS_URL}" ]]; then
+    for filepath in "${BKDATA}"/*.txt; do
+        md5="$(md5sum -b "${filepath}" | awk '{print $1}')"
+        if [[ -f "${BKCACHE}/${md5}.bkt" ]]; then
+            continue
+        fi
+        # 先下载到临时文件，避免其它进程读到下载了一半的文件
+        curl -sSL --fail -o "${BKCACHE}/${md5}.bkt.download" "${BKTREE_NEXUS_URL}/${md5}.bkt"
+
+        ret=$?
+        if [[ $ret == 0 ]]; then
+            mv "${BKCACHE}/${md5}.bkt.download" "${BKCACHE}/${md5}.bkt"
+            echo "Cache HIT: ${md5}.bkt"
+        else
+            echo "Cache MISS: ${md5}.bkt"
+            rm -f "${BKCACHE}/${md5}.bkt.download"
+        fi
+    done
+fi
 
 sleep 3
 exec_time="$(date '+%s')"
 sleep 3
 
-PYTHONPATH="${DIR}" python scripts/cache_all_bk_trees.py
-
-while IFS= read -r -d '' filepath
-do
-    echo "Uploading $filepath"
-    curl -sSL --fail --user admin:admin123 \
-        --upload-file "${filepath}" \
-        "https://nexus-h.tianrang-inc.com/repository/assets/tianshi/cache/ocr-structuring/bktree/$(basename "${filepath}")" ||
-        {
-            echo "Cannot upload asset: ${filepath}"
-        }
-done < <(find "${BKCACHE}" -type f -name '*.json' -newermt "@${exec_time}" -print0)
+PYTHONPATH="${DIR}" python scripts/cache_all_bk_trees.py "$@" || exit $?
+
+if [[ -n "${BKTREE_NEXUS_URL}" ]]; then
+    while IFS= read -r -d '' filepath
+    do
+        echo "Uploading $filepath"
+        curl -sSL --fail --user "${BKTREE_NEXUS_USER:-admin:admin123}" \
+            --upload-file "${filepath}" \
+            "${BKTREE_NEXUS_URL}/$(basename "${filepath}")" ||
+            {
+                echo "Cannot upload asset: ${filepath}"
+            }
+    done < <(find "${BKCACHE}" -type f -name '*.bkt' -newermt "@${exec_time}" -print0)
+fi
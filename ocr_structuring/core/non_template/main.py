@@ -1,4 +1,5 @@
 import pkgutil
+import threading
 import numpy as np
 from importlib import import_module
 from typing import Dict, List
@@ -16,11 +17,14 @@ class NoneTemplateStructuring:
         for (_, name, _) in pkgutil.iter_modules([PROCESSOR_DIR]):
             import_module('ocr_structuring.core.non_template.processor.' + name)
         self.processors = {}
+        # 非模板的 processor 会在实例上保存单次请求的中间结果（例如 debug_data），同一个 processor 同一时间只处理一个请求
+        self.locks = {}
 
         all_class_names = {}
         for processor_name, processor_class in BaseNonTemplate.subclasses.items():
             processor = processor_class(debug_data)
             self.processors[processor_name] = processor
+            self.locks[processor_name] = threading.Lock()
 
             for class_name in processor.supported_class_names():
                 if class_name in all_class_names:
@@ -32,13 +36,14 @@ class NoneTemplateStructuring:
         if class_name not in self.supported_class_names():
             raise NotImplementedError(f'class_name {class_name} is not implemented in non template structuring')
 
-        for processor in self.processors.values():
+        for processor_name, processor in self.processors.items():
             if class_name in processor.supported_class_names():
-                processor.debug_data = debug_data
-                if request is None:
-                    return processor.process(node_items, img, class_name)
-                else:
-                    return processor.process(node_items, img, class_name, request=request)
+                with self.locks[processor_name]:
+                    processor.debug_data = debug_data
+                    if request is None:
+                        return processor.process(node_items, img, class_name)
+                    else:
+                        return processor.process(node_items, img, class_name, request=request)
 
     def supported_class_names(self) -> List[str]:
         names = []
@@ -8,7 +8,7 @@ import pandas as pd
 
 from ocr_structuring.core.non_template.utils.bol_utils.table_items.table_handler.auto_header_handler import \
     AutoHeadFinder
-from ocr_structuring.debugger import variables
+from ocr_structuring.core.utils.request_context import get_request_context
 from .element_handler import ElementGroup
 from .field_handler import FieldGroup
 from .line_handler import LineGroup
@@ -65,7 +65,7 @@ class TableHandler():
         viz_boxes(boxes, img, texts=texts,
                   save_path=os.path.join(self.debug_path, 'viz_header.jpg'),
                   text_color=(0, 0, 255))
-        variables.add_group('header', 'header', raw_data)
+        get_request_context().variables.add_group('header', 'header', raw_data)
 
     def viz_group(self, node_info, node_items, img, key, save_name):
         if self.debug_path is None:
@@ -94,7 +94,7 @@ class TableHandler():
             bbox = np.array(bbox)
             img = viz_boxes(bbox, img, color=color_list[i % len(color_list)], show_detail=False)
         cv2.imwrite(os.path.join(self.debug_path, 'viz_{}.jpg'.format(save_name)), img)
-        variables.add_group(save_name, save_name, raw_data)
+        get_request_context().variables.add_group(save_name, save_name, raw_data)
 
     def viz_blocks_in_row(self, blocks, img):
         if self.debug_path is None:
@@ -119,7 +119,7 @@ class TableHandler():
                 img = viz_boxes(bbox, img, texts=text, color=color_list[count % len(color_list)], show_detail=False)
                 raw_data.append([text, *field_info.bbox])
 
-        variables.add_group('block', 'block', raw_data)
+        get_request_context().variables.add_group('block', 'block', raw_data)
         cv2.imwrite(os.path.join(self.debug_path, 'viz_block.jpg'), img)
 
     def filter_nodes_by_content(self, node_items):
@@ -6,7 +6,9 @@ from .multi_img.main import MultiImgStructuring
 from .template.main import TemplateStructuring
 from .template.tp_node_item import TpNodeItem
 from .utils.debug_data import DebugData
-from ..debugger import variables
+from .utils.lazy_image import LazyImage
+from .utils.request_context import RequestContext, get_request_context
+from ..utils import metrics
 
 
 class Structuring:
@@ -21,17 +23,26 @@ class Structuring:
         self.multi_img = MultiImgStructuring(self.template, self.non_template)
 
     def process(self, raw_data: List[List], img: np.ndarray, class_name: str, ltrb=True,
-                debug_data: DebugData = None):
+                debug_data: DebugData = None, context: RequestContext = None):
         """
         :param raw_data: [text, x1, y1, x2, y2, x3, y3, x4, y4, angle, label, *scores]
-        :param img: BGR
+        :param img: BGR ndarray 或者 LazyImage，模板结构化直接使用 LazyImage，在需要像素时才解码
         :param class_name:
+        :param context: 当前请求的上下文，为 None 时使用当前线程激活的 context
         :return:
         """
+        if context is None:
+            context = get_request_context()
+        context.class_name = class_name
+
         if class_name in self.non_template.supported_class_names():
             if debug_data:
                 debug_data.is_template = False
 
+            # 非模板的 processor 会直接把图片传给 cv2，这里先解码
+            if isinstance(img, LazyImage):
+                img = img.image
+
             node_item_class = NodeItem
             process_func = self.non_template.process
         elif self.template and class_name in TemplateStructuring.supported_class_names():
@@ -43,12 +54,13 @@ class Structuring:
         else:
             raise NotImplementedError(f'class_name [{class_name}] is not supported')
 
-        node_items = {}
-        for it in raw_data:
-            node = node_item_class(it, ltrb)
-            node_items[node.uid] = node
+        with metrics.stage_timer(metrics.STAGE_NODE_ITEM, class_name=class_name):
+            node_items = {}
+            for it in raw_data:
+                node = node_item_class(it, ltrb)
+                node_items[node.uid] = node
 
-        variables.add_group('raw data', 'raw data', [item.raw_node for item in node_items.values()])
+        context.variables.add_group('raw data', 'raw data', [item.raw_node for item in node_items.values()])
 
         return process_func(node_items, img, class_name, debug_data=debug_data)
 
@@ -59,6 +71,8 @@ class Structuring:
         if class_name not in self.multi_img.supported_class_names():
             raise NotImplementedError(f'class_name [{class_name}] is not supported')
 
+        images = [img.image if isinstance(img, LazyImage) else img for img in images]
+
         node_items_list = []
         for raw_data in raw_datas:
             node_items = {}
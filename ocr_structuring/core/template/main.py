@@ -1,52 +1,106 @@
 import os
 import pkgutil
+import threading
+import time
+from collections import defaultdict, namedtuple
 import numpy as np
 from pathlib import Path
 from typing import Dict, List
 from importlib import import_module
 
-from ocr_structuring.debugger import variables
+from ocr_structuring.settings import MyConfig
 from ocr_structuring.utils.logging import logger
 from .loader import PARSER_DIR
 from .parser_base import ParseBase
 from .loader import load_tmpl_conf
+from . import plan
 from .tp_node_item import TpNodeItem
 from .matcher import TemplateMatcher
 from ..utils.debug_data import DebugData
+from ..utils.lru_cache import LRUCache
+from ..utils.request_context import check_cancelled
 from .matcher.above_offset import ABOVE_OFFSET_METHOD_IOU
 
 CURRENT_DIR = os.path.abspath(os.path.dirname(__file__))
 CONFIG_DIR = Path(os.path.join(CURRENT_DIR, "config"))
 
 
+def import_parsers():
+    """
+    动态加载 parser 目录下的所有解析器，导入时注册到 ParseBase.subclasses
+    """
+    for (_, name, _) in pkgutil.iter_modules([PARSER_DIR]):
+        import_module("ocr_structuring.core.template.parser." + name)
+
+
+Template = namedtuple('Template', 'conf parser matcher')
+
+
 class TemplateStructuring:
-    def __init__(self, class_name=None):
+    def __init__(self, class_name=None, preload: List[str] = None, cache_size: int = None):
+        """
+        :param class_name: 为 None 时支持所有模板，否则只支持 class_name 对应的模板（调试用）
+        :param preload: 启动时加载的模板，['all'] 表示全部加载，默认为 TEMPLATE_PRELOAD
+        :param cache_size: 最多常驻内存的模板个数，0 表示不限制，默认为 TEMPLATE_CACHE_SIZE
+        """
         # 动态加载
-        for (_, name, _) in pkgutil.iter_modules([PARSER_DIR]):
-            import_module("ocr_structuring.core.template.parser." + name)
+        import_parsers()
 
-        self.confs = {}
-        self.parsers = {}
-        self.matchers = {}
+        cfg = MyConfig()
+        self.plan_dir = cfg.template_plan_dir.value or None
 
-        if class_name is None:  # 生产逻辑，加载所有模板
-            subclasses = ParseBase.subclasses
+        if class_name is None:  # 生产逻辑，模板在第一次使用时加载
+            self.subclasses = ParseBase.subclasses
+            if preload is None:
+                preload = [it.strip() for it in cfg.template_preload.value.split(',') if it.strip()]
+            if cache_size is None:
+                cache_size = cfg.template_cache_size.value
         else:  # 调试逻辑，只加载class_name对应模板
-            subclasses = {class_name: ParseBase.subclasses[class_name]}
+            self.subclasses = {class_name: ParseBase.subclasses[class_name]}
+            preload = [class_name]
 
-        for name, parse_class in subclasses.items():
-            conf = self.load_conf(CONFIG_DIR, name)
-            conf['is_tp_conf'] = self.is_tp_conf(conf)
-            self.confs[name] = conf
-            self.parsers[name] = parse_class(name, conf)
-            self.matchers[name] = TemplateMatcher(conf)
+        if preload == ['all']:
+            preload = sorted(self.subclasses.keys())
+        if cache_size and len(preload) > cache_size:
+            logger.warning(f'TEMPLATE_PRELOAD has {len(preload)} templates, more than TEMPLATE_CACHE_SIZE {cache_size}')
+
+        self.templates = LRUCache(cache_size or max(len(self.subclasses), 1))
+        # 每个模板一个锁，同一个模板只加载一次，不同的模板可以同时加载
+        self._load_locks = defaultdict(threading.Lock)
+        self._load_locks_lock = threading.Lock()
+
+        for name in preload:
+            self.get_template(name)
+
+    def get_template(self, class_name: str) -> Template:
+        """
+        获取模板的配置、解析器和 TemplateMatcher，没有加载过或者已经被淘汰时加载
+        """
+        template = self.templates.get(class_name)
+        if template is not None:
+            return template
+
+        with self._load_locks_lock:
+            lock = self._load_locks[class_name]
+
+        with lock:
+            template = self.templates.get(class_name)
+            if template is None:
+                template = self.load_template(class_name)
+                self.templates.put(class_name, template)
+        return template
+
+    def load_template(self, class_name: str) -> Template:
+        start = time.time()
+        parse_class = self.subclasses[class_name]
+        conf = plan.load_plan(class_name, parse_class, CONFIG_DIR, self.plan_dir).conf
+        template = Template(conf, parse_class(class_name, conf), TemplateMatcher(conf))
+        logger.info('Load template %s in %.3fs' % (class_name, time.time() - start))
+        return template
 
     @staticmethod
     def is_tp_conf(conf) -> bool:
-        version = conf.get('version', 1)
-        if version >= 2:
-            return True
-        return False
+        return plan.is_tp_conf(conf)
 
     @staticmethod
     def supported_class_names() -> List[str]:
@@ -69,12 +123,14 @@ class TemplateStructuring:
             value: StructureItem.to_dict 的结果
         """
         # 背景缩放和前景偏移
+        check_cancelled('matcher')
         before_count = len(node_items)
         # if class_name in ['shanghai_menzhen', 'shanghai_zhuyuan']:
         #     above_offset_method = above_offset.ABOVE_OFFSET_METHOD_ANCHOR
         # else:
         #     above_offset_method = above_offset.ABOVE_OFFSET_METHOD_IOU
-        self.matchers[class_name].process(node_items, img, debug_data=debug_data)
+        template = self.get_template(class_name)
+        template.matcher.process(node_items, img, debug_data=debug_data)
 
         after_count = len(node_items)
         if before_count != after_count:
@@ -91,7 +147,8 @@ class TemplateStructuring:
         #     raw_data.append(node.raw_node[0:9])
         # variables.add_group('detection', 'detection', raw_data)
 
-        result = self.parsers[class_name].parse_template(
+        check_cancelled('parse_template')
+        result = template.parser.parse_template(
             node_items, img, debug_data=debug_data
         )
         return result
@@ -102,8 +159,4 @@ class TemplateStructuring:
         :param name: 模板的名称
         :return:
         """
-        conf_path = config_dir / (name + ".yml")
-        if not conf_path.exists():
-            raise FileNotFoundError(f"Template yml config file not exist: {conf_path}")
-
-        return load_tmpl_conf(conf_path)
+        return load_tmpl_conf(plan.conf_path(config_dir, name))
@@ -5,6 +5,8 @@ import numpy as np
 from ocr_structuring import debugger
 from ...template.tp_node_item import TpNodeItem
 from ...utils.debug_data import DebugData
+from ...utils.request_context import get_request_context
+from ocr_structuring.utils import metrics
 from .above_offset import (
     AboveOffset,
     ABOVE_OFFSET_METHOD_IOU,
@@ -38,12 +40,14 @@ class TemplateMatcher:
         """
         setattr(self, "debug_data", debug_data)
         img_height, img_width = img.shape[:2]
-        self.bg_scale.eval(node_items, img_height, img_width, debug_data=debug_data)
+        with metrics.stage_timer(metrics.STAGE_BG_SCALE):
+            node_batch = self.bg_scale.eval(node_items, img_height, img_width, debug_data=debug_data)
 
         setattr(self.above_offset, "debug_data", debug_data)
-        self.above_offset.eval(
-            node_items, img_height, img_width, self.above_offset_method
-        )
+        with metrics.stage_timer(metrics.STAGE_ABOVE_OFFSET):
+            self.above_offset.eval(
+                node_items, img_height, img_width, self.above_offset_method, node_batch=node_batch
+            )
 
         def make_debug_raw_data():
             bg_raw_data = []
@@ -82,20 +86,21 @@ class TemplateMatcher:
                 bg_scale_raw_data,
                 above_offset_raw_data,
             ) = make_debug_raw_data()
+            variables = get_request_context().variables
             # debugger v2
-            debugger.variables.add_group(
+            variables.add_group(
                 "matchedBgBBoxes", "匹配到的背景框", bg_raw_data, "基于模板的方法匹配到的背景框"
             )
 
-            debugger.variables.add_group(
+            variables.add_group(
                 "matchedAboveBBoxes", "匹配到的前景偏移框", above_raw_data, "基于模板的方法匹配到的前景偏移框"
             )
 
-            debugger.variables.add_group2tpl(
+            variables.add_group2tpl(
                 "bgScaleResultBBoxes", "背景缩放的结果", bg_scale_raw_data, "基于模板的方法背景缩放的结果"
             )
 
-            debugger.variables.add_group2tpl(
+            variables.add_group2tpl(
                 "aboveOffsetResultBBoxes",
                 "前景偏移缩放的结果",
                 above_offset_raw_data,
@@ -115,11 +120,11 @@ class TemplateMatcher:
         """
         setattr(self, "debug_data", debug_data)
         img_height, img_width = img.shape[:2]
-        self.bg_scale.eval(node_items, img_height, img_width, debug_data=debug_data)
+        node_batch = self.bg_scale.eval(node_items, img_height, img_width, debug_data=debug_data)
 
         setattr(self.above_offset, "debug_data", debug_data)
         self.above_offset.eval(
-            node_items, img_height, img_width, self.above_offset_method
+            node_items, img_height, img_width, self.above_offset_method, node_batch=node_batch
         )
 
         def make_debug_raw_data():
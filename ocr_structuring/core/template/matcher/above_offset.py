@@ -1,11 +1,15 @@
 # encoding=utf-8
 
 import difflib
-import math
 import re
 from collections import defaultdict
 from typing import List, Dict, Set, Tuple
+
+import editdistance
+import numpy as np
+
 from ...utils.bbox import BBox
+from ...utils.node_batch import NodeBatch
 from ...template.tp_node_item import TpNodeItem
 from ocr_structuring.utils.logging import logger
 from .tp_conf_above_item import TpConfAboveItem
@@ -14,6 +18,8 @@ from ...utils.structuring_viz.viz_matcher_process import viz_above_item_offset_i
 
 ABOVE_OFFSET_METHOD_IOU = 'iou'
 ABOVE_OFFSET_METHOD_ANCHOR = 'anchor'
+# 内容相似度大于这个值的 node 才会参与 iou 的计算
+CONTENT_SIMILARITY_THRESH = 0.7
 
 
 class AboveOffset:
@@ -28,25 +34,29 @@ class AboveOffset:
     def eval(self, node_items: Dict[str, TpNodeItem],
              img_height: int,
              img_width: int,
-             offset_method: str = ABOVE_OFFSET_METHOD_IOU):
+             offset_method: str = ABOVE_OFFSET_METHOD_IOU,
+             node_batch: NodeBatch = None):
         """
         修改 node_item 中的 trans_box 坐标
         :param node_items:
         :param offset_method:
             - anchor
             - iou
+        :param node_batch: node_items 对应的 NodeBatch，为 None 时新建
         :return:
         """
         if len(self.above_items) == 0:
             return
 
-        ban_offset_uids = self.sign_ban_offset(node_items, self.above_items)
+        if node_batch is None:
+            node_batch = NodeBatch(node_items)
+        ban_offset_uids = self.sign_ban_offset(node_items, self.above_items, node_batch)
 
         if offset_method == ABOVE_OFFSET_METHOD_ANCHOR:
             new_offset = self.above_offset_by_anchor(node_items)
             logger.debug('Do above_offset by ANCHOR')
         elif offset_method == ABOVE_OFFSET_METHOD_IOU:
-            content_similarity = self.cal_content_similarity(node_items)
+            content_similarity = self.cal_content_similarity(node_items, ban_offset_uids)
             new_offset = self.iou_block_search(content_similarity, node_items, ban_offset_uids)
             logger.debug('Do above_offset by IOU')
         else:
@@ -54,12 +64,9 @@ class AboveOffset:
 
         logger.debug(f'above_offset value: {new_offset}')
 
-        for uid, node_item in node_items.items():
-            if uid in ban_offset_uids:
-                continue
-
-            bb = node_item.trans_bbox.transform((-new_offset[0], -new_offset[1]))
-            node_item.above_offset_bbox = bb
+        mask = np.array([uid not in ban_offset_uids for uid in node_batch.uids], dtype=bool)
+        rects = NodeBatch.transform(node_batch.trans_rects, (-new_offset[0], -new_offset[1]))
+        node_batch.set_above_offset_rects(rects, mask)
 
     def above_offset_by_anchor(self, node_items: Dict[str, TpNodeItem]):
         match_pairs = []
@@ -102,54 +109,58 @@ class AboveOffset:
         if len(match_pairs) == 0:
             return offset
 
-        search_step = 1
-        min_mean_dis = float('inf')
-        for offset_x in range(-width, width + 1, search_step):
-            for offset_y in range(-height, height + 1, search_step):
-                dis_sum = 0
-                for above_bbox, node_bbox in match_pairs:
-                    node_left_cx = node_bbox.left + offset_x
-                    node_left_cy = (node_bbox.top + node_bbox.bottom) / 2 + offset_y
-                    above_left_cx, above_left_cy = above_bbox.left, (above_bbox.top + above_bbox.bottom) / 2
-                    dis_sum += math.sqrt((node_left_cx - above_left_cx) ** 2 + (node_left_cy - above_left_cy) ** 2)
-                mean_dis = dis_sum / len(match_pairs)
-
-                if min_mean_dis > mean_dis:
-                    min_mean_dis = mean_dis
-                    offset = (offset_x, offset_y)
-
-        return offset
-
-    def sign_ban_offset(self, node_items: Dict[str, TpNodeItem], above_items: Dict[str, TpConfAboveItem]) -> Set[str]:
+        # 一次计算所有 offset 的距离，offset_xs 为第一维，argmin 返回第一个最小值，和逐个遍历时的结果一致
+        offset_xs = np.arange(-width, width + 1, dtype=np.float64)[:, np.newaxis]
+        offset_ys = np.arange(-height, height + 1, dtype=np.float64)[np.newaxis, :]
+        dis_sum = np.zeros((len(offset_xs), offset_ys.shape[1]))
+        for above_bbox, node_bbox in match_pairs:
+            node_left_cx = node_bbox.left + offset_xs
+            node_left_cy = (node_bbox.top + node_bbox.bottom) / 2 + offset_ys
+            above_left_cx, above_left_cy = above_bbox.left, (above_bbox.top + above_bbox.bottom) / 2
+            dis_sum += np.sqrt((node_left_cx - above_left_cx) ** 2 + (node_left_cy - above_left_cy) ** 2)
+        mean_dis = dis_sum / len(match_pairs)
+
+        x_idx, y_idx = np.unravel_index(np.argmin(mean_dis), mean_dis.shape)
+        return int(x_idx) - width, int(y_idx) - height
+
+    def sign_ban_offset(self, node_items: Dict[str, TpNodeItem], above_items: Dict[str, TpConfAboveItem],
+                        node_batch: NodeBatch = None) -> Set[str]:
         """
         返回位于 ban_offset 区域内不需要进行前景偏移的元素 uid
         """
-        res = []
-        for node_item in node_items.values():
-            if node_item.is_bg_item:
-                res.append(node_item.uid)
+        if node_batch is None:
+            node_batch = NodeBatch(node_items)
+
+        ban = np.array([it.is_bg_item for it in node_batch.nodes], dtype=bool)
+        # 进行这步时已经做过了背景缩放所以要用 node_item.trans_bbox
+        trans_rects = node_batch.trans_rects
+        for above_item in above_items.values():
+            if not above_item.is_ban_offset:
                 continue
 
-            for above_item in above_items.values():
-                if not above_item.is_ban_offset:
-                    continue
-
-                # 进行这步时已经做过了背景缩放所以要用 node_item.trans_bbox
-                # ioo 相交大于阈值认为这个区域不可以偏移
-                ioo = node_item.trans_bbox.cal_ioo(above_item.bbox)
-                if ioo > above_item.ioo_thresh:
-                    res.append(node_item.uid)
+            # ioo 相交大于阈值认为这个区域不可以偏移
+            ban |= NodeBatch.cal_ioo(trans_rects, above_item.bbox) > above_item.ioo_thresh
 
-        return set(res)
+        uids = node_batch.uids
+        return {uids[i] for i in np.flatnonzero(ban)}
 
-    def cal_content_similarity(self, node_items: Dict[str, TpNodeItem]) -> Dict[str, Dict[str, float]]:
+    def cal_content_similarity(self, node_items: Dict[str, TpNodeItem],
+                               ban_offset_uids: Set = None) -> Dict[str, Dict[str, float]]:
         """
         计算above element中的每一个元素和label的每一个元素的匹配程度conent_similarity[i][j]
+        只保留相似度大于 CONTENT_SIMILARITY_THRESH 的结果，其他的不会参与 offset 的计算
+        :param ban_offset_uids: 不能偏移的 node_item 不参与计算
         :return:
             Dict[above_item.uid, Dict[node_item.uid, similarity]]
             第一层 key 为 above_item.uid
             第二层 key 值为 node_item.uid
         """
+        ban_offset_uids = ban_offset_uids or set()
+        nodes = [it for it in node_items.values() if it.uid not in ban_offset_uids]
+        node_chars = [set(it.text) for it in nodes]
+        # 每个 node 的 SequenceMatcher 只需要对 node.text 建一次索引
+        matchers = [None] * len(nodes)
+
         content_similarity = defaultdict(dict)
         for above_item in self.above_items.values():
             contents = above_item.contents
@@ -157,26 +168,55 @@ class AboveOffset:
             if not isinstance(contents, list):
                 contents = [contents]
 
+            texts = []
             for content in contents:
                 if isinstance(content, dict):
                     content = content.get('text', None)
                     if content is None:
                         logger.warning(f"{above_item.item_name}'s content is a dict, but not set 'text' key")
                         continue
+                texts.append(content)
 
-                for node_item in node_items.values():
-                    seq = difflib.SequenceMatcher(None, content, node_item.text)
-                    similarity = seq.ratio()
-
-                    if above_item.regex:
-                        re_search_res = re.search(above_item.regex, node_item.text)
-                        if re_search_res is not None:
-                            similarity = max(similarity, 1.0)
+            if not texts:
+                continue
 
+            # 多个 content 时后面的结果会覆盖前面的，只需要计算最后一个
+            content = texts[-1]
+            content_chars = set(content)
+            for i, node_item in enumerate(nodes):
+                similarity = 0
+                if self._may_be_similar(content, content_chars, node_item.text, node_chars[i]):
+                    if matchers[i] is None:
+                        matchers[i] = difflib.SequenceMatcher(None, '', node_item.text)
+                    matchers[i].set_seq1(content)
+                    similarity = matchers[i].ratio()
+
+                if above_item.regex:
+                    re_search_res = above_item.regex_pattern.search(node_item.text)
+                    if re_search_res is not None:
+                        similarity = max(similarity, 1.0)
+
+                if similarity > CONTENT_SIMILARITY_THRESH:
                     content_similarity[above_item.uid][node_item.uid] = similarity
 
         return content_similarity
 
+    @staticmethod
+    def _may_be_similar(content: str, content_chars: Set[str], text: str, text_chars: Set[str]) -> bool:
+        """
+        用 difflib ratio 的上界快速排除不可能超过 CONTENT_SIMILARITY_THRESH 的 node，
+        ratio = 2 * M / T，M 不大于两个字符串的最长公共子序列长度
+        """
+        total = len(content) + len(text)
+        if total == 0:
+            return True
+        if content_chars.isdisjoint(text_chars):
+            return False
+        if 2 * min(len(content), len(text)) / total <= CONTENT_SIMILARITY_THRESH:
+            return False
+        # 最长公共子序列的长度不大于 (T - 编辑距离) / 2
+        return (total - editdistance.eval(content, text)) / total > CONTENT_SIMILARITY_THRESH
+
     def iou_block_search(self,
                          content_similarity: Dict[str, Dict[str, float]],
                          node_items: Dict[str, TpNodeItem],
@@ -189,53 +229,39 @@ class AboveOffset:
         for node_item in node_items.values():
             w = max(w, node_item.trans_bbox.right)
             h = max(h, node_item.trans_bbox.bottom)
-        # w，h 为所有的框的上限位置，为搜索的上届，做二分法搜索
+        # w，h 为所有的框的上限位置，为搜索的上届，由粗到细逐步缩小搜索范围
         now_offset_center = [0, 0]
         max_search_dis = max(w, h) / 6.0
         split_size = 10
 
-        record_of_all_best = None
+        # 先按照原来的搜索顺序生成每一轮的候选 offset，再一次性计算所有候选的得分
+        candidates = []
         while max_search_dis > 1:
             block_size = max_search_dis / split_size
             left_up_point = [v - (max_search_dis / 2.0) for v in now_offset_center]
-            new_center = [0, 0]
-            result_offset_center = [v for v in now_offset_center]
-            best_similarity_value = 0
-
-            for i in range(split_size):
-                for j in range(split_size):
-                    new_center[0] = left_up_point[0] + i * block_size
-                    new_center[1] = left_up_point[1] + j * block_size
-                    similarity_value, hit_num, hit_can_not_miss = self.cal_match_similarity_value(content_similarity,
-                                                                                                  node_items,
-                                                                                                  new_center,
-                                                                                                  ban_offset_uids)
-                    offset = [v for v in new_center]
-                    if not record_of_all_best:
-                        record_of_all_best = (hit_can_not_miss, hit_num, similarity_value, offset)
-                    else:
-                        # 现在里面已经有值了
-                        current = (hit_can_not_miss, hit_num, similarity_value, offset)
-                        if self.get_score_of_each_offest(current) > self.get_score_of_each_offest(record_of_all_best):
-                            record_of_all_best = current
-
-                    # 原先的处理逻辑
-                    # if similarity_value > best_similarity_value:
-                    #     best_similarity_value = similarity_value
-                    #     result_offset_center = [v for v in new_center]
-
-            #            now_offset_center = [v for v in result_offset_center]
+            steps = np.arange(split_size) * block_size
+            xs = np.repeat(left_up_point[0] + steps, split_size)
+            ys = np.tile(left_up_point[1] + steps, split_size)
+            candidates.append(np.stack([xs, ys], axis=1))
             max_search_dis = block_size * 2
 
-        # if self.exp_data:
-        #     self.exp_data.set_above_matched_idxes(best_label_node_idx_4_debug)
+        if not candidates:
+            raise ValueError('above_offset search range is too small: w=%s, h=%s' % (w, h))
+
+        offsets = np.concatenate(candidates)
+        sum_value, hit_num, hit_can_not_miss = self.cal_match_similarity_values(content_similarity,
+                                                                                node_items,
+                                                                                offsets,
+                                                                                ban_offset_uids)
+        scores = hit_can_not_miss * 10000 + hit_num * 100 + sum_value
+        # 只有得分严格更高时才会替换，所以取第一个最大值
+        best = int(np.argmax(scores))
         logger.debug('above offset with hit_can_not_miss :{} , with hit {}'.format(
-            record_of_all_best[0],
-            record_of_all_best[1]
+            int(hit_can_not_miss[best]),
+            int(hit_num[best])
         ))
 
-        return record_of_all_best[3]
-        # return now_offset_center
+        return [float(v) for v in offsets[best]]
 
     def get_score_of_each_offest(self, record):
         # 对于每个位移，记录的信息为(hit_can_not_miss_num , hit_num , similarity)
@@ -244,6 +270,65 @@ class AboveOffset:
         # 然后在前两个一致的情形下使得similarity尽量高
         return record[0] * 10000 + record[1] * 100 + record[2]
 
+    def cal_match_similarity_values(self,
+                                    content_similarity: Dict[str, Dict[str, float]],
+                                    node_items: Dict[str, TpNodeItem],
+                                    offsets: np.ndarray,
+                                    ban_offset_uids: Set) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        cal_match_similarity_value 的批量版本，一次计算多个 offset 的结果，计算顺序和逐个计算时保持一致，结果完全相同
+        :param offsets: shape (n, 2)
+        :return: sum_value, hit_num, hit_can_not_miss，shape 都为 (n,)
+        """
+        n = len(offsets)
+        sum_value = np.zeros(n)
+        hit_num = np.zeros(n, dtype=np.int64)
+        hit_can_not_miss = np.zeros(n, dtype=np.int64)
+        offset_x = offsets[:, 0:1]
+        offset_y = offsets[:, 1:2]
+
+        for above_item in self.above_items.values():
+            if above_item.is_ban_offset:
+                continue
+
+            rects, similarities = [], []
+            for uid, similarity in content_similarity.get(above_item.uid, {}).items():
+                if uid in ban_offset_uids:
+                    continue
+                if similarity > CONTENT_SIMILARITY_THRESH:
+                    rects.append(node_items[uid].trans_bbox.rect)
+                    similarities.append(similarity)
+
+            if not rects:
+                continue
+
+            # shape (n, 节点数)
+            rects = np.asarray(rects, dtype=np.float64)
+            left = rects[:, 0] + offset_x
+            top = rects[:, 1] + offset_y
+            right = rects[:, 2] + offset_x
+            bottom = rects[:, 3] + offset_y
+            node_area = (right - left) * (bottom - top)
+            similarities = np.asarray(similarities, dtype=np.float64)
+
+            max_value = np.zeros(n)
+            for above_bbox in [above_item.bbox, *above_item.bbox_alternative]:
+                above_rect = above_bbox.rect
+                x_i = np.maximum(np.minimum(right, above_rect[2]) - np.maximum(left, above_rect[0]), 0)
+                y_i = np.maximum(np.minimum(bottom, above_rect[3]) - np.maximum(top, above_rect[1]), 0)
+                intersect = x_i * y_i
+                union = node_area + above_bbox.area - intersect
+                iou = np.divide(intersect, union, out=np.zeros_like(intersect), where=union > 0)
+                max_value = np.maximum(max_value, (iou * similarities).max(axis=1))
+
+            hit = max_value != 0
+            if above_item.can_not_miss:
+                hit_can_not_miss += hit
+            hit_num += hit
+            sum_value += max_value
+
+        return sum_value, hit_num, hit_can_not_miss
+
     def cal_match_similarity_value(self,
                                    content_similarity: Dict[str, Dict[str, float]],
                                    node_items: Dict[str, TpNodeItem],
@@ -273,8 +358,8 @@ class AboveOffset:
             for node_item in node_items.values():
                 if node_item.uid in ban_offset_uids:
                     continue
-                similarity = content_similarity[above_item.uid][node_item.uid]
-                if similarity > 0.7:
+                similarity = content_similarity.get(above_item.uid, {}).get(node_item.uid, 0)
+                if similarity > CONTENT_SIMILARITY_THRESH:
                     node_bbox = node_item.trans_bbox.transform((-offset[0], -offset[1]))
                     iou = node_bbox.cal_iou(above_bbox)  # 这里的逻辑是，把一个和他有字符上相似的框位置进行偏移，并期望偏移后的iou也很大
                     max_value = max(max_value, iou * similarity)
@@ -5,13 +5,130 @@ from typing import Dict, List, Tuple
 import numpy as np
 import cv2
 
-from ocr_structuring import debugger
 from ...utils.debug_data import DebugData
-from ...utils.algorithm import ternary_max_search
+from ...utils.request_context import get_request_context, check_cancelled
+from ...utils.algorithm import ternary_max_search, ternary_max_search_batch
 from ...utils.bbox import BBox
+from ...utils.node_batch import NodeBatch
 from ocr_structuring.utils.logging import logger
 from ...template.tp_node_item import TpNodeItem
-from ...template.matcher.tp_conf_bg_item import TpConfBgItem
+from ...template.matcher.tp_conf_bg_item import TpConfBgItem, BgMatchIndex
+
+
+class BestMatchSearch:
+    """
+    BgScale.get_fixed_label_best_match 的批量版本：
+    同时对多个 anchor 做角度和缩放的三分搜索，每一轮把所有 anchor 的 (scale, angle) 候选一起用 numpy 计算相似度。
+    相似度只和 bbox 的中心点有关，所以只对中心点做变换
+    """
+
+    ANGLE_RANGE = (-3, 3)
+
+    def __init__(
+        self,
+        bg_items: Dict[str, TpConfBgItem],
+        node_items: Dict[str, TpNodeItem],
+        anchor_pairs: List[Tuple[str, str]],
+        bg_match_all: Dict[str, List[TpNodeItem]],
+    ):
+        """
+        :param anchor_pairs: 作为 anchor 的 (bg.uid, node.uid)
+        :param bg_match_all: bg.uid 匹配到的所有 node
+        """
+        self.bg_count = len(bg_items)
+        bg_rects = np.array([it.bbox.rect for it in bg_items.values()], dtype=np.float64).reshape(-1, 4)
+        bg_uid_idx = {uid: i for i, uid in enumerate(bg_items)}
+
+        # 匹配到的 node 按照 bg item 分组连续存放，group_starts 为每组的起始位置
+        node_rects, group_bg_idxes, group_starts = [], [], []
+        for bg_uid, nodes in bg_match_all.items():
+            if bg_uid not in bg_uid_idx or len(nodes) == 0:
+                continue
+            group_starts.append(len(node_rects))
+            group_bg_idxes.append(bg_uid_idx[bg_uid])
+            node_rects.extend(it.bbox.rect for it in nodes)
+        self.node_rects = np.array(node_rects, dtype=np.float64).reshape(-1, 4)
+        self.group_bg_rects = bg_rects[group_bg_idxes]
+        self.group_starts = np.array(group_starts, dtype=np.int64)
+
+        bg_centers, node_centers, scale_ranges = [], [], []
+        for bg_uid, node_uid in anchor_pairs:
+            bg_bbox = bg_items[bg_uid].bbox
+            node_bbox = node_items[node_uid].bbox
+            scale_x, scale_y = bg_bbox.width * 1.0 / node_bbox.width, bg_bbox.height * 1.0 / node_bbox.height
+            bg_centers.append(bg_bbox.center)
+            node_centers.append(node_bbox.center)
+            scale_ranges.append((min(scale_x / 2.0, scale_y / 2.0), max(scale_x * 2.0, scale_y * 2.0)))
+        self.bg_centers = bg_centers
+        self.node_centers = node_centers
+        self.scale_ranges = np.array(scale_ranges, dtype=np.float64).reshape(-1, 2)
+
+    def search(self) -> List[Dict]:
+        """
+        :return: 每个 anchor 的搜索结果，格式与 get_fixed_label_best_match 相同
+        """
+        def angle_search_cal_fn(anchor_idxes, angles):
+            # 每个 angle 都要跑一遍 scale 的三分搜索，请求取消以后不再继续搜索
+            check_cancelled('bg_scale')
+
+            def scale_search_cal_fn(idxes, scales):
+                return self.cal_match_similarity(anchor_idxes[idxes], scales, angles[idxes])
+
+            scales, similarities = ternary_max_search_batch(
+                self.scale_ranges[anchor_idxes, 0], self.scale_ranges[anchor_idxes, 1],
+                cal_fn=scale_search_cal_fn, eps=0.01
+            )
+            return np.stack([similarities, scales], axis=1)
+
+        anchor_count = len(self.bg_centers)
+        angles, results = ternary_max_search_batch(
+            np.full(anchor_count, self.ANGLE_RANGE[0]), np.full(anchor_count, self.ANGLE_RANGE[1]),
+            cal_fn=angle_search_cal_fn, eps=0.1
+        )
+
+        return [
+            {
+                "similarity_value": float(results[i, 0]),
+                "best_angle": float(angles[i]),
+                "best_scale": float(results[i, 1]),
+                "bg_origin_point": self.bg_centers[i],
+                "target_origin_point": self.node_centers[i],
+            }
+            for i in range(anchor_count)
+        ]
+
+    def cal_match_similarity(self, anchor_idxes: np.ndarray, scales: np.ndarray, angles: np.ndarray) -> np.ndarray:
+        """
+        与 BgScale.cal_match_similarity 相同，一次计算多组 (anchor, scale, angle)
+        :return: shape 为 (n,) 的相似度
+        """
+        if len(self.node_rects) == 0:
+            return np.zeros(len(anchor_idxes))
+
+        # node 先平移到 anchor node 的中心，缩放以后再旋转, shape (n, node 数)
+        node_centers = np.array(self.node_centers)[anchor_idxes]
+        scales = scales[:, np.newaxis]
+        mid_x = ((self.node_rects[:, 0] - node_centers[:, 0:1]) * scales +
+                 (self.node_rects[:, 2] - node_centers[:, 0:1]) * scales) / 2
+        mid_y = ((self.node_rects[:, 1] - node_centers[:, 1:2]) * scales +
+                 (self.node_rects[:, 3] - node_centers[:, 1:2]) * scales) / 2
+        rad_theta = np.radians(angles)[:, np.newaxis]
+        cos_theta, sin_theta = np.cos(rad_theta), np.sin(rad_theta)
+        x = mid_x * cos_theta - mid_y * sin_theta
+        y = mid_y * cos_theta + mid_x * sin_theta
+
+        # bg item 平移到 anchor bg 的中心, shape (n, group 数)
+        bg_centers = np.array(self.bg_centers)[anchor_idxes]
+        bg_x = ((self.group_bg_rects[:, 0] - bg_centers[:, 0:1]) + (self.group_bg_rects[:, 2] - bg_centers[:, 0:1])) / 2
+        bg_y = ((self.group_bg_rects[:, 1] - bg_centers[:, 1:2]) + (self.group_bg_rects[:, 3] - bg_centers[:, 1:2])) / 2
+        group_sizes = np.diff(np.append(self.group_starts, len(self.node_rects)))
+        bg_x = np.repeat(bg_x, group_sizes, axis=1)
+        bg_y = np.repeat(bg_y, group_sizes, axis=1)
+
+        distances = np.sqrt((bg_x - x) ** 2 + (bg_y - y) ** 2)
+        # 每个 bg item 取距离最近的 node
+        min_distances = np.minimum.reduceat(distances, self.group_starts, axis=1)
+        return np.exp(-min_distances / 1000).sum(axis=1) / (self.bg_count + 1e-8)
 
 
 class BgScale:
@@ -33,15 +150,20 @@ class BgScale:
         img_height: int,
         img_width: int,
         debug_data: DebugData = None,
-    ):
+    ) -> NodeBatch:
+        """
+        :return: 包含所有 node_item（包括 merge/split 产生的）的 NodeBatch，供 AboveOffset 继续使用
+        """
         # 背景元素匹配
         bg_match_pairs = []
         bg_match_all = {}
         new_node_items = {}
 
         bg_nodes_count = 0
+        # 所有 bg item 共用一个字符倒排索引，只对可能相似的 node_item 计算编辑距离
+        index = BgMatchIndex(node_items) if self.bg_items else None
         for bg_item in self.bg_items.values():
-            matched_node_items = bg_item.match_node(node_items)
+            matched_node_items = bg_item.match_node(node_items, index)
 
             if len(matched_node_items) == 0:
                 continue
@@ -64,78 +186,84 @@ class BgScale:
             and self.template_info is not None
             and abs(img_height / img_width - self.template_ratio) < 0.2
         ):
-            return self.resize_by_2d_scale(node_items, img_height, img_width)
+            node_batch = NodeBatch(node_items)
+            self.resize_by_2d_scale(node_items, img_height, img_width, node_batch)
+            return node_batch
 
         node_items.update(new_node_items)
+        node_batch = NodeBatch(node_items)
 
         # 背景缩放
         # self.scale_by_best_match(node_items, bg_match_pairs, bg_match_all)
         if self.check_do_perspective(node_items, bg_match_pairs, img_height, img_width):
-            H, mask = self.scale_by_perspective(node_items, bg_match_pairs)
+            H, mask = self.scale_by_perspective(node_items, bg_match_pairs, node_batch)
 
-            status = self.check_if_is_normal(node_items)
+            status = self.check_if_is_normal(node_items, node_batch)
             if not status:
                 logger.debug("use perspective fail , use normal method")
-                self.scale_by_best_match(node_items, bg_match_pairs, bg_match_all)
+                self.scale_by_best_match(node_items, bg_match_pairs, bg_match_all, node_batch)
 
             if H is not None:
                 logger.debug("Do bg scale by perspective")
                 if debug_data:
                     debug_data.set_H(H)
-                debugger.variables.set_H(H)
+                get_request_context().variables.set_H(H)
         else:
             logger.debug("Do bg scale by best match")
-            self.scale_by_best_match(node_items, bg_match_pairs, bg_match_all)
-
-    def resize_by_2d_scale(self, node_items, img_height, img_width):
-        for node in node_items.values():
-            xmin, ymin, xmax, ymax = node.bbox.rect
-            org_height = ymax - ymin
-            org_width = xmax - xmin
-            new_h = org_height / img_height * self.template_info[0]
-            new_w = org_width / img_width * self.template_info[1]
-            new_xmin = xmin / img_width * self.template_info[1]
-            new_ymin = ymin / img_height * self.template_info[0]
-            node.bg_scaled_bbox = BBox(
-                [new_xmin, new_ymin, new_xmin + new_w, new_ymin + new_h]
-            )
+            self.scale_by_best_match(node_items, bg_match_pairs, bg_match_all, node_batch)
+
+        return node_batch
+
+    def resize_by_2d_scale(self, node_items, img_height, img_width, node_batch: NodeBatch = None):
+        if node_batch is None:
+            node_batch = NodeBatch(node_items)
+        xmin, ymin, xmax, ymax = node_batch.rects.T
+        org_height = ymax - ymin
+        org_width = xmax - xmin
+        new_h = org_height / img_height * self.template_info[0]
+        new_w = org_width / img_width * self.template_info[1]
+        new_xmin = xmin / img_width * self.template_info[1]
+        new_ymin = ymin / img_height * self.template_info[0]
+        node_batch.set_bg_scaled_rects(
+            np.stack([new_xmin, new_ymin, new_xmin + new_w, new_ymin + new_h], axis=1)
+        )
 
-    def check_if_is_normal(self, node_items: Dict[str, TpNodeItem]):
-        is_normal = True
+    def check_if_is_normal(self, node_items: Dict[str, TpNodeItem], node_batch: NodeBatch = None):
+        if node_batch is None:
+            node_batch = NodeBatch(node_items)
         # 最简单的判断，如果有很多的框的坐标都到了边界（负值），判断为false
-        strange_count = 0
-        for node in node_items.values():
-            if len(list(filter(lambda x: x < -20, node.trans_bbox))) > 0:
-                # 认为存在异常
-                strange_count += 1
-            if min(node.trans_bbox) < -200:
-                is_normal = False
-        else:
-            if strange_count / len(node_items) > 0.2:
-                is_normal = False
-        return is_normal
+        trans_rects = node_batch.trans_rects
+        if np.any(trans_rects.min(axis=1) < -200):
+            return False
+
+        # 有坐标小于 -20 的认为存在异常
+        strange_count = np.count_nonzero(np.any(trans_rects < -20, axis=1))
+        return strange_count / len(node_items) <= 0.2
 
     def scale_by_best_match(
         self,
         node_items: Dict[str, TpNodeItem],
         bg_match_pairs: List[Tuple[str, str]],
         bg_match_all: Dict[str, List[TpNodeItem]],
+        node_batch: NodeBatch = None,
     ):
         """
         寻找图片与模板图片最佳的缩放和旋转匹配
         :param node_items:
         :param bg_match_pairs:  (bg.uid, node.uid)
         :param bg_match_all:
+        :param node_batch: node_items 对应的 NodeBatch，为 None 时新建
         :return:
         """
         top_k = min(5, len(bg_match_pairs))
+        if top_k == 0:
+            return
+
+        # 同时以前 top_k 个 label 作为 anchor, 去计算最佳匹配
+        match_results = BestMatchSearch(self.bg_items, node_items, bg_match_pairs[:top_k], bg_match_all).search()
         best_result = None
         best_similarity_value = 0
-        for i in range(top_k):
-            # 选定一个 label 作为 anchor, 去计算最佳匹配
-            match_result = self.get_fixed_label_best_match(
-                node_items, i, bg_match_pairs, bg_match_all
-            )
+        for match_result in match_results:
             if match_result["similarity_value"] > best_similarity_value:
                 best_similarity_value = match_result["similarity_value"]
                 best_result = match_result
@@ -143,13 +271,15 @@ class BgScale:
         if best_result is None:
             return
 
-        for node in node_items.values():
-            node.bg_scaled_bbox = node.bbox.transform(
-                best_result["target_origin_point"],
-                best_result["best_scale"],
-                best_result["best_angle"],
-                best_result["bg_origin_point"],
-            )
+        if node_batch is None:
+            node_batch = NodeBatch(node_items)
+        node_batch.set_bg_scaled_rects(NodeBatch.transform(
+            node_batch.rects,
+            best_result["target_origin_point"],
+            best_result["best_scale"],
+            best_result["best_angle"],
+            best_result["bg_origin_point"],
+        ))
 
     def get_fixed_label_best_match(
         self,
@@ -236,6 +366,8 @@ class BgScale:
             return _result_scale, scale_max_similarity
 
         def angle_search_cal_fn(angle: float):
+            # 每个 angle 都要跑一遍 scale 的三分搜索，请求取消以后不再继续搜索
+            check_cancelled('bg_scale')
             # 固定一个 angle 进行 scale search
             scale, similarity = scale_search(angle)
             return similarity, scale
@@ -282,7 +414,8 @@ class BgScale:
         return similarity_value
 
     def scale_by_perspective(
-        self, node_items: Dict[str, TpNodeItem], bg_match_pairs: List[Tuple[str, str]]
+        self, node_items: Dict[str, TpNodeItem], bg_match_pairs: List[Tuple[str, str]],
+        node_batch: NodeBatch = None,
     ):
         """
         使用 bg_item 的中心点和 node 的中心点做投影变换
@@ -311,7 +444,7 @@ class BgScale:
             return None
 
         # self.simple_rotate_and_boundingRect(node_items, H)
-        self.simple_boundingRect(node_items, H)
+        self.simple_boundingRect(node_items, H, node_batch)
 
         return H, mask
 
@@ -353,24 +486,11 @@ class BgScale:
             ]
             node.bg_scaled_bbox = BBox(trans_rect)
 
-    def simple_boundingRect(self, node_items, H):
+    def simple_boundingRect(self, node_items, H, node_batch: NodeBatch = None):
         # 投影变幻的结果直接求 bounding box
-        for node in node_items.values():
-            src_points = node.bbox.points
-            trans_points = cv2.perspectiveTransform(
-                np.array([src_points]).astype(np.float32), H
-            )[0]
-
-            rect = cv2.boundingRect(trans_points)
-
-            trans_rect = [
-                int(rect[0]),
-                int(rect[1]),
-                int(rect[0] + rect[2]),
-                int(rect[1] + rect[3]),
-            ]
-
-            node.bg_scaled_bbox = BBox(trans_rect)
+        if node_batch is None:
+            node_batch = NodeBatch(node_items)
+        node_batch.set_bg_scaled_rects(NodeBatch.perspective_bounding_rects(node_batch.rects, H))
 
     @staticmethod
     def get_rotation_theta(
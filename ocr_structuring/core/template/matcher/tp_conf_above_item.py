@@ -10,6 +10,7 @@ class TpConfAboveItem(TpConfBaseItem):
         super().__init__(item_conf, is_tp_conf)
         self.is_ban_offset = True if item_conf.get("ban_offset", "") == "1" else False
         self.regex = item_conf.get("regex", "")
+        self.regex_pattern = re.compile(self.regex) if self.regex else None
         self.can_not_miss = item_conf.get("can_not_miss", "")
         self.ioo_thresh = item_conf.get("ioo_thresh", 0.1)
 
@@ -26,7 +27,7 @@ class TpConfAboveItem(TpConfBaseItem):
                 continue
 
             if self.regex:
-                m = re.search(self.regex, node_item.text)
+                m = self.regex_pattern.search(node_item.text)
                 if m:
                     matched_node_uids.add(node_item.uid)
 
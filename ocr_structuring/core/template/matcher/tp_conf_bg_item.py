@@ -1,4 +1,5 @@
-from typing import Dict, List
+from collections import Counter, defaultdict
+from typing import Dict, List, Set
 from ...template.tp_node_item import TpNodeItem
 from ...utils import str_util
 from ocr_structuring.utils.logging import logger
@@ -11,6 +12,78 @@ BG_MATCH_MODE_HORIZONTAL_MERGE = "h_merge"
 BG_MATCH_MODE_VERTICAL_MERGE = "v_merge"
 
 
+def normalize_text(text: str) -> str:
+    """
+    与 check_content_similar(remove_symbols=True, remove_space=True) 中的处理相同
+    """
+    return str_util.remove_space(str_util.remove_symbols(text))
+
+
+class BgMatchIndex:
+    """
+    一次请求中所有 bg item 共用的字符倒排索引：字符 -> (node uid, 出现次数)。
+
+    编辑距离不超过 t 的两个字符串，公共字符个数（按多重集合计算）至少为 max(m, n) - t，
+    bg item 只需要对满足这个条件的 node_item 调用 check_content_similar，结果与遍历所有 node_item 相同
+    """
+
+    def __init__(self, node_items: Dict[str, TpNodeItem]):
+        self.order = {}
+        self.norm_texts = {}
+        self.cn_texts = {}
+        self.postings = defaultdict(list)
+        self.by_length = defaultdict(list)
+        for i, (uid, node_item) in enumerate(node_items.items()):
+            text = normalize_text(node_item.text)
+            self.order[uid] = i
+            self.norm_texts[uid] = text
+            self.cn_texts[uid] = node_item.cn_text
+            self.by_length[len(text)].append(uid)
+            for char, count in Counter(text).items():
+                self.postings[char].append((uid, count))
+
+    def _common_counts(self, text: str) -> Dict[str, int]:
+        common = defaultdict(int)
+        for char, count in Counter(text).items():
+            for uid, node_count in self.postings.get(char, ()):
+                common[uid] += min(count, node_count)
+        return common
+
+    def similar_candidates(self, exp_text: str, ed_thresh: int) -> Set[str]:
+        """
+        :param exp_text: 经过 normalize_text 处理的背景文本
+        :return: 归一化以后与 exp_text 的编辑距离可能不超过 ed_thresh 的 node uid
+        """
+        m = len(exp_text)
+        ed_thresh = int(ed_thresh)
+        out = set()
+        for uid, common in self._common_counts(exp_text).items():
+            n = len(self.norm_texts[uid])
+            if abs(n - m) <= ed_thresh and common >= max(m, n) - ed_thresh:
+                out.add(uid)
+
+        # 两个字符串都很短时，没有公共字符也可能满足
+        if m <= ed_thresh:
+            for n in range(ed_thresh + 1):
+                out.update(self.by_length.get(n, ()))
+        return out
+
+    def containing_candidates(self, text: str) -> Set[str]:
+        """
+        :return: 包含 text 中所有字符（符号和空格除外）的 node uid
+        """
+        exp_text = normalize_text(text)
+        if not exp_text:
+            return set(self.order)
+        return {uid for uid, common in self._common_counts(exp_text).items() if common >= len(exp_text)}
+
+    def sorted_items(self, node_items: Dict[str, TpNodeItem], uids: Set[str]) -> List[TpNodeItem]:
+        """
+        :return: 按照 node_items 中原来的顺序排列
+        """
+        return [node_items[uid] for uid in sorted(uids, key=self.order.__getitem__)]
+
+
 class TpConfBgItem(TpConfBaseItem):
     def __init__(self, item_conf, is_tp_conf: bool = False):
         super().__init__(item_conf, is_tp_conf)
@@ -25,9 +98,13 @@ class TpConfBgItem(TpConfBaseItem):
             self.mode
         )
 
-    def _norm_match(self, node_items: Dict[str, TpNodeItem]) -> List[TpNodeItem]:
+    def _norm_match(self, node_items: Dict[str, TpNodeItem], index: BgMatchIndex = None) -> List[TpNodeItem]:
+        candidates = node_items.values()
+        if index is not None:
+            candidates = index.sorted_items(node_items, self._similar_candidates(index))
+
         out = []
-        for node_item in node_items.values():
+        for node_item in candidates:
             if self.check_content_similar(
                 node_item.text, remove_space=True, remove_symbols=True
             ):
@@ -35,10 +112,25 @@ class TpConfBgItem(TpConfBaseItem):
 
         return out
 
+    def _similar_candidates(self, index: BgMatchIndex) -> Set[str]:
+        """
+        check_content_similar 中每个 content 使用的编辑距离阈值不同，分别查询
+        """
+        out = set()
+        for item in self.contents:
+            if isinstance(item, str):
+                exp_text = item
+                ed_thresh = self.conf.get("ed_thresh", 0) if self.is_tp_conf else 0
+            else:
+                exp_text = item["text"]
+                ed_thresh = item.get("ed_thresh", 0)
+            out.update(index.similar_candidates(normalize_text(exp_text), ed_thresh))
+        return out
+
     def _horizontal_split_match(
-        self, node_items: Dict[str, TpNodeItem]
+        self, node_items: Dict[str, TpNodeItem], index: BgMatchIndex = None
     ) -> List[TpNodeItem]:
-        norm_match_res = self._norm_match(node_items)
+        norm_match_res = self._norm_match(node_items, index)
         if len(norm_match_res) != 0:
             return norm_match_res
 
@@ -48,8 +140,12 @@ class TpConfBgItem(TpConfBaseItem):
         else:
             bg_content = self.content
 
+        candidates = node_items.values()
+        if index is not None:
+            candidates = index.sorted_items(node_items, index.containing_candidates(bg_content))
+
         out = []
-        for it in node_items.values():
+        for it in candidates:
             sub_str_start_idxes = str_util.findall_sub_str_idx(
                 sub_text=bg_content, text=it.text
             )
@@ -68,9 +164,9 @@ class TpConfBgItem(TpConfBaseItem):
         return out
 
     def _horizontal_merge_match(
-        self, node_items: Dict[str, TpNodeItem]
+        self, node_items: Dict[str, TpNodeItem], index: BgMatchIndex = None
     ) -> List[TpNodeItem]:
-        norm_match_res = self._norm_match(node_items)
+        norm_match_res = self._norm_match(node_items, index)
         if len(norm_match_res) != 0:
             return norm_match_res
 
@@ -84,7 +180,8 @@ class TpConfBgItem(TpConfBaseItem):
         candidate_chars_count = 0
 
         for node_item in node_items.values():
-            if node_item.cn_text in bg_content:
+            cn_text = index.cn_texts[node_item.uid] if index is not None else node_item.cn_text
+            if cn_text in bg_content:
                 candidate_node_items[node_item.uid] = node_item
                 candidate_chars_count += len(node_item.cn_text)
 
@@ -109,8 +206,11 @@ class TpConfBgItem(TpConfBaseItem):
 
         return out
 
-    def match_node(self, node_items: Dict[str, TpNodeItem]) -> List[TpNodeItem]:
-        matched_node_items = self.match_func[self.mode](node_items)
+    def match_node(self, node_items: Dict[str, TpNodeItem], index: BgMatchIndex = None) -> List[TpNodeItem]:
+        """
+        :param index: node_items 建立的 BgMatchIndex，多个 bg item 匹配同一组 node_items 时共用
+        """
+        matched_node_items = self.match_func[self.mode](node_items, index)
         return matched_node_items
 
     def __str__(self):
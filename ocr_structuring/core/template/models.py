@@ -1,4 +1,5 @@
 from collections import namedtuple
 
 FilterArea = namedtuple('FilterArea', 'area w ioo_thresh')
-FilterRegex = namedtuple('FilterRegex', 'regex w')
+# regex 为配置中的字符串，pattern 为 re.compile 以后的结果
+FilterRegex = namedtuple('FilterRegex', 'regex w pattern')
@@ -41,7 +41,7 @@ class DummyTpl(CommonParser):
             item_name: 当前正在处理的字段的名称
             passed_nodes: 经过 filter_area 和 filter_content 过滤的 node
             node_items: 所有的 node_items
-            img: BGR ndarray
+            img: BGR ndarray 或者 LazyImage，传给 cv2 之前先调用 np.asarray(img)
 
         """
         pass
@@ -59,7 +59,7 @@ class DummyTpl(CommonParser):
             item_name: 当前正在处理的字段的名称
             passed_nodes: 经过 filter_area 和 filter_content 过滤的 node
             node_items: 所有的 node_items
-            img: BGR ndarray
+            img: BGR ndarray 或者 LazyImage，传给 cv2 之前先调用 np.asarray(img)
 
         Returns:
             text: 字段结构化结果
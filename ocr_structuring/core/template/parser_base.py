@@ -19,8 +19,11 @@ from ..utils.crnn.crnn_util import CRNNUtil
 from ..utils.debug_data import DebugData
 from ..utils.exception import ConfigException
 from ..utils.node_item_group import NodeItemGroup
+from ..utils.request_context import check_cancelled
+from ..utils.spatial_index import SpatialIndex
 from ..utils.structuring_viz.viz_special_method import viz_post_crnn_date
 from ocr_structuring.utils.logging import logger
+from ocr_structuring.utils import metrics
 
 
 class ParseBase:
@@ -67,12 +70,21 @@ class ParseBase:
     ):
         """
         :param node_items:
-        :param img: ndarray BGR image 在某些环节中可能有重识别的步骤，需要用到原始图片
+        :param img: ndarray BGR image 或者 LazyImage，在某些环节中可能有重识别的步骤，需要用到原始图片
         :return: dict[StructureItem]
         """
+        # fg_item、region_item 会保存单次请求的中间结果，而 parser 在请求间共享，
+        # 这里浅拷贝一份，避免并发的请求互相覆盖
+        fg_items = OrderedDict((k, copy.copy(v)) for k, v in self.fg_items.items())
+        region_items = OrderedDict((k, copy.copy(v)) for k, v in self.region_items.items())
+
+        # 此时 node_items 的 trans_bbox 已经是最终的坐标，各个 item 的 filter_area 共用一个空间索引
+        spatial_index = SpatialIndex({it.uid: it.trans_bbox for it in node_items.values()})
+
         structure_items = {}
-        for fg_item in self.fg_items.values():
-            fg_item.load_data(node_items)
+        for fg_item in fg_items.values():
+            check_cancelled(fg_item.item_name)
+            fg_item.load_data(node_items, spatial_index)
             item_result = fg_item.run_parse(img, debug_data=debug_data)
             if item_result is None:
                 content, scores = "", [0]
@@ -88,15 +100,17 @@ class ParseBase:
 
             structure_items[fg_item.item_name] = si
 
-        for region_item in self.region_items.values():
-            region_item.load_data(node_items)
+        for region_item in region_items.values():
+            check_cancelled(region_item.item_name)
+            region_item.load_data(node_items, spatial_index)
             region_item.run_parse(img, structure_items)
 
         # 通过structure_items 传入image，防止在后处理阶段可能会使用到图片相关的信息
-        structure_items = self.tmpl_post_proc(structure_items, self.fg_items, img)
+        with metrics.stage_timer(metrics.STAGE_TMPL_POST_PROC):
+            structure_items = self.tmpl_post_proc(structure_items, fg_items, img)
 
         # 删除 should_output 为 false 的结构化结果
-        for fg_item in self.fg_items.values():
+        for fg_item in fg_items.values():
             if fg_item.item_name not in structure_items:
                 continue
 
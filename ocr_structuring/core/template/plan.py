@@ -0,0 +1,122 @@
+"""
+模板的编译：读取 yml 配置、合并 default_conf.yml，得到解析器和 TemplateMatcher 直接使用的配置（TemplatePlan），
+并以 pickle 格式缓存到磁盘。
+
+缓存文件名包含配置文件和解析器代码（解析器类及其父类所在的源文件）的 MD5，任何一个变化都会重新编译，
+重启或者新的 worker 进程不需要再解析 yml。
+
+制作镜像时可以用 scripts/compile_templates.py 预先编译所有模板，配置错误（例如找不到 pre/post func）在构建时就会报错
+"""
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+from ocr_structuring.utils.logging import logger
+from . import loader
+
+# 缓存格式变化时修改
+PLAN_VERSION = 1
+PLAN_DIR = os.path.join(loader.TEMPLATE_DIR, '.plan')
+PLAN_EXT = '.plan'
+
+
+class TemplatePlan:
+    def __init__(self, class_name: str, conf: Dict, key: str):
+        """
+        :param class_name: 模板名称
+        :param conf: 合并了 default_conf 的配置，包含 is_tp_conf
+        :param key: 编译时配置文件和代码的 MD5
+        """
+        self.class_name = class_name
+        self.conf = conf
+        self.key = key
+
+
+def is_tp_conf(conf) -> bool:
+    version = conf.get('version', 1)
+    if version >= 2:
+        return True
+    return False
+
+
+def conf_path(config_dir, class_name: str) -> Path:
+    path = Path(config_dir) / (class_name + '.yml')
+    if not path.exists():
+        raise FileNotFoundError(f"Template yml config file not exist: {path}")
+    return path
+
+
+def plan_key(class_name: str, parse_class, config_dir) -> str:
+    """
+    :return: 配置文件、default_conf.yml 以及解析器代码的 MD5
+    """
+    md5 = hashlib.md5()
+    md5.update(str(PLAN_VERSION).encode())
+
+    paths = [conf_path(config_dir, class_name), os.path.join(loader.CONFIG_DIR, 'default_conf.yml'),
+             loader.__file__, __file__]
+    for cls in parse_class.__mro__:
+        module = sys.modules.get(cls.__module__)
+        if module is not None and cls.__module__.startswith('ocr_structuring'):
+            paths.append(module.__file__)
+
+    for path in dict.fromkeys(str(it) for it in paths):
+        md5.update(path.encode())
+        if os.path.exists(path):
+            with open(path, mode='rb') as f:
+                md5.update(f.read())
+    return md5.hexdigest()
+
+
+def compile_plan(class_name: str, config_dir, key: str = '') -> TemplatePlan:
+    conf = loader.load_tmpl_conf(conf_path(config_dir, class_name))
+    conf['is_tp_conf'] = is_tp_conf(conf)
+    return TemplatePlan(class_name, conf, key)
+
+
+def load_plan(class_name: str, parse_class, config_dir, plan_dir: str = None) -> TemplatePlan:
+    """
+    优先从缓存中加载，没有缓存或者缓存失效时重新编译并写入缓存
+    :param plan_dir: 缓存目录，默认为 template/.plan
+    """
+    plan_dir = plan_dir or PLAN_DIR
+    key = plan_key(class_name, parse_class, config_dir)
+    path = os.path.join(plan_dir, '%s-%s%s' % (class_name, key, PLAN_EXT))
+
+    if os.path.exists(path):
+        try:
+            with open(path, mode='rb') as f:
+                plan = pickle.load(f)
+            if isinstance(plan, TemplatePlan) and plan.key == key:
+                return plan
+        except Exception as e:
+            logger.warning('Failed to load template plan %s: %s' % (path, e))
+
+    logger.debug('Compile template plan: %s' % class_name)
+    plan = compile_plan(class_name, config_dir, key)
+    try:
+        save_plan(plan, path)
+    except OSError as e:
+        # 目录只读时不缓存
+        logger.warning('Failed to save template plan %s: %s' % (path, e))
+    return plan
+
+
+def save_plan(plan: TemplatePlan, path: str):
+    """
+    先写入临时文件再 rename，多个 worker 同时编译时不会读到写了一半的文件
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode='wb') as f:
+            pickle.dump(plan, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,128 @@
+import difflib
+import math
+import random
+
+from ocr_structuring.core.template.matcher.above_offset import AboveOffset, CONTENT_SIMILARITY_THRESH
+from ocr_structuring.core.template.tp_node_item import TpNodeItem
+from ocr_structuring.core.utils.bbox import BBox
+
+
+def _loop_search_offset(match_pairs, height, width):
+    offset = (0, 0)
+    min_mean_dis = float('inf')
+    for offset_x in range(-width, width + 1):
+        for offset_y in range(-height, height + 1):
+            dis_sum = 0
+            for above_bbox, node_bbox in match_pairs:
+                node_left_cx = node_bbox.left + offset_x
+                node_left_cy = (node_bbox.top + node_bbox.bottom) / 2 + offset_y
+                above_left_cx, above_left_cy = above_bbox.left, (above_bbox.top + above_bbox.bottom) / 2
+                dis_sum += math.sqrt((node_left_cx - above_left_cx) ** 2 + (node_left_cy - above_left_cy) ** 2)
+            mean_dis = dis_sum / len(match_pairs)
+            if min_mean_dis > mean_dis:
+                min_mean_dis = mean_dis
+                offset = (offset_x, offset_y)
+    return offset
+
+
+def _loop_iou_block_search(above_offset, content_similarity, node_items, ban_offset_uids, w, h):
+    max_search_dis = max(w, h) / 6.0
+    record = None
+    while max_search_dis > 1:
+        block_size = max_search_dis / 10
+        left_up = -max_search_dis / 2.0
+        for i in range(10):
+            for j in range(10):
+                offset = [left_up + i * block_size, left_up + j * block_size]
+                value, hit_num, hit_can_not_miss = above_offset.cal_match_similarity_value(
+                    content_similarity, node_items, offset, ban_offset_uids)
+                current = (hit_can_not_miss, hit_num, value, offset)
+                if record is None or above_offset.get_score_of_each_offest(current) > \
+                        above_offset.get_score_of_each_offest(record):
+                    record = current
+        max_search_dis = block_size * 2
+    return record[3]
+
+
+def _random_rect(rnd, max_x=1000, max_y=800):
+    left, top = rnd.uniform(0, max_x), rnd.uniform(0, max_y)
+    return [left, top, left + rnd.uniform(20, 200), top + rnd.uniform(10, 30)]
+
+
+def test_search_offset():
+    rnd = random.Random(0)
+    above_offset = AboveOffset({'is_tp_conf': True})
+    for _ in range(10):
+        match_pairs = []
+        for _ in range(rnd.randint(1, 4)):
+            rect = [rnd.randint(0, 500), rnd.randint(0, 500)]
+            rect += [rect[0] + rnd.randint(10, 100), rect[1] + rnd.randint(5, 30)]
+            node_rect = [v + rnd.choice([rnd.randint(-20, 20), rnd.uniform(-20, 20)]) for v in rect]
+            match_pairs.append((BBox(rect), BBox(node_rect)))
+        assert above_offset.search_offset(match_pairs, 25, 40) == _loop_search_offset(match_pairs, 25, 40)
+    assert above_offset.search_offset([], 25, 40) == (0, 0)
+
+
+def test_iou_block_search():
+    rnd = random.Random(1)
+    for _ in range(5):
+        above_confs = []
+        for i in range(rnd.randint(2, 6)):
+            area = _random_rect(rnd)
+            if rnd.random() < 0.3:
+                area = [area, _random_rect(rnd)]
+            above_confs.append({'contents': 'item%d' % i, 'area': area,
+                                'can_not_miss': rnd.choice(['', '1']), 'ban_offset': rnd.choice(['', '', '', '1'])})
+        above_offset = AboveOffset({'is_tp_conf': True, 'above_items': above_confs})
+
+        dx, dy = rnd.uniform(-40, 40), rnd.uniform(-40, 40)
+        nodes = []
+        for conf, above_item in zip(above_confs, above_offset.above_items.values()):
+            rect = [v + d for v, d in zip(above_item.bbox.rect, [dx, dy, dx, dy])]
+            nodes.append(TpNodeItem([conf['contents'], *rect, 1, 1]))
+        nodes += [TpNodeItem(['item%d' % rnd.randint(0, 5), *_random_rect(rnd), 1, 1]) for _ in range(20)]
+        node_items = {it.uid: it for it in nodes}
+
+        content_similarity = above_offset.cal_content_similarity(node_items)
+        ban_offset_uids = above_offset.sign_ban_offset(node_items, above_offset.above_items)
+        w = max(max(it.bbox.right for it in above_offset.above_items.values()),
+                max(it.trans_bbox.right for it in nodes))
+        h = max(max(it.bbox.bottom for it in above_offset.above_items.values()),
+                max(it.trans_bbox.bottom for it in nodes))
+
+        expected = _loop_iou_block_search(above_offset, content_similarity, node_items, ban_offset_uids, w, h)
+        assert above_offset.iou_block_search(content_similarity, node_items, ban_offset_uids) == expected
+
+
+def test_content_similarity():
+    rnd = random.Random(2)
+    chars = '发票号码金额日期税号名称地址abc12'
+    above_confs = [{'contents': ['发票号码', {'text': '发票代码'}], 'area': [0, 0, 100, 20]},
+                   {'contents': '金额合计', 'area': [0, 30, 100, 50], 'regex': r'^\d+$'},
+                   {'contents': [{'text': '名称', 'ed_thresh': 1}], 'area': [0, 60, 100, 80]},
+                   {'contents': '', 'area': [0, 90, 100, 110]}]
+    above_offset = AboveOffset({'is_tp_conf': True, 'above_items': above_confs})
+
+    texts = ['发票号码', '发票代码:', '金额', '名称：', '123', '', '税号', '发票号码12345678']
+    texts += [''.join(rnd.choice(chars) for _ in range(rnd.randint(1, 8))) for _ in range(300)]
+    nodes = [TpNodeItem([text, 0, i * 20, 50, i * 20 + 10, 1, 1]) for i, text in enumerate(texts)]
+    node_items = {it.uid: it for it in nodes}
+
+    expected = {}
+    for above_item, conf in zip(above_offset.above_items.values(), above_confs):
+        contents = conf['contents'] if isinstance(conf['contents'], list) else [conf['contents']]
+        for content in contents:
+            content = content['text'] if isinstance(content, dict) else content
+            for node in nodes:
+                similarity = difflib.SequenceMatcher(None, content, node.text).ratio()
+                if above_item.regex and above_item.regex_pattern.search(node.text):
+                    similarity = 1.0
+                expected[(above_item.uid, node.uid)] = similarity
+
+    content_similarity = above_offset.cal_content_similarity(node_items)
+    result = {(a, n): v for a, values in content_similarity.items() for n, v in values.items()}
+    assert result == {k: v for k, v in expected.items() if v > CONTENT_SIMILARITY_THRESH}
+
+    ban_offset_uids = {nodes[0].uid}
+    content_similarity = above_offset.cal_content_similarity(node_items, ban_offset_uids)
+    assert all(nodes[0].uid not in values for values in content_similarity.values())
@@ -0,0 +1,60 @@
+import math
+import random
+
+import numpy as np
+import pytest
+
+from ocr_structuring.core.template.matcher.bg_scale import BgScale, BestMatchSearch
+from ocr_structuring.core.template.tp_node_item import TpNodeItem
+from ocr_structuring.core.utils.algorithm import ternary_max_search, ternary_max_search_batch
+
+
+def test_ternary_max_search_batch():
+    fns = [lambda x: -(x - 1.3) ** 2, lambda x: math.sin(x), lambda x: -abs(x + 2)]
+    lefts, rights = [-5, 0, -10], [5, 3, 10]
+
+    def cal_fn(idxes, mids):
+        return np.array([fns[i](m) for i, m in zip(idxes, mids)])
+
+    left, result = ternary_max_search_batch(lefts, rights, cal_fn, eps=1e-3)
+    for i, fn in enumerate(fns):
+        expected_left, expected_result = ternary_max_search(lefts[i], rights[i], fn, eps=1e-3)
+        assert left[i] == pytest.approx(expected_left)
+        assert result[i] == pytest.approx(expected_result)
+
+
+def test_best_match_search():
+    rnd = random.Random(0)
+    bg_confs = []
+    for i in range(8):
+        left, top = rnd.uniform(0, 900), rnd.uniform(0, 600)
+        bg_confs.append({'contents': ['bg%d' % i], 'area': [left, top, left + rnd.uniform(60, 200), top + 30]})
+    bg_scale = BgScale({'is_tp_conf': True, 'bg_items': bg_confs})
+
+    # 图片中的 node 为模板缩放、旋转、平移后的结果，部分 bg item 有多个匹配
+    scale, angle, dx, dy = 1.3, 1.5, 40, -25
+    cos_theta, sin_theta = math.cos(math.radians(angle)), math.sin(math.radians(angle))
+    node_items, bg_match_pairs, bg_match_all = {}, [], {}
+    for bg_uid, bg_item in list(bg_scale.bg_items.items())[:6]:
+        nodes = []
+        for _ in range(rnd.choice([1, 1, 2])):
+            cx, cy = bg_item.bbox.cx * scale, bg_item.bbox.cy * scale
+            cx, cy = cx * cos_theta - cy * sin_theta + dx, cy * cos_theta + cx * sin_theta + dy
+            cx, cy = cx + rnd.uniform(-5, 5), cy + rnd.uniform(-5, 5)
+            w, h = bg_item.bbox.width * scale, bg_item.bbox.height * scale
+            node = TpNodeItem(['bg', cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2, 1, 1])
+            node_items[node.uid] = node
+            nodes.append(node)
+        bg_match_all[bg_uid] = nodes
+        if len(nodes) == 1:
+            bg_match_pairs.append((bg_uid, nodes[0].uid))
+
+    results = BestMatchSearch(bg_scale.bg_items, node_items, bg_match_pairs, bg_match_all).search()
+    assert len(results) == len(bg_match_pairs)
+    for i, result in enumerate(results):
+        expected = bg_scale.get_fixed_label_best_match(node_items, i, bg_match_pairs, bg_match_all)
+        assert result['similarity_value'] == pytest.approx(expected['similarity_value'])
+        assert result['best_scale'] == pytest.approx(expected['best_scale'])
+        assert result['best_angle'] == pytest.approx(expected['best_angle'])
+        assert result['bg_origin_point'] == expected['bg_origin_point']
+        assert result['target_origin_point'] == expected['target_origin_point']
@@ -1,7 +1,7 @@
 import os
 
 import yaml
-from ocr_structuring.core.template.matcher.tp_conf_bg_item import TpConfBgItem
+from ocr_structuring.core.template.matcher.tp_conf_bg_item import TpConfBgItem, BgMatchIndex
 from ocr_structuring.core.template.matcher.tp_conf_above_item import TpConfAboveItem
 from ocr_structuring.core.template.tp_node_item import TpNodeItem
 
@@ -49,6 +49,29 @@ def test_bg_item_ed_thresh():
     assert matched_node.text == "姓民"
 
 
+def test_bg_item_index():
+    texts = ["姓名", "姓 名:", "姓民", "名姓", "姓", "性别", "出生日期", "出生 日期：1990年", "公民身份号码", "住址",
+             "a", "", "日期", "身份号码123", "姓名张三"]
+    nodes = [TpNodeItem([text, 0, i * 20, 50, i * 20 + 10, 0, 0.1]) for i, text in enumerate(texts)]
+    node_items = {it.uid: it for it in nodes}
+    index = BgMatchIndex(node_items)
+
+    confs = [
+        {"contents": "姓名", "ed_thresh": 0},
+        {"contents": "姓名", "ed_thresh": 1},
+        {"contents": "出生日期", "ed_thresh": 2},
+        {"contents": [{"text": "日期", "ed_thresh": 1}, "住址"]},
+        {"contents": "a", "ed_thresh": 2},
+        {"contents": "身份号码", "mode": "h_split"},
+        {"contents": "出生", "mode": "h_split", "ed_thresh": 1},
+    ]
+    for conf in confs:
+        for is_tp_conf in [True, False]:
+            bg = TpConfBgItem(dict(conf, area=[0, 0, 10, 10]), is_tp_conf)
+            expected = [(it.text, it.bbox.rect) for it in bg.match_node(node_items)]
+            assert expected == [(it.text, it.bbox.rect) for it in bg.match_node(node_items, index)], conf
+
+
 def test_above_item():
     yaml_str = """
       area:
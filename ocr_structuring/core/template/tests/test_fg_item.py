@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from ocr_structuring.core.template.tp_fg_item import FGItem
+from ocr_structuring.core.template.tp_node_item import TpNodeItem
+from ocr_structuring.core.utils.exception import ConfigException
+from ocr_structuring.core.utils.spatial_index import SpatialIndex
+
+
+def _pre_func_upper(item_name, passed_nodes, node_items, img):
+    for node in passed_nodes.values():
+        node.text = node.text.upper()
+
+
+def _post_func_first(item_name, passed_nodes, node_items, img):
+    node = list(passed_nodes.values())[0]
+    return node.get_max_match_regex_w_str().text, node.scores
+
+
+def test_fg_item_overlay():
+    nodes = [TpNodeItem(['abc123', 0, 0, 50, 10, 1, 1]), TpNodeItem(['def456', 0, 60, 50, 70, 1, 1])]
+    node_items = {it.uid: it for it in nodes}
+    img = np.zeros((100, 100)).astype(np.uint8)
+
+    fg_item = FGItem('code', 'code',
+                     {'filter_areas': [{'area': [0, 50, 100, 100], 'w': 1}, {'area': [0, 0, 100, 20], 'w': 0.5}],
+                      'filter_regexs': [{'regex': '([A-Z]+)', 'w': 1}]},
+                     pre_func=_pre_func_upper, post_func=_post_func_first)
+    fg_item.load_data(node_items)
+    assert fg_item.run_parse(img) == ('DEF', [1])
+
+    other = FGItem('code', 'code', {'filter_regexs': [{'regex': '([a-z]+)', 'w': 1}]}, post_func=_post_func_first)
+    other.load_data(node_items)
+    assert other.run_parse(img) == ('abc', [1])
+
+    # 过滤状态和 pre_func 的修改不会影响共享的 node_items
+    for node in nodes:
+        assert not node.is_filtered
+        assert node.text.islower()
+        assert node.filter_areas == [] and node.regex_match_results == []
+    assert fg_item.node_items[nodes[0].uid].bbox is nodes[0].bbox
+
+
+def test_fg_item_spatial_index():
+    nodes = [TpNodeItem(['abc%d' % i, 0, i * 20, 50, i * 20 + 10, 1, 1]) for i in range(10)]
+    node_items = {it.uid: it for it in nodes}
+    spatial_index = SpatialIndex({it.uid: it.trans_bbox for it in nodes})
+    img = np.zeros((200, 100)).astype(np.uint8)
+
+    for area in [[0, 50, 100, 75], [0, 0, 100, 200], [200, 200, 300, 300]]:
+        results = []
+        for index in [None, spatial_index]:
+            fg_item = FGItem('code', 'code', {'filter_areas': [{'area': area, 'w': 1}]}, post_func=_post_func_first)
+            fg_item.load_data(node_items, index)
+            results.append((fg_item.run_parse(img), list(fg_item.get_passed_nodes())))
+        assert results[0] == results[1]
+
+
+def test_fg_item_regex_scanner():
+    texts = ['发票号码12345678', 'No.ABC-001', '金额：１２3.50元', '日期2020年1月2日', '无关文本', '']
+    nodes = [TpNodeItem([text, 0, i * 20, 50, i * 20 + 10, 1, *[0.5 + 0.01 * j for j in range(len(text))]])
+             for i, text in enumerate(texts)]
+    node_items = {it.uid: it for it in nodes}
+    regexes = [{'regex': r'(\d{8})', 'w': 1}, {'regex': r'No\.([A-Z]+)', 'w': 0.8},
+               {'regex': r'([\d.]+)元', 'w': 0.5}, {'regex': r'(\d+)年', 'w': 0.2}]
+
+    results = []
+    for scanner in [True, False]:
+        fg_item = FGItem('no', 'no', {'filter_regexs': regexes})
+        assert fg_item.regex_scanner is not None
+        if not scanner:
+            fg_item.regex_scanner = None
+        fg_item.load_data(node_items)
+        fg_item.debug_data = None
+        fg_item.filter_regex()
+        results.append([(it.is_filtered_by_regex, it.regex_match_results) for it in fg_item.node_items.values()])
+    assert results[0] == results[1]
+    assert [it[0] for it in results[0]] == [False, False, False, False, True, True]
+
+
+def test_fg_item_invalid_regex():
+    with pytest.raises(ConfigException):
+        FGItem('no', 'no', {'filter_regexs': [{'regex': r'(\d+', 'w': 1}]})
+    # 有反向引用时不合并
+    assert FGItem('no', 'no', {'filter_regexs': [{'regex': r'(\d)\1', 'w': 1},
+                                                 {'regex': r'(\w+)', 'w': 1}]}).regex_scanner is None
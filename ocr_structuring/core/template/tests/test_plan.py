@@ -0,0 +1,37 @@
+import os
+import shutil
+
+from ocr_structuring.core.template import plan
+
+CURRENT_DIR = os.path.abspath(os.path.dirname(__file__))
+
+
+class _Parser:
+    pass
+
+
+def test_load_plan(tmpdir, monkeypatch):
+    config_dir = str(tmpdir.mkdir('config'))
+    plan_dir = str(tmpdir.join('plan'))
+    shutil.copy(os.path.join(CURRENT_DIR, 'tpl.yml'), os.path.join(config_dir, 'dummy.yml'))
+
+    compiled = plan.load_plan('dummy', _Parser, config_dir, plan_dir)
+    assert compiled.conf['is_tp_conf'] is plan.is_tp_conf(compiled.conf)
+    assert len(os.listdir(plan_dir)) == 1
+
+    # 命中缓存时不再解析 yml
+    def compile_plan(*args, **kwargs):
+        raise AssertionError('should load from cache')
+
+    with monkeypatch.context() as m:
+        m.setattr(plan, 'compile_plan', compile_plan)
+        cached = plan.load_plan('dummy', _Parser, config_dir, plan_dir)
+    assert cached.conf == compiled.conf
+
+    # 配置文件变化以后重新编译
+    with open(os.path.join(config_dir, 'dummy.yml'), mode='a', encoding='utf-8') as f:
+        f.write('\ntry_scale_by_template_size: true\n')
+    recompiled = plan.load_plan('dummy', _Parser, config_dir, plan_dir)
+    assert recompiled.key != compiled.key
+    assert recompiled.conf['try_scale_by_template_size'] is True
+    assert len(os.listdir(plan_dir)) == 2
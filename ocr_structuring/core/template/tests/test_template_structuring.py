@@ -0,0 +1,92 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from ocr_structuring.core.template import main
+from ocr_structuring.core.template.main import Template, TemplateStructuring
+from ocr_structuring.core.template.parser_base import ParseBase
+from ocr_structuring.service import warm_up
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    loads = []
+
+    def load_template(self, class_name):
+        parse_class = self.subclasses[class_name]
+        time.sleep(0.01)
+        loads.append(class_name)
+        return Template({'name': class_name}, parse_class, None)
+
+    monkeypatch.setattr(main, 'import_parsers', lambda: None)
+    monkeypatch.setattr(ParseBase, 'subclasses', {'a': 'A', 'b': 'B', 'c': 'C'})
+    monkeypatch.setattr(TemplateStructuring, 'load_template', load_template)
+    return loads
+
+
+def test_lazy_load(loads):
+    structuring = TemplateStructuring(preload=['b'], cache_size=2)
+    assert loads == ['b']
+
+    assert structuring.get_template('a').conf == {'name': 'a'}
+    assert structuring.get_template('a') is structuring.get_template('a')
+    assert loads == ['b', 'a']
+
+    # 超过 cache_size 时淘汰最久没有使用的 b
+    structuring.get_template('c')
+    structuring.get_template('a')
+    structuring.get_template('b')
+    assert loads == ['b', 'a', 'c', 'b']
+
+    with pytest.raises(KeyError):
+        structuring.get_template('d')
+
+
+def test_preload_all(loads):
+    structuring = TemplateStructuring(preload=['all'], cache_size=0)
+    assert loads == ['a', 'b', 'c']
+    assert TemplateStructuring.supported_class_names() == ['a', 'b', 'c']
+
+    debug_structuring = TemplateStructuring('c')
+    assert loads[3:] == ['c']
+    assert list(debug_structuring.subclasses) == ['c']
+
+
+def test_concurrent_load(loads):
+    structuring = TemplateStructuring(preload=[], cache_size=0)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(structuring.get_template('a'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loads == ['a']
+    assert all(it is results[0] for it in results)
+
+
+def test_warm_up_templates(loads):
+    def cfg(cache_size, preload='', class_names=''):
+        return SimpleNamespace(template_cache_size=SimpleNamespace(value=cache_size),
+                               template_preload=SimpleNamespace(value=preload),
+                               warm_up_class_names=SimpleNamespace(value=class_names))
+
+    # 默认配置下不加载任何模板
+    structuring = TemplateStructuring(preload=[], cache_size=0)
+    warm_up.warm_up_templates(structuring, warm_up.template_names_to_warm_up(cfg(0)))
+    assert loads == []
+
+    # 只加载配置的模板，不是模板的类别跳过，与常驻模板个数无关
+    for cache_size in [0, 2]:
+        del loads[:]
+        structuring = TemplateStructuring(preload=[], cache_size=cache_size)
+        warm_up.warm_up_templates(structuring, warm_up.template_names_to_warm_up(cfg(cache_size, 'c', 'non_tpl,c,a')))
+        assert loads == ['c', 'a']
+        assert 'c' in structuring.templates and 'a' in structuring.templates
+
+    del loads[:]
+    structuring = TemplateStructuring(preload=[], cache_size=0)
+    warm_up.warm_up_templates(structuring, warm_up.template_names_to_warm_up(cfg(0, 'all')))
+    assert loads == ['a', 'b', 'c']
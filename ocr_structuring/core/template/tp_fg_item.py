@@ -1,4 +1,3 @@
-import copy
 import re
 from collections import OrderedDict
 from functools import wraps
@@ -7,14 +6,58 @@ from typing import Dict, List
 import numpy as np
 
 from .models import FilterArea, FilterRegex
-from .tp_node_item import TpNodeItem
+from .tp_node_item import TpNodeItem, overlay_node_items
 from ..utils import str_util
 from ..utils.bbox import BBox
+from ..utils.cancellation import DeadlineExceeded
+from ..utils.spatial_index import SpatialIndex
 from ..utils.debug_data import DebugData
+from ..utils.exception import ConfigException
 from ocr_structuring.utils.logging import logger
+from ocr_structuring.utils import metrics
 from ..utils.structuring_viz.viz_fg_item import viz_area_filter, viz_regex_filter, viz_post_func, viz_pre_func
 from ..utils.debug_data import DEBUG_FLAG_FILTER_NOT_RUN, debug_filter_wrapper, DebugData
 
+# filter_regexs 个数不少于这个值时使用 RegexScanner 预先过滤
+SCANNER_MIN_REGEXES = 2
+
+
+class RegexScanner:
+    """
+    把多个正则合并为一个 (?:p1)|(?:p2)|... 的正则，对每个 node_item 只扫描一遍文本，
+    一个都不匹配的 node_item 可以直接过滤掉，不需要再逐个正则匹配。
+    只用于判断是否匹配，匹配到的分组、权重仍然由逐个正则计算。
+
+    没有使用 RE2 等引擎：RE2 的 \\d、\\w 只匹配 ASCII 字符，与 re 的结果不同
+    """
+
+    def __init__(self, patterns: List[str]):
+        self.pattern = None
+        for p in patterns:
+            # 反向引用的编号在合并以后会变化；(?i) 等全局的 flag 合并以后会作用到其它正则上
+            if re.search(r'\\[1-9]|\(\?P=', p) or re.compile(p).flags & ~re.UNICODE:
+                return
+
+        try:
+            self.pattern = re.compile('|'.join('(?:%s)' % p for p in patterns))
+        except re.error:
+            # 例如多个正则中有重名的分组，使用逐个正则匹配
+            pass
+
+    @classmethod
+    def create(cls, patterns: List[str]):
+        """
+        :return: 不能合并或者没有必要合并时返回 None
+        """
+        if len(patterns) < SCANNER_MIN_REGEXES:
+            return None
+        scanner = cls(patterns)
+        return scanner if scanner.pattern is not None else None
+
+    def search(self, text: str) -> bool:
+        return self.pattern.search(text) is not None
+
+
 class EnlargeSearchStrategy:
     """
     按照配置文件扩大一下匹配的区域
@@ -95,10 +138,16 @@ class FGItem:
 
         self.filter_regexes: List[FilterRegex] = []
         for it in filter_regexes:
+            try:
+                pattern = re.compile(it['regex'])
+            except re.error as e:
+                raise ConfigException(f"[{item_name}] invalid filter regex [{it['regex']}]: {e}")
             self.filter_regexes.append(FilterRegex(
                 it['regex'],
-                it['w']
+                it['w'],
+                pattern
             ))
+        self.regex_scanner = RegexScanner.create([it.regex for it in self.filter_regexes])
 
         self.pre_func = pre_func
         self.post_func = post_func
@@ -108,6 +157,7 @@ class FGItem:
 
         self.node_items: Dict[int, TpNodeItem] = {}
         self.node_items_backup = {}
+        self.spatial_index = None
 
         self.regex_failed_tp_rects = []
 
@@ -118,13 +168,17 @@ class FGItem:
         if isinstance(self.search_strategy, EnlargeSearchStrategy):
             self.search_strategy.apply(self.filter_areas)
 
-    def load_data(self, node_items: Dict[int, TpNodeItem]):
+    def load_data(self, node_items: Dict[int, TpNodeItem], spatial_index: SpatialIndex = None):
         """
-        深拷贝一份 node_items
+        node_items 在所有 item 之间共享，这里只为每个 node_item 建立一层浅拷贝，
+        过滤状态和 pre_func 对 text 等属性的修改只作用在这层拷贝上，见 TpNodeItem.overlay
         :param node_items: Dict[int, TpNodeItem]
+        :param spatial_index: node_items 的 trans_bbox 建立的索引，filter_area 只对索引查出的候选计算 ioo
         """
-        self.node_items = copy.deepcopy(node_items)
-        self.node_items_backup = copy.deepcopy(node_items)
+        self.node_items = overlay_node_items(node_items)
+        self.node_items_backup = node_items
+        self.spatial_index = spatial_index
+        self.regex_failed_tp_rects = []
 
     def run_parse(self, img: np.ndarray, debug_data: DebugData = None):
         """
@@ -140,7 +194,7 @@ class FGItem:
             for area_item in self.filter_areas:
                 res = self._run_parse(img, area_item)
                 if res is None:
-                    self.node_items = copy.deepcopy(self.node_items_backup)
+                    self.node_items = overlay_node_items(self.node_items_backup)
                 else:
                     break
         else:
@@ -190,10 +244,17 @@ class FGItem:
         if not area_item:
             return DEBUG_FLAG_FILTER_NOT_RUN
 
+        # 阈值小于 0 时不相交的 node_item 也能通过，不能只检查候选
+        candidates = None
+        if self.spatial_index is not None and area_item.ioo_thresh >= 0:
+            candidates = self.spatial_index.query(area_item.area)
+
         for node_item in self.node_items.values():
             if node_item.is_filtered:
                 continue
-            if node_item.trans_bbox.cal_ioo(area_item.area) > area_item.ioo_thresh:
+            if candidates is not None and node_item.uid not in candidates:
+                node_item.is_filtered_by_area = True
+            elif node_item.trans_bbox.cal_ioo(area_item.area) > area_item.ioo_thresh:
                 node_item.filter_areas.append(area_item)
             else:
                 node_item.is_filtered_by_area = True
@@ -224,22 +285,31 @@ class FGItem:
                     self.run_pre_func(img)
                     self.filter_regex()
 
+            except DeadlineExceeded:
+                raise
             except Exception as e:
                 logger.exception('Error run [%s] pre_func: %s since %s' % (self.item_name, self.pre_func, e))
 
     #@viz_regex_filter
+    @metrics.timed(metrics.STAGE_REGEX_FILTER, 'item_name')
     @debug_filter_wrapper
     def filter_regex(self):
         if not self.filter_regexes:
             return DEBUG_FLAG_FILTER_NOT_RUN
 
+        scanner = self.regex_scanner
         for node_item in self.node_items.values():
             if node_item.is_filtered or node_item.is_bg_item:
                 continue
 
+            if scanner is not None and not scanner.search(node_item.text):
+                node_item.is_filtered_by_regex = True
+                self.regex_failed_tp_rects.append(node_item)
+                continue
+
             is_filtered_by_regex = True
             for f in self.filter_regexes:
-                m = re.search(f.regex, node_item.text)
+                m = f.pattern.search(node_item.text)
                 if m:
                     scores = node_item.scores
                     if len(scores) > 0 and m.end(1) <= len(scores):
@@ -253,6 +323,7 @@ class FGItem:
             if is_filtered_by_regex:
                 self.regex_failed_tp_rects.append(node_item)
 
+    @metrics.timed(metrics.STAGE_PRE_FUNC, 'item_name')
     def run_pre_func(self, img: np.ndarray):
         """
         预处理函数，在 filter_regex 之前调用，主要目的是修改 node_items 中的 text
@@ -272,9 +343,12 @@ class FGItem:
                           passed_nodes,
                           node_items=self.node_items,
                           img=img)
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.exception('Error run [%s] pre_func: %s since %s' % (self.item_name, self.pre_func, e))
 
+    @metrics.timed(metrics.STAGE_POST_FUNC, 'item_name')
     def run_post_func(self, img: np.ndarray):
         """
         在 filter_regex 之后调用，这个函数会输出最后结构化以后的结果
@@ -296,6 +370,8 @@ class FGItem:
 
             if res is None:
                 return
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.exception('Error run [%s] post_func: %s. Error: %s' % (self.item_name, self.post_func, e))
             return
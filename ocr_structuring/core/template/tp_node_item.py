@@ -1,4 +1,4 @@
-from typing import List
+from typing import Dict, List
 from collections import namedtuple
 import numpy as np
 from .models import FilterRegex, FilterArea
@@ -30,6 +30,19 @@ class TpNodeItem(NodeItem):
 
         # 这个变量用于记录这个node是否有被重识别过，在某些后处理过程中会被用到
         self.is_re_recognized = False
+
+    def overlay(self) -> 'TpNodeItem':
+        """
+        浅拷贝一份，供单个 FGItem / RegionItem 修改过滤状态、正则匹配结果、text 等属性。
+        bbox、rbox、scores 等对象与原 node_item 共享，只能重新赋值，不能原地修改
+        """
+        item = self.__class__.__new__(self.__class__)
+        item.__dict__.update(self.__dict__)
+        item.filter_areas = list(self.filter_areas)
+        item.filter_regexes = list(self.filter_regexes)
+        item.regex_match_results = list(self.regex_match_results)
+        return item
+
     @property
     def is_filtered(self):
         return self.is_filtered_by_area or \
@@ -122,3 +135,10 @@ class TpNodeItem(NodeItem):
 
     def __repr__(self):
         return super().__str__()
+
+
+def overlay_node_items(node_items: Dict[str, TpNodeItem]) -> Dict[str, TpNodeItem]:
+    """
+    :return: key 与 node_items 相同，value 为 TpNodeItem.overlay
+    """
+    return {uid: it.overlay() for uid, it in node_items.items()}
@@ -1,12 +1,14 @@
-import copy
 from collections import OrderedDict
 from typing import Dict, List
 import numpy as np
 from ..models.structure_item import StructureItem
 from .models import FilterArea
-from .tp_node_item import TpNodeItem
+from .tp_node_item import TpNodeItem, overlay_node_items
 from ..utils.bbox import BBox
+from ..utils.cancellation import DeadlineExceeded
+from ..utils.spatial_index import SpatialIndex
 from ocr_structuring.utils.logging import logger
+from ocr_structuring.utils import metrics
 
 
 class RegionItem:
@@ -39,15 +41,20 @@ class RegionItem:
 
         self.node_items: Dict[int, TpNodeItem] = {}
         self.node_items_backup = {}
+        self.spatial_index = None
 
-    def load_data(self, node_items: Dict[int, TpNodeItem]):
+    def load_data(self, node_items: Dict[int, TpNodeItem], spatial_index: SpatialIndex = None):
         """
-        深拷贝一份 node_items
+        node_items 在所有 item 之间共享，这里只为每个 node_item 建立一层浅拷贝，
+        过滤状态和 pre_func 对 text 等属性的修改只作用在这层拷贝上，见 TpNodeItem.overlay
         :param node_items: Dict[int, TpNodeItem]
+        :param spatial_index: node_items 的 trans_bbox 建立的索引，filter_area 只对索引查出的候选计算 ioo
         """
-        self.node_items = copy.deepcopy(node_items)
-        self.node_items_backup = copy.deepcopy(node_items)
+        self.node_items = overlay_node_items(node_items)
+        self.node_items_backup = node_items
+        self.spatial_index = spatial_index
 
+    @metrics.timed(metrics.STAGE_REGION_ITEM, 'item_name')
     def run_parse(self, img: np.ndarray, structure_items: Dict[str, StructureItem]):
         """
         :param img: numpy 图片，在处理过程中注意不能对原图进行修改
@@ -61,7 +68,7 @@ class RegionItem:
             for area_item in self.filter_areas:
                 res = self._run_parse(img, structure_items, area_item)
                 if res is None:
-                    self.node_items = copy.deepcopy(self.node_items_backup)
+                    self.node_items = overlay_node_items(self.node_items_backup)
                 else:
                     break
         else:
@@ -83,11 +90,17 @@ class RegionItem:
         if not area_item:
             return
 
+        # 阈值小于 0 时不相交的 node_item 也能通过，不能只检查候选
+        candidates = None
+        if self.spatial_index is not None and area_item.ioo_thresh >= 0:
+            candidates = self.spatial_index.query(area_item.area)
+
         for node_item in self.node_items.values():
             if node_item.is_filtered:
                 continue
-
-            if node_item.trans_bbox.cal_ioo(area_item.area) > area_item.ioo_thresh:
+            if candidates is not None and node_item.uid not in candidates:
+                node_item.is_filtered_by_area = True
+            elif node_item.trans_bbox.cal_ioo(area_item.area) > area_item.ioo_thresh:
                 node_item.filter_areas.append(area_item)
             else:
                 node_item.is_filtered_by_area = True
@@ -112,6 +125,8 @@ class RegionItem:
                                   node_items=self.node_items,
                                   img=img,
                                   structure_items=structure_items)
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.exception('Error run [%s] post_func: %s. Error: %s' % (self.item_name, self.post_func, e))
 
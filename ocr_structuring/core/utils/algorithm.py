@@ -36,6 +36,47 @@ def ternary_max_search(left: float, right: float, cal_fn: Callable, cal_fn_key:
     return left, result
 
 
+def ternary_max_search_batch(left: np.ndarray, right: np.ndarray, cal_fn: Callable, eps: float = 1e-5):
+    """
+    ternary_max_search 的批量版本，同时进行多个相互独立的三分搜索，
+    每一轮把所有还没有结束的搜索的 m1、m2 一起交给 cal_fn 计算
+    :param left: 每个搜索的左值
+    :param right: 每个搜索的右值
+    :param cal_fn: 调用的参数为 (idxes, mids)，idxes 为 mid 所属搜索的下标，
+        返回 shape 为 (n,) 或 (n, k) 的数组，二维时用第一列作为 value 判断的值
+    :param eps: 停止条件
+    :return:
+        left: 每个搜索取到最大值时搜索到的值
+        result: 每个搜索取到最大值时 cal_fn 的返回值，没有进行过搜索的为 -inf
+    """
+    left = np.array(left, dtype=np.float64)
+    right = np.array(right, dtype=np.float64)
+    result = None
+    while True:
+        active = np.flatnonzero(left + eps < right)
+        if len(active) == 0:
+            break
+
+        _left, _right = left[active], right[active]
+        m1 = _left + (_right - _left) / 3
+        m2 = _right - (_right - _left) / 3
+        values = np.asarray(cal_fn(np.concatenate([active, active]), np.concatenate([m1, m2])), dtype=np.float64)
+        v1, v2 = values[:len(active)], values[len(active):]
+        if result is None:
+            result = np.full((len(left),) + values.shape[1:], -np.inf)
+
+        _v1 = v1 if v1.ndim == 1 else v1[:, 0]
+        _v2 = v2 if v2.ndim == 1 else v2[:, 0]
+        go_right = _v1 < _v2
+        left[active] = np.where(go_right, m1, _left)
+        right[active] = np.where(go_right, _right, m2)
+        result[active] = np.where(go_right.reshape((-1,) + (1,) * (values.ndim - 1)), v2, v1)
+
+    if result is None:
+        result = np.full(len(left), -np.inf)
+    return left, result
+
+
 def ternary_max_search2(left: float, right: float, cal_fn: Callable, cal_fn_key: Callable = None, eps: float = 1e-5):
     """
     三分法最大值搜索最大值
@@ -1,8 +1,9 @@
 # encoding=utf-8
 import os
 
+from ocr_structuring.settings import MyConfig
 from .core import BKTree
-from .loader import load_from_disk
+from .loader import load_from_disk, ENGINE_BK_TREE, ENGINE_NGRAM
 
 CURRENT_DIR = os.path.abspath(os.path.dirname(__file__))
 
@@ -97,6 +98,11 @@ MEMORY = {
     HANGZHOU_BANK: None,
 }
 
+# 索引类型，没有配置的使用 BK-TREE。词典较大时 BK-TREE 搜索要访问很多节点，可以配置为 ENGINE_NGRAM 使用
+# n-gram 倒排索引。两者 search 的结果集合相同；search_one 在编辑距离和最长公共子序列都相同的候选中，
+# BK-TREE 取遍历顺序靠前的词，n-gram 取源文件中靠前的词，所以这种情况下结果可能不同，对比见 scripts/benchmark_fuzzy_index.py
+ENGINES = {}
+
 
 def zhangjiagang_company_tree() -> BKTree:
     return __get_tree(ZHANGJIAGANG_COMPANY)
@@ -248,5 +254,10 @@ def __get_tree(tree_name) -> BKTree:
     if tree_name not in MEMORY:
         raise NotImplementedError('BK-TREE: %s not implemented' % tree_name)
     if MEMORY[tree_name] is None:
-        MEMORY[tree_name] = load_from_disk(CURRENT_DIR, tree_name)
+        cfg = MyConfig()
+        tree = load_from_disk(CURRENT_DIR, tree_name, engine=ENGINES.get(tree_name, ENGINE_BK_TREE),
+                              tree_dir=cfg.bk_tree_dir.value or None,
+                              build_on_miss=bool(cfg.bk_tree_build_on_miss.value))
+        tree.enable_cache(cfg.bk_tree_cache_size.value, tree_name)
+        MEMORY[tree_name] = tree
     return MEMORY[tree_name]
@@ -1,13 +1,34 @@
 import sys
 from difflib import SequenceMatcher
+from typing import List
 
 import editdistance
 from distance_metrics import lcs
 from ocr_structuring.utils.logging import logger
+from ocr_structuring.utils import metrics
+from ..lru_cache import LRUCache
 
+# json 格式的树文件嵌套很深，编解码时需要
 sys.setrecursionlimit(1000000)
 
 
+def within_edit_distance(a: str, b: str, max_dist: int) -> bool:
+    """
+    编辑距离是否小于等于 max_dist
+    """
+    return editdistance.eval(a, b) <= max_dist
+
+
+# editdistance>=0.5.3 提供了超过阈值以后提前终止计算的 eval_criterion
+if hasattr(editdistance, 'eval_criterion'):
+    within_edit_distance = editdistance.eval_criterion
+
+_MISSING = object()
+
+# search_many 的文本个数达到这个数量时才使用多进程，进程间传输的开销比较大
+PARALLEL_MIN_BATCH = 64
+
+
 class Node(object):
     def __init__(self, word: str):
         self.word = word
@@ -30,26 +51,27 @@ class Node(object):
         return editdistance.eval(self.word, other_word)
 
 
-class BKTree(object):
-    def __init__(self, root: Node = None):
-        self.root = root
-
-    def insert_node(self, new_word: str):
-        # logger.debug('insert word:{}'.format(new_word))
-        if self.root is None:
-            self.root = Node(new_word)
-            return
+class FuzzyIndex(object):
+    """
+    按编辑距离模糊搜索词典的索引，子类实现 _iter_search，search / search_one 的逻辑共用。
+    实现有 BKTree、FlatBKTree 和 NGramIndex
+    """
+    # search_one 结果的 LRU 缓存，由 enable_cache 开启
+    cache = None
+    cache_name = ''
 
-        cur_node = self.root
-        if cur_node.word == new_word:
-            return
-
-        dist = cur_node.cal_distance(new_word)
-        while cur_node.contain_key(dist):
-            cur_node = cur_node.children[dist]
-            dist = cur_node.cal_distance(new_word)
+    def enable_cache(self, max_size: int, name: str):
+        """
+        同样的 OCR 文本（医院名、银行名、城市等）在不同的请求中反复出现，缓存 search_one 的结果。
+        缓存属于索引对象，源文件的 MD5 变化以后 load_from_disk 会生成新的索引，旧的缓存随之失效
+        :param max_size: 最多缓存的个数，小于等于 0 时不缓存
+        :param name: 监控指标中的名称，一般为源文件名
+        """
+        self.cache = LRUCache(max_size) if max_size > 0 else None
+        self.cache_name = name
 
-        cur_node.add_child(dist, new_word)
+    def insert_node(self, new_word: str):
+        raise NotImplementedError
 
     def search(self, word: str, search_dist=4, sort_by_ed=False):
         """
@@ -60,12 +82,7 @@ class BKTree(object):
             [{'word': '', 'edit_distance': 3},...]
         """
 
-        if self.root is None:
-            return []
-
-        candidate_words = []
-        candidate_dict = {}
-        self.recursive_search(self.root, candidate_words, candidate_dict, word, search_dist)
+        candidate_words = self._search(word, search_dist)
 
         if sort_by_ed:
             candidate_words = sorted(candidate_words, key=lambda item: item['edit_distance'])
@@ -81,8 +98,75 @@ class BKTree(object):
         :param min_len: 如果 text 长度小于 min_len 则不进行搜索，并返回 None
         :return: str or None
         """
+        if self.cache is None:
+            return self._search_one(text, search_dist, search_norm_dist, min_len)
+
+        key = (text, search_dist, search_norm_dist, min_len)
+        result = self.cache.get(key, _MISSING)
+        if result is not _MISSING:
+            metrics.count_fuzzy_index_cache(self.cache_name, 'hit')
+            return result
+
+        metrics.count_fuzzy_index_cache(self.cache_name, 'miss')
+        result = self._search_one(text, search_dist, search_norm_dist, min_len)
+        self.cache.put(key, result)
+        return result
+
+    def search_many(self, texts: List[str], search_dist=2, search_norm_dist=None, min_len=5, processes=0) -> List[str]:
+        """
+        批量的 search_one，参数的含义相同，结果与逐个调用 search_one 相同，按 texts 的顺序返回。
+        重复的文本只搜索一次，BK-TREE 一次遍历同时搜索所有的文本，共享节点的访问
+        :param processes: 大于 1 时，在进程池中并行搜索，只有 FlatBKTree 支持，子进程 mmap 加载同一个树文件
+        :return: [str or None, ...]
+        """
+        results = {}
+        pending = []
+        for text in dict.fromkeys(texts):
+            if self.cache is not None:
+                result = self.cache.get((text, search_dist, search_norm_dist, min_len), _MISSING)
+                if result is not _MISSING:
+                    metrics.count_fuzzy_index_cache(self.cache_name, 'hit')
+                    results[text] = result
+                    continue
+                metrics.count_fuzzy_index_cache(self.cache_name, 'miss')
+            pending.append(text)
+
+        words, search_dists = [], []
+        for text in pending:
+            text_search_dist = self._get_search_dist(text, search_dist, search_norm_dist, min_len)
+            if text_search_dist is None:
+                results[text] = None
+            else:
+                words.append(text)
+                search_dists.append(text_search_dist)
+
+        if words:
+            if processes > 1 and len(words) >= PARALLEL_MIN_BATCH:
+                candidates = self._search_multi_parallel(words, search_dists, processes)
+            else:
+                candidates = self._search_multi(words, search_dists)
+            for text, candidate_words in zip(words, candidates):
+                results[text] = self._choose(text, candidate_words)
+
+        if self.cache is not None:
+            for text in pending:
+                self.cache.put((text, search_dist, search_norm_dist, min_len), results[text])
+
+        return [results[text] for text in texts]
+
+    def _search_one(self, text: str, search_dist: int, search_norm_dist, min_len: int):
+        search_dist = self._get_search_dist(text, search_dist, search_norm_dist, min_len)
+        if search_dist is None:
+            return None
+        return self._choose(text, self._search_multi([text], [search_dist])[0])
+
+    @staticmethod
+    def _get_search_dist(text: str, search_dist: int, search_norm_dist, min_len: int):
+        """
+        :return: text 实际使用的 search_dist，不需要搜索时返回 None
+        """
         if text is None:
-            return text
+            return None
 
         if len(text) < min_len:
             return None
@@ -90,12 +174,22 @@ class BKTree(object):
         if search_norm_dist is not None:
             assert 0 < search_norm_dist < 1
             search_dist = int(search_norm_dist * len(text))
+        return search_dist
 
-        candidate_words = self.search(text, search_dist, True)
-
+    @staticmethod
+    def _choose(text: str, candidate_words: List[dict]):
+        """
+        从候选项中选出编辑距离最小、最长公共子序列最长的词，两者都相同时取候选项中靠前的词，
+        所以不同的索引类型在这种情况下返回的词可能不同
+        """
         if len(candidate_words) == 0:
             return None
 
+        candidate_words = sorted(candidate_words, key=lambda item: item['edit_distance'])
+        # 完全匹配的词的最长公共子序列也是最长的
+        if candidate_words[0]['edit_distance'] == 0:
+            return candidate_words[0]['word']
+
         max_LCS = 0
         out_idx = 0
         for i, it in enumerate(candidate_words):
@@ -109,17 +203,173 @@ class BKTree(object):
 
         return candidate_words[out_idx]['word']
 
-    def recursive_search(self, node: Node, candidate_words: list, candidate_dict: dict, word: str, search_dist: int):
-        cur_dist = node.cal_distance(word)
-        min_dist = cur_dist - search_dist
-        max_dist = cur_dist + search_dist
-        if cur_dist <= search_dist:
-            # TODO: 看起来这里的candidate_dict是在去重？
-            if cur_dist not in candidate_dict.keys() or node.word not in candidate_dict[cur_dist]:
-                if cur_dist not in candidate_dict.keys():
-                    candidate_dict[cur_dist] = []
-                candidate_dict[cur_dist].append(node.word)
-                candidate_words.append({'word': node.word, 'edit_distance': cur_dist})
-
-        for key in [key for key in node.get_dist_keys() if (min_dist <= key <= max_dist)]:
-            self.recursive_search(node.children[key], candidate_words, candidate_dict, word, search_dist)
+    def _search_multi(self, words: List[str], search_dists: List[int]) -> List[List[dict]]:
+        """
+        :return: 每个词的候选项，找到完全匹配的词以后停止搜索，只返回完全匹配的词
+        """
+        results = []
+        for word, search_dist in zip(words, search_dists):
+            candidate_words = []
+            for candidate in self._iter_search(word, search_dist):
+                if candidate['edit_distance'] == 0:
+                    candidate_words = [candidate]
+                    break
+                candidate_words.append(candidate)
+            results.append(candidate_words)
+        return results
+
+    def _search_multi_parallel(self, words: List[str], search_dists: List[int], processes: int):
+        """
+        不支持多进程的索引直接在当前进程中搜索
+        """
+        return self._search_multi(words, search_dists)
+
+    def _search(self, word: str, search_dist: int):
+        return list(self._iter_search(word, search_dist))
+
+    def _iter_search(self, word: str, search_dist: int):
+        """
+        :return: 依次 yield {'word': '', 'edit_distance': 3}，同一个词只返回一次
+        """
+        raise NotImplementedError
+
+
+class BKTree(FuzzyIndex):
+    """
+    编辑距离的度量树，每个节点到子节点的边为两者的编辑距离，搜索时根据三角不等式剪枝
+    """
+
+    def __init__(self, root: Node = None):
+        self.root = root
+
+    def insert_node(self, new_word: str):
+        # logger.debug('insert word:{}'.format(new_word))
+        if self.cache is not None:
+            self.cache.clear()
+
+        if self.root is None:
+            self.root = Node(new_word)
+            return
+
+        cur_node = self.root
+        if cur_node.word == new_word:
+            return
+
+        dist = cur_node.cal_distance(new_word)
+        while cur_node.contain_key(dist):
+            cur_node = cur_node.children[dist]
+            dist = cur_node.cal_distance(new_word)
+
+        cur_node.add_child(dist, new_word)
+
+    def _iter_search(self, word: str, search_dist: int):
+        """
+        用栈代替递归的先序遍历，子节点逆序入栈，结果的顺序与递归版本相同。
+        子节点的边 dist 需要满足 |dist - cur_dist| <= search_dist，所以当前节点的编辑距离超过
+        max(dist) + search_dist 以后既不是候选项，也不会有满足条件的子节点，不需要计算准确的编辑距离。
+        这个循环是字段匹配的主要耗时，所以没有拆分成函数调用
+        :return: 依次 yield {'word': '', 'edit_distance': 3}，同一个词只返回一次
+        """
+        if self.root is None:
+            return
+
+        word_len = len(word)
+        seen_words = set()
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            node_word = node.word
+            children = node.children
+
+            len_diff = abs(len(node_word) - word_len)
+            if children:
+                if len_diff > search_dist + max(children):
+                    continue
+                cur_dist = editdistance.eval(node_word, word)
+            else:
+                # 叶子节点只需要判断是否是候选项，大部分叶子节点在这一步被过滤
+                if len_diff > search_dist or not within_edit_distance(node_word, word, search_dist):
+                    continue
+                cur_dist = editdistance.eval(node_word, word)
+
+            if cur_dist <= search_dist and node_word not in seen_words:
+                seen_words.add(node_word)
+                yield {'word': node_word, 'edit_distance': cur_dist}
+
+            if children:
+                min_dist = cur_dist - search_dist
+                max_dist = cur_dist + search_dist
+                matched = [child for dist, child in children.items() if min_dist <= dist <= max_dist]
+                stack.extend(reversed(matched))
+
+
+    def _search_multi(self, words: List[str], search_dists: List[int]) -> List[List[dict]]:
+        """
+        一次遍历同时搜索多个词：每个节点只出栈一次，和需要访问它的词逐个计算编辑距离，
+        子节点带着需要访问它的词入栈。对于每个词，访问的节点和顺序都与 _iter_search 相同
+        """
+        if len(words) <= 1:
+            return super()._search_multi(words, search_dists)
+
+        results = [[] for _ in words]
+        root = self._root_handle()
+        if root is None:
+            return results
+
+        word_lens = [len(word) for word in words]
+        seen_words = [set() for _ in words]
+        finished = [False] * len(words)
+        stack = [(root, list(range(len(words))))]
+        while stack:
+            handle, queries = stack.pop()
+            node_word, dists, children = self._expand(handle)
+            node_len = len(node_word)
+            max_child_dist = max(dists) if len(dists) else None
+            child_queries = [[] for _ in range(len(dists))]
+
+            for i in queries:
+                if finished[i]:
+                    continue
+                word, search_dist = words[i], search_dists[i]
+                len_diff = abs(node_len - word_lens[i])
+                if max_child_dist is not None:
+                    if len_diff > search_dist + max_child_dist:
+                        continue
+                    cur_dist = editdistance.eval(node_word, word)
+                else:
+                    if len_diff > search_dist or not within_edit_distance(node_word, word, search_dist):
+                        continue
+                    cur_dist = editdistance.eval(node_word, word)
+
+                if cur_dist <= search_dist and node_word not in seen_words[i]:
+                    seen_words[i].add(node_word)
+                    if cur_dist == 0:
+                        results[i] = [{'word': node_word, 'edit_distance': 0}]
+                        finished[i] = True
+                        continue
+                    results[i].append({'word': node_word, 'edit_distance': cur_dist})
+
+                min_dist = cur_dist - search_dist
+                max_dist = cur_dist + search_dist
+                for j, dist in enumerate(dists):
+                    if min_dist <= dist <= max_dist:
+                        child_queries[j].append(i)
+
+            for j in range(len(dists) - 1, -1, -1):
+                if child_queries[j]:
+                    stack.append((children[j], child_queries[j]))
+
+        return results
+
+    def _root_handle(self):
+        """
+        :return: 根节点，树为空时返回 None
+        """
+        return self.root
+
+    def _expand(self, node: Node):
+        """
+        :return: 节点的词、子节点的边 dist 列表、子节点列表
+        """
+        children = node.children
+        return node.word, list(children.keys()), list(children.values())
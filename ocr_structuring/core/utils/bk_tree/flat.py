@@ -0,0 +1,225 @@
+"""
+BK-TREE 的二进制缓存格式，整个文件通过 mmap 只读加载，加载耗时与树的大小无关，
+多个 worker 进程加载同一个文件时共享操作系统的 page cache。
+
+文件结构（均为本机字节序的 uint32）：
+    header:        magic(4 bytes) node_count edge_count words_size
+    word_offsets:  node_count + 1，第 i 个节点的词为 words[word_offsets[i]:word_offsets[i + 1]]
+    child_offsets: node_count + 1，第 i 个节点的子节点边为 edges[child_offsets[i]:child_offsets[i + 1]]
+    edge_dists:    edge_count，边上的编辑距离
+    edge_children: edge_count，边指向的子节点下标
+    words:         words_size，所有词的 utf-8 编码
+
+节点按照先序遍历编号，根节点为 0，子节点的顺序与 Node.children 的插入顺序一致，搜索结果的顺序与 BKTree 相同
+"""
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from array import array
+from concurrent import futures
+from typing import List
+
+import editdistance
+
+from .core import BKTree, Node, within_edit_distance
+
+MAGIC = b'BKT1'
+HEADER = struct.Struct('=4sIII')
+UINT32 = 'I'
+
+
+class FlatBKTree(BKTree):
+    """
+    只读的 BK-TREE，search / search_one 的用法与 BKTree 相同
+    """
+
+    def __init__(self, buffer, path: str = None):
+        """
+        :param buffer: save_flat 写入的文件内容，通常是 mmap
+        :param path: 文件路径，仅用于日志和错误信息
+        """
+        super().__init__(root=None)
+        self.path = path
+        self._buffer = buffer
+
+        magic, node_count, edge_count, words_size = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError('Invalid BK-TREE file: %s' % path)
+
+        self.node_count = node_count
+        view = memoryview(buffer)
+        offset = HEADER.size
+        self._word_offsets, offset = _uint32_view(view, offset, node_count + 1)
+        self._child_offsets, offset = _uint32_view(view, offset, node_count + 1)
+        self._edge_dists, offset = _uint32_view(view, offset, edge_count)
+        self._edge_children, offset = _uint32_view(view, offset, edge_count)
+        self._words = view[offset:offset + words_size]
+
+    def __len__(self):
+        return self.node_count
+
+    def insert_node(self, new_word: str):
+        raise NotImplementedError('FlatBKTree is read only')
+
+    def word(self, index: int) -> str:
+        return str(self._words[self._word_offsets[index]:self._word_offsets[index + 1]], 'utf-8')
+
+    def children(self, index: int):
+        """
+        :return: [(dist, child_index), ...]
+        """
+        start, end = self._child_offsets[index], self._child_offsets[index + 1]
+        return list(zip(self._edge_dists[start:end], self._edge_children[start:end]))
+
+    def _iter_search(self, word: str, search_dist: int):
+        """
+        与 BKTree._iter_search 相同，节点换成数组下标
+        """
+        if self.node_count == 0:
+            return
+
+        word_len = len(word)
+        seen_words = set()
+        words, word_offsets, child_offsets = self._words, self._word_offsets, self._child_offsets
+        edge_dists, edge_children = self._edge_dists, self._edge_children
+        stack = [0]
+        while stack:
+            index = stack.pop()
+            node_word = str(words[word_offsets[index]:word_offsets[index + 1]], 'utf-8')
+            start, end = child_offsets[index], child_offsets[index + 1]
+
+            len_diff = abs(len(node_word) - word_len)
+            if start != end:
+                if len_diff > search_dist + max(edge_dists[start:end]):
+                    continue
+                cur_dist = editdistance.eval(node_word, word)
+            else:
+                if len_diff > search_dist or not within_edit_distance(node_word, word, search_dist):
+                    continue
+                cur_dist = editdistance.eval(node_word, word)
+
+            if cur_dist <= search_dist and node_word not in seen_words:
+                seen_words.add(node_word)
+                yield {'word': node_word, 'edit_distance': cur_dist}
+
+            min_dist = cur_dist - search_dist
+            max_dist = cur_dist + search_dist
+            for edge in range(end - 1, start - 1, -1):
+                if min_dist <= edge_dists[edge] <= max_dist:
+                    stack.append(edge_children[edge])
+
+    def _root_handle(self):
+        return 0 if self.node_count > 0 else None
+
+    def _expand(self, index: int):
+        start, end = self._child_offsets[index], self._child_offsets[index + 1]
+        return self.word(index), self._edge_dists[start:end], self._edge_children[start:end]
+
+    def _search_multi_parallel(self, words: List[str], search_dists: List[int], processes: int):
+        """
+        把文本分块交给进程池，子进程通过 mmap 加载同一个树文件，只传输文本和结果
+        """
+        if self.path is None:
+            return self._search_multi(words, search_dists)
+
+        chunk_size = max(1, -(-len(words) // (processes * 4)))
+        pool = _get_pool(processes)
+        fs = [pool.submit(_search_multi_in_worker, self.path, words[i:i + chunk_size], search_dists[i:i + chunk_size])
+              for i in range(0, len(words), chunk_size)]
+        results = []
+        for f in fs:
+            results.extend(f.result())
+        return results
+
+    def to_node(self) -> Node:
+        """
+        还原为 Node 表示的树，用于测试和调试
+        """
+        if self.node_count == 0:
+            return None
+
+        nodes = [Node(self.word(i)) for i in range(self.node_count)]
+        for i, node in enumerate(nodes):
+            for dist, child in self.children(i):
+                node.children[dist] = nodes[child]
+        return nodes[0]
+
+
+def _uint32_view(view: memoryview, offset: int, count: int):
+    end = offset + count * 4
+    return view[offset:end].cast(UINT32), end
+
+
+def save_flat(bk_tree: BKTree, path: str):
+    """
+    先写入临时文件再 rename，多个 worker 同时生成同一棵树时不会读到写了一半的文件
+    """
+    word_offsets = array(UINT32, [0])
+    child_offsets = array(UINT32, [0])
+    edge_dists = array(UINT32)
+    edge_children = array(UINT32)
+    words = bytearray()
+
+    if bk_tree.root is not None:
+        # 第一次遍历确定每个节点的先序编号
+        order = []
+        stack = [bk_tree.root]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            stack.extend(reversed(list(node.children.values())))
+        index_of = {id(node): i for i, node in enumerate(order)}
+
+        for node in order:
+            words.extend(node.word.encode('utf-8'))
+            word_offsets.append(len(words))
+            for dist, child in node.children.items():
+                edge_dists.append(dist)
+                edge_children.append(index_of[id(child)])
+            child_offsets.append(len(edge_dists))
+
+    dir_name = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=dir_name, suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode='wb') as f:
+            f.write(HEADER.pack(MAGIC, len(word_offsets) - 1, len(edge_dists), len(words)))
+            for arr in (word_offsets, child_offsets, edge_dists, edge_children):
+                arr.tofile(f)
+            f.write(words)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_flat(path: str) -> FlatBKTree:
+    with open(path, mode='rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return FlatBKTree(buffer, path)
+
+
+# search_many 使用的进程池，key 为进程数。进程池通过 fork 创建子进程，prefork 的 worker 不是 daemon 进程，可以使用
+_pools = {}
+_pools_lock = threading.Lock()
+# 进程池的子进程中已经加载的树，key 为文件路径
+_worker_trees = {}
+
+
+def _get_pool(processes: int) -> futures.ProcessPoolExecutor:
+    with _pools_lock:
+        pool = _pools.get(processes)
+        if pool is None:
+            pool = futures.ProcessPoolExecutor(processes)
+            _pools[processes] = pool
+        return pool
+
+
+def _search_multi_in_worker(path: str, words: List[str], search_dists: List[int]):
+    tree = _worker_trees.get(path)
+    if tree is None:
+        tree = load_flat(path)
+        _worker_trees[path] = tree
+    return tree._search_multi(words, search_dists)
@@ -1,7 +1,10 @@
+import fcntl
 import os
 import json
 from . import utils
 from .core import BKTree, Node
+from .flat import load_flat, save_flat
+from .ngram import NGramIndex
 
 from ...utils import str_util
 from ocr_structuring.utils.logging import logger
@@ -9,47 +12,99 @@ from ocr_structuring.utils.logging import logger
 # 目录名称
 SOURCE_DIR_NAME = 'data'
 TREE_DIR_NAME = '.tree'
+# 二进制树文件的后缀，见 flat.py
+FLAT_TREE_EXT = '.bkt'
 
+# 索引的类型
+ENGINE_BK_TREE = 'bk_tree'
+ENGINE_NGRAM = 'ngram'
 
-def load_from_disk(working_dir, tree_name, force=False):
+
+def load_from_disk(working_dir, tree_name, force=False, engine=ENGINE_BK_TREE, tree_dir=None, build_on_miss=True):
     """
     从磁盘中读取数据入BK-TREE
-        1. 先尝试从当前目录下的 .tree 目录下读取之前已经落盘的树文件
-        2. 如果之前并没有落盘（或者树源文件MD5变化了)，则从源文件中生成树并落盘
+        1. 先尝试从 tree_dir 目录下 mmap 加载之前已经落盘的二进制树文件
+        2. 如果之前并没有落盘（或者树源文件MD5变化了)，则从 json 树文件或者源文件中生成树并落盘
         3. 如果Force为True，则强制重新从源文件中生成树
     :param working_dir: 工作目录
     :param tree_name:
     :param force: 是否强行生成
+    :param engine: ENGINE_NGRAM 时直接从源文件构建 n-gram 倒排索引，不落盘
+    :param tree_dir: 二进制树文件的目录，默认为工作目录下的 .tree
+    :param build_on_miss: 为 False 时不在加载时生成树，没有预先生成的树文件时抛出 FileNotFoundError，
+        见 scripts/cache_all_bk_trees.py
     :return:
     """
     logger.debug('Load BK tree: {}'.format(tree_name))
-    source_dir = os.path.join(working_dir, SOURCE_DIR_NAME)
-    tree_dir = os.path.join(working_dir, TREE_DIR_NAME)
-    source_file_path = os.path.join(source_dir, tree_name)
+    source_file_path = get_source_file_path(working_dir, tree_name)
+
+    if engine == ENGINE_NGRAM:
+        return NGramIndex(read_source_file(source_file_path))
+
+    if build_on_miss or force:
+        flat_file_path = build_flat(working_dir, tree_name, force=force, tree_dir=tree_dir)
+    else:
+        flat_file_path = get_flat_file_path(working_dir, tree_name, tree_dir)
+        if not os.path.exists(flat_file_path):
+            logger.error('BK-Tree file not exist: {}'.format(flat_file_path))
+            raise FileNotFoundError('BK-Tree file not exist: {}'.format(flat_file_path))
+
+    logger.debug('Load tree from flat tree file: %s' % flat_file_path)
+    return load_flat(flat_file_path)
 
+
+def get_source_file_path(working_dir, tree_name):
+    source_file_path = os.path.join(working_dir, SOURCE_DIR_NAME, tree_name)
     if not os.path.exists(source_file_path):
         logger.error('BK-Tree source file not exist: {}'.format(source_file_path))
         raise AssertionError('BK-Tree source file not exist: {}'.format(source_file_path))
+    return source_file_path
 
-    if not os.path.exists(tree_dir):
-        os.makedirs(tree_dir)
 
-    file_md5 = utils.md5(source_file_path)
-    tree_file_path = os.path.join(tree_dir, file_md5 + '.json')
+def get_flat_file_path(working_dir, tree_name, tree_dir=None):
+    """
+    :return: 二进制树文件的路径，文件名为源文件的 MD5，源文件变化以后自动失效
+    """
+    tree_dir = tree_dir or os.path.join(working_dir, TREE_DIR_NAME)
+    return os.path.join(tree_dir, utils.md5(get_source_file_path(working_dir, tree_name)) + FLAT_TREE_EXT)
 
-    if force:
-        logger.debug('Force create a new tree')
-        bk_tree = load_from_source_file(source_file_path)
-        save_to_tree_file(bk_tree, tree_file_path)
-    elif not os.path.exists(tree_file_path):  # 树文件不存在代表树之前没有落过盘
-        logger.debug('Create a new tree since there is no cache')
-        bk_tree = load_from_source_file(source_file_path)
-        save_to_tree_file(bk_tree, tree_file_path)
-    else:
-        logger.debug('Load tree from tree file: %s' % tree_file_path)
-        bk_tree = load_from_tree_file(tree_file_path)
 
-    return bk_tree
+def build_flat(working_dir, tree_name, force=False, tree_dir=None):
+    """
+    生成二进制树文件，已经存在时直接返回。
+    多个进程同时生成同一棵树时，通过文件锁保证只有一个进程生成，其它进程等待后直接使用；
+    save_flat 先写临时文件再 rename，不加锁读取的进程也不会读到写了一半的文件
+    :return: 二进制树文件的路径
+    """
+    source_file_path = get_source_file_path(working_dir, tree_name)
+    flat_file_path = get_flat_file_path(working_dir, tree_name, tree_dir)
+    if not force and os.path.exists(flat_file_path):
+        return flat_file_path
+
+    os.makedirs(os.path.dirname(flat_file_path), exist_ok=True)
+    with open(flat_file_path + '.lock', mode='a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if force:
+                logger.debug('Force create a new tree')
+                bk_tree = load_from_source_file(source_file_path)
+            elif os.path.exists(flat_file_path):
+                # 等待锁的时候其它进程已经生成了
+                return flat_file_path
+            else:
+                json_file_path = os.path.join(working_dir, TREE_DIR_NAME,
+                                              os.path.basename(flat_file_path)[:-len(FLAT_TREE_EXT)] + '.json')
+                if os.path.exists(json_file_path):
+                    # 之前版本落盘的 json 树文件，转换为二进制格式
+                    logger.debug('Convert tree file to flat format: %s' % json_file_path)
+                    bk_tree = load_from_tree_file(json_file_path)
+                else:  # 树文件不存在代表树之前没有落过盘
+                    logger.debug('Create a new tree since there is no cache')
+                    bk_tree = load_from_source_file(source_file_path)
+            save_flat(bk_tree, flat_file_path)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return flat_file_path
 
 
 class BKTreeEncoder(json.JSONEncoder):
@@ -81,15 +136,20 @@ class BKTreeDecoder(json.JSONDecoder):
             return d
 
 
+def read_source_file(source_filepath):
+    """
+    :return: 源文件中的词，每行一个，转为半角
+    """
+    with open(source_filepath, encoding='utf-8', mode='r') as f:
+        return [str_util.str_sbc_2_dbc(line.strip()) for line in f.readlines()]
+
+
 def load_from_source_file(source_filepath):
     bk_tree = BKTree()
-    with open(source_filepath, encoding='utf-8', mode='r') as f:
-        logger.debug('build bktree...')
-        for line in f.readlines():
-            word = line.strip()
-            word = str_util.str_sbc_2_dbc(word)
-            bk_tree.insert_node(word)
-        logger.debug('finish build bktree...')
+    logger.debug('build bktree...')
+    for word in read_source_file(source_filepath):
+        bk_tree.insert_node(word)
+    logger.debug('finish build bktree...')
     return bk_tree
 
 
@@ -0,0 +1,85 @@
+"""
+字符 n-gram 倒排索引，和 BKTree 一样按编辑距离模糊搜索词典。
+
+编辑距离为 d 的两个词，q-gram 的公共个数（按多重集合计算）至少为 (len - q + 1) - q * d（q-gram lemma）。
+搜索时先用倒排表统计每个词与查询词的公共 q-gram 个数，达不到下界的词不可能匹配，剩下的候选再计算编辑距离，
+结果与 BK-TREE 完全相同。词典很大、search_dist 较大时 BK-TREE 要访问很多节点，倒排索引只需要验证少量候选
+"""
+from typing import List
+
+import editdistance
+import numpy as np
+
+from .core import FuzzyIndex, within_edit_distance
+
+# 优先使用 bigram，查询词太短、bigram 的下界不大于 0 时使用单字
+GRAM_SIZES = (2, 1)
+
+
+def _grams(word: str, q: int):
+    """
+    :return: [(gram, 第几次出现), ...]，同一个 gram 出现多次时分别计数，公共个数即为多重集合的交集大小
+    """
+    seen = {}
+    grams = []
+    for i in range(len(word) - q + 1):
+        gram = word[i:i + q]
+        count = seen.get(gram, 0)
+        seen[gram] = count + 1
+        grams.append((gram, count))
+    return grams
+
+
+class NGramIndex(FuzzyIndex):
+    """
+    只读的索引，search / search_one 的用法与 BKTree 相同，结果按词在源文件中的顺序返回。
+    search_one 有多个同样好的候选时取源文件中靠前的词，与 BKTree 按遍历顺序取的词可能不同
+    """
+
+    def __init__(self, words: List[str]):
+        """
+        :param words: 词典，重复的词只保留第一个
+        """
+        self.words = list(dict.fromkeys(words))
+        self.lengths = np.array([len(w) for w in self.words], dtype=np.int32)
+
+        self.postings = {}
+        for q in GRAM_SIZES:
+            postings = {}
+            for i, word in enumerate(self.words):
+                for gram in _grams(word, q):
+                    postings.setdefault(gram, []).append(i)
+            self.postings[q] = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+
+    def __len__(self):
+        return len(self.words)
+
+    def insert_node(self, new_word: str):
+        raise NotImplementedError('NGramIndex is read only')
+
+    def candidates(self, word: str, search_dist: int) -> np.ndarray:
+        """
+        :return: 可能与 word 的编辑距离不超过 search_dist 的词的下标
+        """
+        length_ok = np.abs(self.lengths - len(word)) <= search_dist
+        for q in GRAM_SIZES:
+            threshold = (len(word) - q + 1) - q * search_dist
+            if threshold <= 0:
+                continue
+
+            postings = self.postings[q]
+            lists = [postings[gram] for gram in _grams(word, q) if gram in postings]
+            if len(lists) < threshold:
+                return np.empty(0, dtype=np.int64)
+            counts = np.bincount(np.concatenate(lists), minlength=len(self.words))
+            return np.flatnonzero((counts >= threshold) & length_ok)
+
+        # 查询词太短，没有可用的下界，只能按长度过滤
+        return np.flatnonzero(length_ok)
+
+    def _iter_search(self, word: str, search_dist: int):
+        words = self.words
+        for i in self.candidates(word, search_dist):
+            candidate = words[i]
+            if within_edit_distance(candidate, word, search_dist):
+                yield {'word': candidate, 'edit_distance': editdistance.eval(candidate, word)}
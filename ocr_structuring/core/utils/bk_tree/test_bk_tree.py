@@ -1,19 +1,131 @@
+import os
+import random
+import tempfile
 import unittest
+from concurrent import futures
 
-from ...utils.bk_tree import loader, SHANGHAI_HOSPITAL_NAME, utils, CURRENT_DIR
+import editdistance
+from distance_metrics import lcs
+
+from ...utils.bk_tree import loader, SHANGHAI_HOSPITAL_NAME, CITY, utils, CURRENT_DIR
+from ...utils.bk_tree.core import BKTree, PARALLEL_MIN_BATCH
+from ...utils.bk_tree import flat
+from ...utils.bk_tree.flat import FlatBKTree
 
 
 class TestBKTree(unittest.TestCase):
     def test_loader(self):
-        from_source_file = loader.load_from_disk(CURRENT_DIR, SHANGHAI_HOSPITAL_NAME, force=True)
-        from_tree_file = loader.load_from_disk(CURRENT_DIR, SHANGHAI_HOSPITAL_NAME)
-        utils.compare_node(from_source_file.root, from_tree_file.root)
-        self.assertTrue(True)
+        source_file_path = os.path.join(CURRENT_DIR, loader.SOURCE_DIR_NAME, SHANGHAI_HOSPITAL_NAME)
+        from_source_file = loader.load_from_source_file(source_file_path)
+        from_tree_file = loader.load_from_disk(CURRENT_DIR, SHANGHAI_HOSPITAL_NAME, force=True)
+        self.assertIsInstance(from_tree_file, FlatBKTree)
+        utils.compare_node(from_source_file.root, from_tree_file.to_node())
+
+        for text in ['复旦大学附属中山?院', '上海市第一人民医院', '华山']:
+            self.assertEqual(from_source_file.search(text, 4), from_tree_file.search(text, 4))
+
+    def test_build_flat(self):
+        with tempfile.TemporaryDirectory() as tree_dir:
+            with self.assertRaises(FileNotFoundError):
+                loader.load_from_disk(CURRENT_DIR, SHANGHAI_HOSPITAL_NAME, tree_dir=tree_dir, build_on_miss=False)
+
+            # 多个线程同时生成同一棵树
+            with futures.ThreadPoolExecutor(4) as pool:
+                paths = list(pool.map(lambda _: loader.build_flat(CURRENT_DIR, SHANGHAI_HOSPITAL_NAME,
+                                                                  tree_dir=tree_dir), range(4)))
+            self.assertEqual(1, len(set(paths)))
+            self.assertEqual(tree_dir, os.path.dirname(paths[0]))
+
+            tree = loader.load_from_disk(CURRENT_DIR, SHANGHAI_HOSPITAL_NAME, tree_dir=tree_dir, build_on_miss=False)
+            self.assertEqual(tree.search_one('复旦大学附属中山?院'), '复旦大学附属中山医院')
 
     def test_search(self):
         sh = loader.load_from_disk(CURRENT_DIR, SHANGHAI_HOSPITAL_NAME)
         self.assertEqual(sh.search_one('复旦大学附属中山?院'), '复旦大学附属中山医院')
 
+    def test_search_complete(self):
+        # 剪枝以后的搜索结果与暴力搜索一致
+        sh = loader.load_from_disk(CURRENT_DIR, SHANGHAI_HOSPITAL_NAME)
+        words = {sh.word(i) for i in range(len(sh))}
+        for text in ['复旦大学附属中山?院', '上海第一人民医院', '中山医院']:
+            for search_dist in [0, 2, 4]:
+                expected = {w for w in words if editdistance.eval(w, text) <= search_dist}
+                self.assertEqual(expected, {it['word'] for it in sh.search(text, search_dist)})
+
+    def test_ngram_index(self):
+        sh = loader.load_from_disk(CURRENT_DIR, SHANGHAI_HOSPITAL_NAME)
+        index = loader.load_from_disk(CURRENT_DIR, SHANGHAI_HOSPITAL_NAME, engine=loader.ENGINE_NGRAM)
+        for text in ['复旦大学附属中山?院', '上海第一人民医院', '中山', '']:
+            for search_dist in [0, 2, 4]:
+                self.assertEqual({it['word'] for it in sh.search(text, search_dist)},
+                                 {it['word'] for it in index.search(text, search_dist)})
+        self.assertEqual(index.search_one('复旦大学附属中山?院'), '复旦大学附属中山医院')
+
+    def test_search_one_tie_order(self):
+        # 同样好的候选取 BK-TREE 遍历顺序靠前的词，与原来的结果一致
+        city = loader.load_from_disk(CURRENT_DIR, CITY)
+        self.assertEqual('黄南藏族自治州', city.search_one('中南院族自治州'))
+
+    def test_search_one_across_engines(self):
+        sh = loader.load_from_disk(CURRENT_DIR, SHANGHAI_HOSPITAL_NAME)
+        index = loader.load_from_disk(CURRENT_DIR, SHANGHAI_HOSPITAL_NAME, engine=loader.ENGINE_NGRAM)
+        rnd = random.Random(0)
+        texts = ['复旦大学附属中山?院', '上海第一人民医院', '中山医院', '华山', '人民医院']
+        for word in rnd.sample(index.words, 50):
+            chars = list(word)
+            for _ in range(rnd.randint(1, 3)):
+                chars[rnd.randrange(len(chars))] = rnd.choice('医院人民中心?')
+            texts.append(''.join(chars))
+
+        def quality(text, word):
+            # 同样好的候选之间两种索引的选择可能不同，只比较编辑距离和最长公共子序列
+            return None if word is None else (editdistance.eval(text, word), lcs.llcs(text, word))
+
+        for kwargs in [{}, {'search_dist': 4, 'min_len': 0}, {'search_norm_dist': 0.5, 'min_len': 0}]:
+            self.assertEqual([quality(text, sh.search_one(text, **kwargs)) for text in texts],
+                             [quality(text, index.search_one(text, **kwargs)) for text in texts])
+
+    def test_search_many(self):
+        texts = ['复旦大学附属中山?院', '上海第一人民医院', '中山', '复旦大学附属中山?院', '', '华山医院']
+        for tree in [loader.load_from_disk(CURRENT_DIR, SHANGHAI_HOSPITAL_NAME),
+                     loader.load_from_source_file(os.path.join(CURRENT_DIR, loader.SOURCE_DIR_NAME,
+                                                               SHANGHAI_HOSPITAL_NAME))]:
+            for kwargs in [{}, {'search_dist': 4, 'min_len': 0}, {'search_norm_dist': 0.4, 'min_len': 0}]:
+                self.assertEqual([tree.search_one(text, **kwargs) for text in texts],
+                                 tree.search_many(texts, **kwargs))
+
+    def test_search_many_processes(self):
+        tree = loader.load_from_disk(CURRENT_DIR, SHANGHAI_HOSPITAL_NAME)
+        index = loader.load_from_disk(CURRENT_DIR, SHANGHAI_HOSPITAL_NAME, engine=loader.ENGINE_NGRAM)
+        rnd = random.Random(1)
+        texts = []
+        for word in rnd.sample([it for it in index.words if len(it) >= 5], PARALLEL_MIN_BATCH):
+            chars = list(word)
+            chars[rnd.randrange(len(chars))] = rnd.choice('医院人民中心?')
+            texts.append(''.join(chars))
+
+        # 多进程搜索的结果与当前进程中搜索相同，不支持多进程的索引直接在当前进程中搜索
+        for it in [tree, index]:
+            self.assertEqual(it.search_many(texts), it.search_many(texts, processes=2))
+        self.assertIn(2, flat._pools)
+
+    def test_cache(self):
+        tree = loader.load_from_disk(CURRENT_DIR, SHANGHAI_HOSPITAL_NAME)
+        tree.enable_cache(2, SHANGHAI_HOSPITAL_NAME)
+        self.assertEqual(tree.search_one('复旦大学附属中山?院'), '复旦大学附属中山医院')
+        self.assertIsNone(tree.search_one('这不是医院的名字啊'))
+        self.assertIn(('复旦大学附属中山?院', 2, None, 5), tree.cache)
+        self.assertEqual(tree.search_one('复旦大学附属中山?院'), '复旦大学附属中山医院')
+        self.assertIsNone(tree.search_one('这不是医院的名字啊'))
+
+        # 动态构建的树插入新的词以后缓存失效
+        dynamic = BKTree()
+        dynamic.enable_cache(10, 'dynamic')
+        dynamic.insert_node('上海市')
+        self.assertIsNone(dynamic.search_one('北京市', search_dist=1, min_len=2))
+        dynamic.insert_node('北京市')
+        self.assertEqual(dynamic.search_one('北京市', search_dist=1, min_len=2), '北京市')
+
 
 if __name__ == '__main__':
     unittest.main()
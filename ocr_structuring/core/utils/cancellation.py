@@ -0,0 +1,58 @@
+import time
+from typing import Callable
+
+
+class DeadlineExceeded(Exception):
+    """
+    请求已经超时或者被客户端取消，剩余的结构化流程不再执行
+    """
+
+
+class CancellationToken:
+    """
+    请求的取消标记。gRPC 请求的 deadline 和客户端是否断开会传到这里，
+    耗时较长的阶段（背景匹配、逐个 fg_item 解析、CRNN 重识别）开始之前调用 check()，
+    客户端已经放弃的请求提前结束，不再占用 CPU
+    """
+
+    def __init__(self, deadline: float = None, is_active: Callable[[], bool] = None):
+        """
+        :param deadline: time.monotonic() 的时间点，为 None 时没有超时时间
+        :param is_active: 返回客户端是否仍在等待结果，例如 grpc.ServicerContext.is_active
+        """
+        self.deadline = deadline
+        self.is_active = is_active
+
+    @classmethod
+    def from_grpc_context(cls, context) -> 'CancellationToken':
+        """
+        :param context: grpc.ServicerContext，客户端没有设置 deadline 时 time_remaining() 为 None 或者一个很大的值
+        """
+        deadline = None
+        time_remaining = context.time_remaining()
+        if time_remaining is not None:
+            deadline = time.monotonic() + time_remaining
+        return cls(deadline, context.is_active)
+
+    def time_remaining(self):
+        """
+        :return: 剩余的秒数，没有超时时间时返回 None
+        """
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.monotonic(), 0)
+
+    def cancelled(self) -> bool:
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return True
+        if self.is_active is not None and not self.is_active():
+            return True
+        return False
+
+    def check(self, stage: str = ''):
+        """
+        :param stage: 当前所处的阶段，记录在异常信息中
+        :raise DeadlineExceeded:
+        """
+        if self.cancelled():
+            raise DeadlineExceeded('Request cancelled or deadline exceeded before %s' % (stage or 'next stage'))
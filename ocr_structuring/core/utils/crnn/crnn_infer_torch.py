@@ -1,3 +1,5 @@
+import os
+
 import cv2
 import numpy as np
 import torch
@@ -6,7 +8,9 @@ from torchvision import transforms
 
 from ocr_structuring.core.utils.algorithm import order_points, polygon_to_to_rectangle
 from ocr_structuring.core.utils.rbox import RBox
+from ocr_structuring.core.utils.request_context import check_cancelled
 from ocr_structuring.utils.logging import logger
+from ocr_structuring.utils import metrics
 from .helper import ctc_greedy_decoder, softmax
 from .label_converter import LabelConverter
 
@@ -15,6 +19,8 @@ class CRNNInferTorch:
     IMG_HEIGHT = 32
 
     def __init__(self, torch_script_model, chars_file):
+        # 模型文件名，用作监控指标的标签
+        self.name = os.path.splitext(os.path.basename(torch_script_model))[0]
         self.converter = LabelConverter(chars_file=chars_file,
                                         ctc_invalid_index=0)
         logger.debug('Load torch script model: %s' % torch_script_model)
@@ -41,6 +47,13 @@ class CRNNInferTorch:
             raise Exception('model with input shape {} not supported !'.format(cnn_part.weight.shape[1]))
 
     def run(self, img, roi):
+        # CRNNUtil.run_xxx 都会走到这里，重识别之前检查请求是否已经取消
+        check_cancelled('crnn ' + self.name)
+        with metrics.stage_timer(metrics.STAGE_CRNN, self.name):
+            # img 可能是 LazyImage，第一次重识别时才解码
+            return self._run(np.asarray(img), roi)
+
+    def _run(self, img, roi):
         """
         :param img: 原始图像
         :param roi: 目标区域 roi, 可能是一个 (x1, y1, x2, y2) 表示的矩形，可能是一个(x1,y2,x2,y2,x3,y3,x4,y4)的四边形
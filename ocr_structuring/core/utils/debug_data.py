@@ -6,6 +6,7 @@ from typing import List
 from ocr_structuring import debugger
 
 from ocr_structuring.core.models.structure_item import StructureItem
+from ocr_structuring.core.utils.request_context import get_request_context
 
 # 定义不同类型 rect 的颜色，RGB 顺序，用于前端画图
 DEBUG_TEMPLATE_FILTER_OUTPUT_COLOR = (0, 255, 0)
@@ -146,21 +147,22 @@ def debug_filter_wrapper(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
         fg_item = args[0]
-        if fg_item.debug_data or debugger.enabled:
-            input_raw_data = [
-                [it.text, *it.bbox] for it in fg_item.get_passed_nodes().values()
-            ]
+        if not fg_item.debug_data and not debugger.enabled:
+            return func(*args, **kwargs)
+
+        input_raw_data = [
+            [it.text, *it.bbox] for it in fg_item.get_passed_nodes().values()
+        ]
 
         flag = func(*args, **kwargs)
         if flag == DEBUG_FLAG_FILTER_NOT_RUN:
             return
 
-        if fg_item.debug_data or debugger.enabled:
-            output_raw_data = [
-                [it.text, *it.bbox] for it in fg_item.get_passed_nodes().values()
-            ]
+        output_raw_data = [
+            [it.text, *it.bbox] for it in fg_item.get_passed_nodes().values()
+        ]
 
-            filter_name = func.__name__
+        filter_name = func.__name__
 
         if fg_item.debug_data:
             if filter_name != "filter_area":
@@ -180,13 +182,14 @@ def debug_filter_wrapper(func):
             )
 
         if debugger.enabled:
+            variables = get_request_context().variables
             prefix = f"{fg_item.item_name}_{filter_name}"
             if filter_name != "filter_area":
-                debugger.variables.add_group(
+                variables.add_group(
                     f"{prefix}_input", f"{prefix}_input", input_raw_data
                 )
 
-            debugger.variables.add_group(
+            variables.add_group(
                 f"{prefix}_output", f"{prefix}_output", output_raw_data
             )
 
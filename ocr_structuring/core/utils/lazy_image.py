@@ -0,0 +1,58 @@
+import cv2
+import numpy as np
+
+
+class LazyImage:
+    """
+    jpeg/png/webp 等编码后的图片，第一次访问像素时才用 cv2.imdecode 解码为 BGR 图片。
+    很多模板只用到图片的大小，只有 CRNN 重识别等后处理函数才需要像素，不需要的请求可以省掉解码的耗时。
+
+    支持 shape、切片和 np.asarray，其它属性会先解码再转发给解码后的 ndarray。
+    cv2 不接受 LazyImage，模板的 matcher、parser 函数需要把图片传给 cv2 时先调用 np.asarray(img)，
+    CRNNInferTorch.run 已经在入口处解码
+    """
+
+    def __init__(self, data: bytes, height: int = 0, width: int = 0):
+        """
+        :param data: 编码后的图片
+        :param height: 图片的高度，为 0 时访问 shape 也需要解码
+        :param width: 图片的宽度
+        """
+        self._data = data
+        self._shape = (height, width, 3) if height and width else None
+        self._image = None
+
+    @property
+    def decoded(self) -> bool:
+        return self._image is not None
+
+    @property
+    def image(self) -> np.ndarray:
+        if self._image is None:
+            image = cv2.imdecode(np.frombuffer(self._data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if image is None:
+                raise ValueError('Failed to decode image data')
+            self._image = image
+            self._shape = image.shape
+            self._data = None
+        return self._image
+
+    @property
+    def shape(self):
+        if self._shape is None:
+            return self.image.shape
+        return self._shape
+
+    def __getitem__(self, item):
+        return self.image[item]
+
+    def __array__(self, dtype=None):
+        if dtype is None:
+            return self.image
+        return self.image.astype(dtype)
+
+    def __getattr__(self, name):
+        # 只有 LazyImage 自身没有的属性才会走到这里，例如 copy、dtype
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.image, name)
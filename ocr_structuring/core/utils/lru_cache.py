@@ -0,0 +1,44 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    线程安全、容量有限的 LRU 缓存
+    """
+
+    def __init__(self, max_size: int):
+        """
+        :param max_size: 最多缓存的个数，超过以后淘汰最久没有访问的
+        """
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
@@ -0,0 +1,148 @@
+import math
+from typing import Dict, List, Tuple
+
+import cv2
+import numpy as np
+
+from .bbox import BBox
+from .node_item import NodeItem
+
+
+def _to_rects(bboxes: List[BBox]) -> np.ndarray:
+    """
+    :return: shape (n, 4)，bbox 为 None 的行为 nan
+    """
+    rects = np.full((len(bboxes), 4), np.nan)
+    for i, bbox in enumerate(bboxes):
+        if bbox is not None:
+            rects[i] = bbox.rect
+    return rects
+
+
+class NodeBatch:
+    """
+    一组 node_item 坐标的 structure-of-arrays 表示，每个请求的 matcher 阶段建立一次，
+    背景缩放、前景偏移等几何计算直接对所有 node 的 numpy 数组进行，计算结果和逐个 BBox 计算的结果相同。
+
+    rects、bg_scaled_rects、above_offset_rects 的每一行对应 nodes 中的一个 node_item，
+    不存在的 bbox 为 nan。修改 bg_scaled_bbox / above_offset_bbox 需要通过 set_xxx 方法，
+    保证数组和 node_item 一致
+    """
+
+    def __init__(self, node_items: Dict[str, NodeItem] or List[NodeItem]):
+        if isinstance(node_items, dict):
+            node_items = list(node_items.values())
+        self.nodes: List[NodeItem] = node_items
+        self.index: Dict[str, int] = {it.uid: i for i, it in enumerate(node_items)}
+
+        self.rects = _to_rects([it.bbox for it in node_items])
+        self.bg_scaled_rects = _to_rects([getattr(it, 'bg_scaled_bbox', None) for it in node_items])
+        self.above_offset_rects = _to_rects([getattr(it, 'above_offset_bbox', None) for it in node_items])
+        self._corners = None
+
+    def __len__(self):
+        return len(self.nodes)
+
+    @property
+    def uids(self) -> List[str]:
+        return [it.uid for it in self.nodes]
+
+    @property
+    def corners(self) -> np.ndarray:
+        """
+        :return: rbox 的四个顶点，shape (n, 4, 2)
+        """
+        if self._corners is None:
+            self._corners = np.array([it.rbox.points for it in self.nodes], dtype=np.float64).reshape(-1, 4, 2)
+        return self._corners
+
+    @property
+    def trans_rects(self) -> np.ndarray:
+        """
+        与 TpNodeItem.trans_bbox 相同：优先使用 above_offset_bbox，其次是 bg_scaled_bbox，最后是 bbox
+        """
+        rects = np.where(np.isnan(self.bg_scaled_rects[:, :1]), self.rects, self.bg_scaled_rects)
+        return np.where(np.isnan(self.above_offset_rects[:, :1]), rects, self.above_offset_rects)
+
+    @staticmethod
+    def heights(rects: np.ndarray) -> np.ndarray:
+        return rects[:, 3] - rects[:, 1]
+
+    @staticmethod
+    def centers(rects: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return (rects[:, 0] + rects[:, 2]) / 2, (rects[:, 1] + rects[:, 3]) / 2
+
+    @staticmethod
+    def cal_ioo(rects: np.ndarray, area) -> np.ndarray:
+        """
+        与 BBox.cal_ioo 相同，计算每个 rect 的百分之多少处于 area 中
+        :param area: BBox 或者 [left, top, right, bottom]
+        """
+        area = area.rect if isinstance(area, BBox) else area
+        x_i = np.maximum(np.minimum(rects[:, 2], area[2]) - np.maximum(rects[:, 0], area[0]), 0)
+        y_i = np.maximum(np.minimum(rects[:, 3], area[3]) - np.maximum(rects[:, 1], area[1]), 0)
+        return (x_i * y_i) / ((rects[:, 2] - rects[:, 0]) * (rects[:, 3] - rects[:, 1]) + 1e-8)
+
+    @staticmethod
+    def pairwise_ioo(rects: np.ndarray) -> np.ndarray:
+        """
+        :return: shape (n, n)，[i, j] 为 rects[i] 处于 rects[j] 中的比例
+        """
+        x_i = np.maximum(np.minimum(rects[:, 2:3], rects[:, 2]) - np.maximum(rects[:, 0:1], rects[:, 0]), 0)
+        y_i = np.maximum(np.minimum(rects[:, 3:4], rects[:, 3]) - np.maximum(rects[:, 1:2], rects[:, 1]), 0)
+        areas = (rects[:, 2] - rects[:, 0]) * (rects[:, 3] - rects[:, 1])
+        return (x_i * y_i) / (areas[:, np.newaxis] + 1e-8)
+
+    @staticmethod
+    def transform(rects: np.ndarray, offset1, scale: float = 1, angle: float = 0, offset2=(0, 0)) -> np.ndarray:
+        """
+        与 BBox.transform 相同，对所有 rect 做平移、缩放和旋转
+        """
+        trans = rects - np.array([offset1[0], offset1[1], offset1[0], offset1[1]])
+        res = trans * scale
+        if angle == 0:
+            return res
+
+        w, h = res[:, 2] - res[:, 0], res[:, 3] - res[:, 1]
+        mid_x, mid_y = (res[:, 0] + res[:, 2]) / 2, (res[:, 1] + res[:, 3]) / 2
+        rad_theta = math.radians(angle)
+        cos_theta, sin_theta = math.cos(rad_theta), math.sin(rad_theta)
+        rotated_x = mid_x * cos_theta - mid_y * sin_theta
+        rotated_y = mid_y * cos_theta + mid_x * sin_theta
+        return np.stack([
+            rotated_x - w / 2.0 + offset2[0],
+            rotated_y - h / 2.0 + offset2[1],
+            rotated_x + w / 2.0 + offset2[0],
+            rotated_y + h / 2.0 + offset2[1],
+        ], axis=1)
+
+    @staticmethod
+    def perspective_bounding_rects(rects: np.ndarray, H: np.ndarray) -> np.ndarray:
+        """
+        对 rect 的四个顶点做投影变换，返回结果的 bounding box，与逐个调用 cv2.perspectiveTransform 和
+        cv2.boundingRect 的结果相同
+        :return: shape (n, 4)，int
+        """
+        if len(rects) == 0:
+            return np.zeros((0, 4), dtype=np.int64)
+
+        points = np.stack([rects[:, [0, 1]], rects[:, [2, 1]], rects[:, [2, 3]], rects[:, [0, 3]]], axis=1)
+        trans_points = cv2.perspectiveTransform(points.reshape(1, -1, 2).astype(np.float32), H)[0]
+        trans_points = np.floor(trans_points.reshape(-1, 4, 2)).astype(np.int64)
+        # cv2.boundingRect 的宽高为 floor(max) - floor(min) + 1
+        return np.concatenate([trans_points.min(axis=1), trans_points.max(axis=1) + 1], axis=1)
+
+    def set_bg_scaled_rects(self, rects: np.ndarray):
+        self.bg_scaled_rects = np.asarray(rects, dtype=np.float64)
+        for node, rect in zip(self.nodes, rects.tolist()):
+            node.bg_scaled_bbox = BBox(rect)
+
+    def set_above_offset_rects(self, rects: np.ndarray, mask: np.ndarray = None):
+        """
+        :param mask: 只修改 mask 为 True 的 node
+        """
+        if mask is None:
+            mask = np.ones(len(self.nodes), dtype=bool)
+        self.above_offset_rects = np.where(mask[:, np.newaxis], rects, self.above_offset_rects)
+        for i in np.flatnonzero(mask):
+            self.nodes[i].above_offset_bbox = BBox(rects[i].tolist())
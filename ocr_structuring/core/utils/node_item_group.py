@@ -13,6 +13,7 @@ import numpy as np
 from ..template.tp_node_item import TpNodeItem
 from ..utils import str_util
 from ..utils.bbox import BBox
+from ..utils.node_batch import NodeBatch
 from ..utils.node_item import NodeItem
 
 
@@ -30,6 +31,10 @@ def _bbox(node: NodeItem, default_value=None):
     return getattr(node, "trans_bbox", getattr(node, "bbox", default_value))
 
 
+def _rects(node_items: List[NodeItem]) -> np.ndarray:
+    return np.array([_bbox(it).rect for it in node_items], dtype=np.float64).reshape(-1, 4)
+
+
 class NodeItemGroup:
     def __init__(
         self, node_item: NodeItem or List[NodeItem] or Dict[str, NodeItem] = None
@@ -319,33 +324,25 @@ class NodeItemGroup:
         if isinstance(node_items, list):
             node_items = {it.uid: it for it in node_items}
 
-        sum_h = 0.0
-        for it in node_items.values():
-            sum_h += _bbox(it).height
-        y_thresh = (sum_h / len(node_items)) * y_thresh
-
-        node_items = sorted(node_items.items(), key=lambda x: _bbox(x[1]).cy)
+        nodes = list(node_items.values())
+        rects = _rects(nodes)
+        # 和逐个累加的结果保持一致，不使用 np.sum
+        sum_h = sum(NodeBatch.heights(rects).tolist(), 0.0)
+        y_thresh = (sum_h / len(nodes)) * y_thresh
 
+        _, cys = NodeBatch.centers(rects)
         line_groups = []
-        for uid, it in node_items:
-            if len(line_groups) == 0:
-                line_groups.append(NodeItemGroup(it))
-                continue
-
-            appended = False
-            for group in line_groups:
-                if len(group) != 0:
-                    # 一行当中最后一个节点的 cy 坐标
-                    cy = _bbox(group[-1]).cy
-                    now_cy = _bbox(it).cy
-                    diff = abs(now_cy - cy)
-                    if diff < y_thresh:
-                        group.append(it)
-                        appended = True
-                        break
-
-            if not appended:
-                line_groups.append(NodeItemGroup(it))
+        # 每一行最后一个节点的 cy 坐标
+        last_cys = np.empty(len(nodes))
+        for i in np.argsort(cys, kind='stable'):
+            now_cy = cys[i]
+            matched = np.flatnonzero(np.abs(now_cy - last_cys[:len(line_groups)]) < y_thresh)
+            if len(matched) == 0:
+                last_cys[len(line_groups)] = now_cy
+                line_groups.append(NodeItemGroup(nodes[i]))
+            else:
+                last_cys[matched[0]] = now_cy
+                line_groups[matched[0]].append(nodes[i])
 
         for it in line_groups:
             it.sort(lambda x: _bbox(x).cx)
@@ -430,21 +427,18 @@ class NodeItemGroup:
         :param ioo_thresh:
         :return:
         """
-        remove = {uid: False for uid in node_items.keys()}
-
-        for node1 in node_items.values():
-            area1 = _bbox(node1).area
-            for node2 in node_items.values():
-                if node1.uid == node2.uid or remove[node2.uid]:
-                    continue
-
-                area2 = _bbox(node2).area
-                ioo = _bbox(node1).cal_ioo(_bbox(node2))
-                if area1 < area2 and ioo >= ioo_thresh:
-                    remove[node1.uid] = True
-                    break
-
-        remove_uids = [uid for uid, v in remove.items() if v]
+        nodes = list(node_items.values())
+        rects = _rects(nodes)
+        areas = (rects[:, 2] - rects[:, 0]) * (rects[:, 3] - rects[:, 1])
+        # [i, j] 为 True 表示 node i 比 node j 小，并且大部分处于 node j 中
+        overlap = (areas[:, np.newaxis] < areas) & (NodeBatch.pairwise_ioo(rects) >= ioo_thresh)
+
+        # 按顺序处理，已经被移除的 node 不再参与后面的判断
+        remove = np.zeros(len(nodes), dtype=bool)
+        for i in range(len(nodes)):
+            remove[i] = np.any(overlap[i] & ~remove)
+
+        remove_uids = [nodes[i].uid for i in np.flatnonzero(remove)]
         return remove_uids
 
     @staticmethod
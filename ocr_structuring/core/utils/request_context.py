@@ -0,0 +1,66 @@
+import threading
+
+from ocr_structuring.debugger.config import Vars, variables as default_variables
+from .cancellation import CancellationToken
+
+_local = threading.local()
+
+
+class RequestContext:
+    """
+    一次结构化请求的上下文，用来替代 extra_data、debugger.variables 这些进程级的单例。
+    同一个进程并发处理多个请求时，每个请求的数据互不干扰，模板、BK-TREE 和模型在请求间共享。
+
+    Session.process 会在 with 语句中激活 context，深层的代码（例如 matcher、debug_filter_wrapper）
+    可以通过 get_request_context() 获得当前线程正在处理的请求的上下文
+    """
+
+    def __init__(self, debug_data: "DebugData" = None, extra_data=None, variables: Vars = None,
+                 cancel_token: CancellationToken = None):
+        """
+        :param debug_data: 结构化工具使用的调试数据，生产环境为 None
+        :param extra_data: service.extra_data.ExtraData，请求中除文本行以外的数据，例如表格检测结果
+        :param variables: 需要上传到结构化工具的数据，只有 debugger.enabled 时才会写入
+        :param cancel_token: 请求的 deadline 和取消状态，为 None 时永不取消
+        """
+        self.debug_data = debug_data
+        self.extra_data = extra_data
+        self.variables = variables if variables is not None else Vars()
+        self.cancel_token = cancel_token if cancel_token is not None else CancellationToken()
+        # 确定了结构化类型以后由 Structuring.process 设置，用作监控指标的标签
+        self.class_name = None
+
+    def __enter__(self):
+        _get_stack().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        stack = _get_stack()
+        assert stack[-1] is self
+        stack.pop()
+
+
+def _get_stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = []
+        _local.stack = stack
+    return stack
+
+
+# 没有激活任何 context 时（例如单测中直接调用 parser）使用的上下文，保持原来写入 debugger.variables 单例的行为
+_default_context = RequestContext(variables=default_variables)
+
+
+def get_request_context() -> RequestContext:
+    stack = _get_stack()
+    if stack:
+        return stack[-1]
+    return _default_context
+
+
+def check_cancelled(stage: str = ''):
+    """
+    当前请求已经超时或者被取消时抛出 DeadlineExceeded
+    """
+    get_request_context().cancel_token.check(stage)
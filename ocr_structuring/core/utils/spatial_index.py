@@ -0,0 +1,79 @@
+import math
+from collections import defaultdict
+from typing import Dict, Hashable, List, Set
+
+from .bbox import BBox
+
+
+class SpatialIndex:
+    """
+    均匀网格空间索引，用于快速找出可能与某个区域相交的 bbox。
+    每个 bbox 登记到它覆盖的所有网格中，查询时只需要检查区域覆盖的网格，
+    返回的候选是真正相交的 bbox 的超集，调用方还需要用 cal_ioo 等方法做精确的判断
+    """
+
+    def __init__(self, bboxes: Dict[Hashable, BBox]):
+        """
+        :param bboxes: key 通常为 node_item 的 uid，value 为对应的 bbox，建立索引以后不能再修改
+        """
+        self.keys: List[Hashable] = list(bboxes.keys())
+        rects = [bboxes[k].rect for k in self.keys]
+
+        # 网格的大小取 bbox 宽、高的中位数，大部分文本行只会落在少数几个网格里
+        if rects:
+            self.cell_w = max(_median([r[2] - r[0] for r in rects]), 1)
+            self.cell_h = max(_median([r[3] - r[1] for r in rects]), 1)
+        else:
+            self.cell_w = self.cell_h = 1
+
+        self.cells = defaultdict(list)
+        for i, rect in enumerate(rects):
+            x0, y0, x1, y1 = self._cell_range(rect)
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    self.cells[(cx, cy)].append(i)
+
+        if self.cells:
+            self._min_cx = min(k[0] for k in self.cells)
+            self._max_cx = max(k[0] for k in self.cells)
+            self._min_cy = min(k[1] for k in self.cells)
+            self._max_cy = max(k[1] for k in self.cells)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def _cell_range(self, rect):
+        return (math.floor(rect[0] / self.cell_w), math.floor(rect[1] / self.cell_h),
+                math.floor(rect[2] / self.cell_w), math.floor(rect[3] / self.cell_h))
+
+    def query(self, area: BBox) -> Set[Hashable]:
+        """
+        :return: 可能与 area 相交（包括边界接触）的 bbox 的 key
+        """
+        if not self.cells:
+            return set()
+
+        x0, y0, x1, y1 = self._cell_range(area.rect)
+        x0, x1 = max(x0, self._min_cx), min(x1, self._max_cx)
+        y0, y1 = max(y0, self._min_cy), min(y1, self._max_cy)
+
+        indexes = set()
+        cells = self.cells
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(cells):
+            # 区域比较大时直接遍历所有非空的网格
+            for (cx, cy), items in cells.items():
+                if x0 <= cx <= x1 and y0 <= cy <= y1:
+                    indexes.update(items)
+        else:
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    items = cells.get((cx, cy))
+                    if items:
+                        indexes.update(items)
+
+        return {self.keys[i] for i in indexes}
+
+
+def _median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
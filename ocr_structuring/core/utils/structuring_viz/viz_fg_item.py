@@ -14,6 +14,10 @@ def get_par_dir(file_path, loop=3):
 
 
 def viz_area_filter(func):
+    if not cfgs.VIZ_AREA_FILTER:
+        # 没有打开可视化时不做包装，生产环境没有额外的开销
+        return func
+
     @functools.wraps(func)
     def wrapper(self, area_item):
         func(self, area_item)
@@ -47,6 +51,10 @@ def viz_area_filter(func):
 
 
 def viz_pre_func(func):
+    if not cfgs.VIZ_PRE_FUNC:
+        # 没有打开可视化时不做包装，生产环境没有额外的开销
+        return func
+
     @functools.wraps(func)
     def wrapper(self, img):
         if cfgs.VIZ_PRE_FUNC and common_plot_condition(self):
@@ -77,6 +85,10 @@ def viz_pre_func(func):
 
 
 def viz_regex_filter(func):
+    if not cfgs.VIZ_REGEX_FILTER:
+        # 没有打开可视化时不做包装，生产环境没有额外的开销
+        return func
+
     @functools.wraps(func)
     def wrapper(self):
         func(self)
@@ -92,6 +104,10 @@ def viz_regex_filter(func):
 
 
 def viz_post_func(func):
+    if not cfgs.VIZ_POST_FUNC:
+        # 没有打开可视化时不做包装，生产环境没有额外的开销
+        return func
+
     @functools.wraps(func)
     def wrapper(self, img):
         if cfgs.VIZ_POST_FUNC and common_plot_condition(self):
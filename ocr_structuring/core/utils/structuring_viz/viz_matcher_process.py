@@ -37,6 +37,10 @@ def above_item_offset(self, node_items, img):
 
 
 def viz_bg_scale_and_above_offset(func):
+    if not cfgs.VIZ_BG_SCALE_AND_ABOVE_OFFSET:
+        # 没有打开可视化时不做包装，生产环境没有额外的开销
+        return func
+
     @functools.wraps(func)
     def wrapper(self, *args, **kwargs):
         func(self, *args, **kwargs)
@@ -64,6 +68,10 @@ def viz_bg_scale_and_above_offset(func):
 
 
 def viz_above_item_offset_iou(func):
+    if not cfgs.VIZ_ABOVE_OFFSET_DETAIL:
+        # 没有打开可视化时不做包装，生产环境没有额外的开销
+        return func
+
     @functools.wraps(func)
     def wrapper(self, node_items, *args, **kwargs):
         if self.debug_data is not None and \
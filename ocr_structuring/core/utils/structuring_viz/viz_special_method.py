@@ -16,6 +16,10 @@ def viz_crnn_result(crnn_res, crnn_rect, img):
 
 
 def viz_post_crnn_date(func):
+    if not cfgs.VIZ_POST_CRNN_FUNC:
+        # 没有打开可视化时不做包装，生产环境没有额外的开销
+        return func
+
     @functools.wraps(func)
     def wrapper(self, item_name, passed_nodes, node_items, img):
         res = func(self, item_name, passed_nodes, node_items, img)
@@ -8,6 +8,10 @@ from ..structuring_viz import cfgs
 
 
 def viz_tmpl_post_func(func):
+    if not cfgs.VIZ_TMPL_POST_FUNC:
+        # 没有打开可视化时不做包装，生产环境没有额外的开销
+        return func
+
     @functools.wraps(func)
     def wrapper(self, structure_items, fg_items , img):
         res = func(self, structure_items, fg_items , img)
@@ -182,14 +182,21 @@ class TableStructured(object):
 
     def get_entities(self):
 
-        # 先定位名称
+        # 先定位名称，明细项在 BK-TREE 中的查询最后批量进行
+        detail_items = []
         for x, row in enumerate(self.rows):
             for y, label in enumerate(row):
                 if not self.check_label_name(label.name):
                     continue
                 if self.check_summary and self.check_summary_item(label, x, y):
                     continue
-                self.check_detail_item(label, x, y)
+                names = self._get_detail_names(label)
+                if names is not None:
+                    detail_items.append((label, x, y, *names))
+
+        bk_check_names = self._search_detail_names([it[3] for it in detail_items])
+        for (label, x, y, label_name, temp_name), bk_check_name in zip(detail_items, bk_check_names):
+            self._add_detail_item(label, x, y, label_name, temp_name, bk_check_name)
 
     def get_rows(self, offset=0.5):
         """
@@ -288,7 +295,18 @@ class TableStructured(object):
         self._create_pq(col_idx)
 
     def check_detail_item(self, label, x, y):
+        names = self._get_detail_names(label)
+        if names is None:
+            return
+
+        label_name, temp_name = names
+        bk_check_name = self._search_detail_names([label_name])[0]
+        self._add_detail_item(label, x, y, label_name, temp_name, bk_check_name)
 
+    def _get_detail_names(self, label):
+        """
+        :return: (label_name, temp_name)，不是明细项时返回 None
+        """
         # 先过滤和替换一些特殊符号
         modify = {'（': '(', '）': ')', '_': ''}
 
@@ -301,7 +319,7 @@ class TableStructured(object):
         check_result = gru_model.run(label_name)
 
         if not check_result:
-            return
+            return None
 
         temp_name = label_name.replace('中药饮片及药材/', '')
 
@@ -310,13 +328,29 @@ class TableStructured(object):
 
         regx = re.compile(self.detail_name_char_filter)
         temp_name = regx.sub('', temp_name)
+        return label_name, temp_name
 
-        bk_check_name = None
-
+    def _search_detail_names(self, label_names):
+        """
+        按照 detail_trees 的顺序查询，前面的树没有查到的再查后面的树
+        """
+        results = [None] * len(label_names)
+        pending = list(range(len(label_names)))
         for detail_tree in self.detail_trees:
-            bk_check_name = detail_tree().search_one(label_name, search_norm_dist=0.4, min_len=len(temp_name) - 1)
-            if bk_check_name:
+            if not pending:
                 break
+            # 原先逐个查询时 min_len 为 len(temp_name) - 1，temp_name 是从 label_name 中删除字符得到的，不会起作用
+            found = detail_tree().search_many([label_names[i] for i in pending], search_norm_dist=0.4, min_len=0)
+            pending_next = []
+            for i, bk_check_name in zip(pending, found):
+                if bk_check_name:
+                    results[i] = bk_check_name
+                else:
+                    pending_next.append(i)
+            pending = pending_next
+        return results
+
+    def _add_detail_item(self, label, x, y, label_name, temp_name, bk_check_name):
         temp_name = temp_name if len(temp_name) > 1 else label_name
         temp_name = bk_check_name if bk_check_name else temp_name
 
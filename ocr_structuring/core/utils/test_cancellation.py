@@ -0,0 +1,25 @@
+import time
+from unittest import TestCase
+
+from ocr_structuring.core.utils.cancellation import CancellationToken, DeadlineExceeded
+from ocr_structuring.core.utils.request_context import RequestContext, check_cancelled
+
+
+class TestCancellationToken(TestCase):
+    def test_never_cancelled(self):
+        token = CancellationToken()
+        self.assertFalse(token.cancelled())
+        self.assertIsNone(token.time_remaining())
+        check_cancelled()
+
+    def test_deadline(self):
+        token = CancellationToken(deadline=time.monotonic() - 1)
+        self.assertTrue(token.cancelled())
+        with RequestContext(cancel_token=token):
+            with self.assertRaises(DeadlineExceeded):
+                check_cancelled('bg_scale')
+
+    def test_client_gone(self):
+        token = CancellationToken(deadline=time.monotonic() + 60, is_active=lambda: False)
+        with self.assertRaises(DeadlineExceeded):
+            token.check()
@@ -0,0 +1,23 @@
+from unittest import TestCase
+
+import cv2
+import numpy as np
+
+from ocr_structuring.core.utils.lazy_image import LazyImage
+
+
+class TestLazyImage(TestCase):
+    def setUp(self):
+        self.img = np.random.randint(0, 255, (40, 60, 3), dtype=np.uint8)
+        self.data = cv2.imencode('.png', self.img)[1].tobytes()
+
+    def test_shape_without_decode(self):
+        img = LazyImage(self.data, 40, 60)
+        self.assertEqual((40, 60, 3), img.shape)
+        self.assertFalse(img.decoded)
+
+    def test_decode_on_pixel_access(self):
+        img = LazyImage(self.data)
+        self.assertTrue(np.array_equal(self.img[5:10, 3:9], img[5:10, 3:9]))
+        self.assertTrue(img.decoded)
+        self.assertTrue(np.array_equal(self.img, np.asarray(img)))
@@ -0,0 +1,15 @@
+from unittest import TestCase
+
+from ocr_structuring.core.utils.lru_cache import LRUCache
+
+
+class TestLRUCache(TestCase):
+    def test_evict(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', None)
+        self.assertEqual(1, cache.get('a'))
+        cache.put('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertEqual(0, cache.get('b', 0))
+        self.assertEqual(2, len(cache))
@@ -0,0 +1,104 @@
+import random
+from unittest import TestCase
+
+import cv2
+import numpy as np
+
+from ocr_structuring.core.template.tp_node_item import TpNodeItem
+from ocr_structuring.core.utils.bbox import BBox
+from ocr_structuring.core.utils.node_batch import NodeBatch
+from ocr_structuring.core.utils.node_item import NodeItem
+from ocr_structuring.core.utils.node_item_group import NodeItemGroup
+
+
+def _random_nodes(rnd, n, cls=NodeItem):
+    nodes = []
+    for i in range(n):
+        left, top = rnd.randint(0, 1000), rnd.randint(0, 1000)
+        right, bottom = left + rnd.randint(1, 300), top + rnd.randint(1, 40)
+        nodes.append(cls(['text%d' % i, left, top, right, bottom, 1, 1]))
+    return nodes
+
+
+class TestNodeBatch(TestCase):
+    def setUp(self):
+        self.rnd = random.Random(0)
+
+    def test_trans_rects(self):
+        nodes = _random_nodes(self.rnd, 20, TpNodeItem)
+        for i, node in enumerate(nodes):
+            if i % 2 == 0:
+                node.bg_scaled_bbox = BBox([v * 1.5 for v in node.bbox.rect])
+            if i % 3 == 0:
+                node.above_offset_bbox = BBox([v + 10.5 for v in node.trans_bbox.rect])
+        batch = NodeBatch({it.uid: it for it in nodes})
+        self.assertEqual([it.trans_bbox.rect for it in nodes], batch.trans_rects.tolist())
+
+        # 修改以后数组和 node 保持一致
+        mask = np.array([i % 4 == 0 for i in range(len(nodes))])
+        batch.set_above_offset_rects(NodeBatch.transform(batch.trans_rects, (-3, 4)), mask)
+        self.assertEqual([it.trans_bbox.rect for it in nodes], batch.trans_rects.tolist())
+
+    def test_transform(self):
+        nodes = _random_nodes(self.rnd, 50)
+        batch = NodeBatch(nodes)
+        for args in [((-5, 7),), ((120.5, 33.2), 0.8), ((120.5, 33.2), 1.2, 1.7, (300.1, 20.9))]:
+            expected = [it.bbox.transform(*args).rect for it in nodes]
+            self.assertEqual(expected, NodeBatch.transform(batch.rects, *args).tolist())
+
+    def test_perspective_bounding_rects(self):
+        nodes = _random_nodes(self.rnd, 50)
+        src = np.array([[0, 0], [1000, 0], [1000, 1000], [0, 1000]], dtype=np.float32)
+        dst = np.array([[13, -20], [1035, 17], [990, 1020], [-8, 981]], dtype=np.float32)
+        H = cv2.getPerspectiveTransform(src, dst)
+
+        expected = []
+        for node in nodes:
+            trans_points = cv2.perspectiveTransform(np.array([node.bbox.points]).astype(np.float32), H)[0]
+            x, y, w, h = cv2.boundingRect(trans_points)
+            expected.append([x, y, x + w, y + h])
+        self.assertEqual(expected, NodeBatch.perspective_bounding_rects(NodeBatch(nodes).rects, H).tolist())
+
+    def test_cal_ioo(self):
+        nodes = _random_nodes(self.rnd, 50)
+        rects = NodeBatch(nodes).rects
+        area = BBox([200, 300, 700, 800])
+        self.assertEqual([it.bbox.cal_ioo(area) for it in nodes], NodeBatch.cal_ioo(rects, area).tolist())
+
+        ioo = NodeBatch.pairwise_ioo(rects)
+        for i, j in [(0, 1), (3, 7), (10, 10)]:
+            self.assertEqual(nodes[i].bbox.cal_ioo(nodes[j].bbox), ioo[i, j])
+
+    def test_find_overlap(self):
+        nodes = _random_nodes(self.rnd, 300)
+        node_items = {it.uid: it for it in nodes}
+
+        remove = {uid: False for uid in node_items}
+        for node1 in nodes:
+            for node2 in nodes:
+                if node1.uid == node2.uid or remove[node2.uid]:
+                    continue
+                if node1.bbox.area < node2.bbox.area and node1.bbox.cal_ioo(node2.bbox) >= 0.5:
+                    remove[node1.uid] = True
+                    break
+        expected = [uid for uid, v in remove.items() if v]
+
+        self.assertTrue(len(expected) > 0)
+        self.assertEqual(expected, NodeItemGroup.find_overlap(node_items, 0.5))
+
+    def test_find_row_lines(self):
+        nodes = _random_nodes(self.rnd, 200)
+        y_thresh = sum(it.bbox.height for it in nodes) / len(nodes) * 0.3
+
+        expected = []
+        for node in sorted(nodes, key=lambda x: x.bbox.cy):
+            for group in expected:
+                if abs(node.bbox.cy - group[-1].bbox.cy) < y_thresh:
+                    group.append(node)
+                    break
+            else:
+                expected.append([node])
+        expected = [[it.uid for it in sorted(group, key=lambda x: x.bbox.cx)] for group in expected]
+
+        line_groups = NodeItemGroup.find_row_lines(nodes, y_thresh=0.3)
+        self.assertEqual(expected, [[it.uid for it in group.node_items] for group in line_groups])
@@ -0,0 +1,24 @@
+import threading
+from unittest import TestCase
+
+from ocr_structuring.core.utils.request_context import RequestContext, get_request_context
+
+
+class TestRequestContext(TestCase):
+    def test_nested(self):
+        default = get_request_context()
+        outer, inner = RequestContext(), RequestContext()
+        with outer:
+            self.assertIs(outer, get_request_context())
+            with inner:
+                self.assertIs(inner, get_request_context())
+            self.assertIs(outer, get_request_context())
+        self.assertIs(default, get_request_context())
+
+    def test_thread_isolation(self):
+        res = []
+        with RequestContext() as context:
+            t = threading.Thread(target=lambda: res.append(get_request_context()))
+            t.start()
+            t.join()
+        self.assertIsNot(context, res[0])
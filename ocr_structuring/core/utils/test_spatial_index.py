@@ -0,0 +1,31 @@
+import random
+from unittest import TestCase
+
+from ocr_structuring.core.utils.bbox import BBox
+from ocr_structuring.core.utils.spatial_index import SpatialIndex
+
+
+def _random_bbox(rnd, max_w, max_h):
+    left, top = rnd.randint(-20, 1000), rnd.randint(-20, 1000)
+    return BBox([left, top, left + rnd.randint(0, max_w), top + rnd.randint(0, max_h)])
+
+
+class TestSpatialIndex(TestCase):
+    def test_query(self):
+        rnd = random.Random(0)
+        bboxes = {i: _random_bbox(rnd, 300, 40) for i in range(500)}
+        index = SpatialIndex(bboxes)
+        for _ in range(200):
+            area = _random_bbox(rnd, 600, 600)
+            candidates = index.query(area)
+            expected = {k for k, v in bboxes.items() if v.cal_ioo(area) > 0}
+            self.assertTrue(expected <= candidates)
+
+        # 覆盖所有 bbox 的区域
+        self.assertEqual(set(bboxes), index.query(BBox([-100, -100, 2000, 2000])))
+        self.assertEqual(set(), index.query(BBox([3000, 3000, 3100, 3100])))
+
+    def test_empty(self):
+        index = SpatialIndex({})
+        self.assertEqual(0, len(index))
+        self.assertEqual(set(), index.query(BBox([0, 0, 10, 10])))
@@ -1,7 +1,6 @@
 from contextlib import contextmanager
 
 from ocr_structuring.core.utils.node_item import NodeItem
-from .config import variables
 
 _CURRENT_CONTEXT_STACK = []
 
@@ -45,7 +44,10 @@ class DebugContext:
         if len(node_items) == 0:
             return
 
-        variables.add_nodes(
+        # 延迟 import，避免和 debugger 包循环引用
+        from ocr_structuring.core.utils.request_context import get_request_context
+
+        get_request_context().variables.add_nodes(
             f"{self._current_prefix}/{name}",
             f"{self._current_prefix}/{name}",
             node_items,
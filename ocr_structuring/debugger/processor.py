@@ -11,12 +11,14 @@ import cv2
 from tqdm import tqdm
 
 from ocr_structuring import debugger
+from ocr_structuring.core.utils.request_context import RequestContext
 from ocr_structuring.protos.structuring_pb2 import StructuringRequest, StructuringRequestRotated, BBox, RotatedBox, \
     SingleDetectionResult
 from ocr_structuring.service.main import Session
 from ocr_structuring.service.request_processor import RequestProcessor
 from ocr_structuring.service.util import dump_image
 from ocr_structuring.utils.logging import logger
+from ocr_structuring.utils.system import get_available_cpu_count as _get_available_cpu_count
 
 # pytorch CPU 模式下和 multiprocessing 一起使用时会很慢
 # Issue: https://github.com/pytorch/pytorch/issues/9873
@@ -119,7 +121,8 @@ class Processor:
                 class_name=self.config.class_name,
                 primary_class=self.config.primary_class,
                 secondary_class=self.config.secondary_class,
-                ltrb=False
+                ltrb=False,
+                context=RequestContext(variables=debugger.variables)
             )
         else:  # 新rawdata
             start_time = time.time()
@@ -128,6 +131,7 @@ class Processor:
             # 开始结构化
 
             structure_result = self.request_processor.process(request, rpc_name, self.config.preload_tpl,
+                                                              context=RequestContext(variables=debugger.variables),
                                                               item_name=item_name)
 
         process_duration = time.time() - start_time
@@ -398,16 +402,3 @@ def _process_pool_initializer(debug_enabled):
     # spawn模式下子进程不会继承父进程的变量，需要在这里初始化
     debugger.enabled = debug_enabled
 
-
-def _get_available_cpu_count():
-    """
-    获取可用的CPU个数，如果使用了cgroup来控制cpu使用配额，从读取该值，否则使用系统提供的获取cpu
-    :return:
-    """
-    if os.path.isfile('/sys/fs/cgroup/cpu/cpu.cfs_quota_us'):
-        cpu_quota = int(open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us').read().rstrip())
-        if cpu_quota != -1 and os.path.isfile('/sys/fs/cgroup/cpu/cpu.cfs_period_us'):
-            cpu_period = int(open('/sys/fs/cgroup/cpu/cpu.cfs_period_us').read().rstrip())
-            return int(cpu_quota / cpu_period)
-
-    return os.cpu_count()
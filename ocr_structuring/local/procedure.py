@@ -14,10 +14,11 @@ from tornado import ioloop, httpclient
 from tqdm import tqdm
 
 from ocr_structuring.core.utils.debug_data import DebugData
+from ocr_structuring.core.utils.request_context import RequestContext
 from ocr_structuring.service.main import Session
 from ocr_structuring.utils.load_ai_data import ai_data_2_raw_data
 from .image import rotate_image_by_90, rotate_image, rotate_image_expand
-from ..service.extra_data import extra_data
+from ..service.extra_data import ExtraData
 
 logger = logging.getLogger('run_structure')
 log_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(filename)s[:%(lineno)d] - %(message)s')
@@ -124,6 +125,7 @@ class MyProcessor:
 
         with open(str(raw_file), mode='r', encoding='utf-8') as f:
             data = json.load(f)
+        extra_data = ExtraData()
         extra_data.read_data_from_file(data)
         if 'subjects' in data:
             # AI output format detected. Transfer it
@@ -147,7 +149,8 @@ class MyProcessor:
                                                 gt_img,
                                                 class_name=self.class_name,
                                                 debug_data=debug_data,
-                                                ltrb=self.ltrb)
+                                                ltrb=self.ltrb,
+                                                context=RequestContext(debug_data, extra_data))
         end_time = time.time()
         debug_data.process_time['session.process'] = (end_time - start_time) * 1000
         debug_data.set_structure_result(structure_result['data'])
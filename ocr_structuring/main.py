@@ -1,47 +1,205 @@
+import os
 import time
 import grpc
+import signal
+import socket
+import contextlib
 import multiprocessing
-from concurrent import futures
 from adder.secure import TimeValidator
 from datetime import datetime
 from ocr_structuring.settings import MyConfig
+from ocr_structuring.utils import metrics
 from ocr_structuring.utils.logging import logger
-from adder.service import HealthServer, MetricsServer
+from ocr_structuring.utils.system import get_available_cpu_count
+from adder.service import MetricsServer
+from ocr_structuring.service.admission import create_admission_interceptors, create_thread_pool
 from ocr_structuring.service.grpc_server import StructuringServer
+from ocr_structuring.service.health import ReadinessHealthServer
+from ocr_structuring.service.warm_up import set_ready
 from adder.protos import add_HealthServicer_to_server, add_MetricsServicer_to_server
 from ocr_structuring.protos.structuring_pb2_grpc import add_StructuringServicer_to_server
 
 
-def setup_grpc_server(port):
+def setup_grpc_server(port, reuse_port=False, warm_up=False):
+    """
+    :param port:
+    :param reuse_port: 多进程模式下所有 worker 通过 SO_REUSEPORT 共享同一个端口，由内核分发连接
+    :param warm_up: 是否预热。单进程模式下 server 先开始监听，预热完成之前健康检查返回 NOT_SERVING；
+        多进程模式下内核会把连接分发给所有监听端口的 worker，所以 worker 预热完成之后才开始监听
+    """
     cfg = MyConfig()
-    grpc_server = grpc.server(futures.ThreadPoolExecutor(
-        max_workers=1),
-        options=[
-            ('grpc.max_receive_message_length', cfg.grpc_max_message_length.value),
-            ('grpc.max_send_message_length', cfg.grpc_max_message_length.value)
-        ],
+    options = [
+        ('grpc.max_receive_message_length', cfg.grpc_max_message_length.value),
+        ('grpc.max_send_message_length', cfg.grpc_max_message_length.value),
+    ]
+    if reuse_port:
+        options.append(('grpc.so_reuseport', 1))
+
+    structuring_server = StructuringServer()
+    if warm_up and reuse_port:
+        structuring_server.warm_up(cfg)
+
+    grpc_server = grpc.server(
+        create_thread_pool(cfg),
+        options=options,
         maximum_concurrent_rpcs=cfg.grpc_max_concurrent.value,
+        interceptors=create_admission_interceptors(cfg),
     )
-    add_StructuringServicer_to_server(servicer=StructuringServer(), server=grpc_server)
+    add_StructuringServicer_to_server(servicer=structuring_server, server=grpc_server)
     add_MetricsServicer_to_server(servicer=MetricsServer(cfg), server=grpc_server)
-    add_HealthServicer_to_server(servicer=HealthServer(), server=grpc_server)
+    add_HealthServicer_to_server(servicer=ReadinessHealthServer(), server=grpc_server)
     grpc_server.add_insecure_port('[::]:%s' % port)
     grpc_server.start()
     logger.info('grpc server starts serving at %s' % port)
+
+    if warm_up and not reuse_port:
+        structuring_server.warm_up(cfg)
+    else:
+        set_ready()
     return grpc_server
 
 
+def get_worker_count(cfg: MyConfig) -> int:
+    """
+    GRPC_WORKERS 为 0 时根据 cgroup 的 CPU 配额确定 worker 个数
+    """
+    return cfg.grpc_workers.value or get_available_cpu_count()
+
+
+@contextlib.contextmanager
+def _reserve_port(port):
+    """
+    在父进程中占住端口，保证所有 worker 都能通过 SO_REUSEPORT 绑定到同一个端口
+    """
+    sock = socket.socket(socket.AF_INET6, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    if sock.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT) == 0:
+        raise RuntimeError('Failed to set SO_REUSEPORT')
+    sock.bind(('', int(port)))
+    try:
+        yield sock
+    finally:
+        sock.close()
+
+
+# 父进程退出时等待 worker 退出的秒数
+WORKER_STOP_GRACE = 10
+
+
+def _run_worker(port):
+    # worker 退出由父进程通过 SIGTERM 通知
+    signal.signal(signal.SIGTERM, lambda *args: os._exit(0))
+    server = setup_grpc_server(port, reuse_port=True, warm_up=bool(MyConfig().warm_up.value))
+    logger.info('grpc worker [%s] is ready' % os.getpid())
+    try:
+        while True:
+            time.sleep(60 * 60 * 24)  # 1 天
+    except KeyboardInterrupt:
+        server.stop(0)
+
+
+def _start_worker(port):
+    # 使用 fork：父进程中没有加载任何模型，也没有创建 grpc 对象，可以安全 fork。
+    # daemon 进程不能创建子进程，所以 worker 不是 daemon，由父进程在 stop 中结束
+    worker = multiprocessing.get_context('fork').Process(target=_run_worker, args=(port,), daemon=False)
+    worker.start()
+    return worker
+
+
+class PreforkServer:
+    """
+    预先 fork 多个 worker 进程，每个进程拥有各自加载好的 Session，
+    结构化是 CPU 密集型任务，多进程可以绕过 GIL，吞吐量随 CPU 个数增长
+    """
+
+    def __init__(self, port, worker_count, metrics_port=0):
+        """
+        :param metrics_port: 不为 0 时在这个端口以 HTTP 导出所有 worker 汇总的 metrics，见 utils/metrics.py
+        """
+        self.port = port
+        self.worker_count = worker_count
+        self.metrics_port = metrics_port
+        self.workers = []
+        self._port_context = None
+
+    def start(self):
+        # torch 在多进程下每个进程默认会占满所有核，这里限制每个 worker 使用单线程
+        os.environ.setdefault('OMP_NUM_THREADS', '1')
+        self._port_context = _reserve_port(self.port)
+        self._port_context.__enter__()
+        self._start_metrics()
+        for _ in range(self.worker_count):
+            self.workers.append(_start_worker(self.port))
+        logger.info('grpc server starts serving at %s with %s workers' % (self.port, self.worker_count))
+        return self
+
+    def _start_metrics(self):
+        if metrics.multiprocess_dir() is None:
+            logger.warning('PROMETHEUS_MULTIPROC_DIR is not set, metrics of each grpc worker are exported separately')
+            return
+        metrics.prepare_multiprocess_dir()
+        if self.metrics_port:
+            metrics.start_multiprocess_http_server(self.metrics_port)
+            logger.info('metrics of all grpc workers are exported at %s' % self.metrics_port)
+
+    def check_workers(self):
+        """
+        重启意外退出的 worker
+        """
+        for i, worker in enumerate(self.workers):
+            if not worker.is_alive():
+                logger.warning('grpc worker [%s] exited with code %s, restart it' % (worker.pid, worker.exitcode))
+                metrics.mark_worker_dead(worker.pid)
+                self.workers[i] = _start_worker(self.port)
+
+    def stop(self, grace=None):
+        """
+        :param grace: 等待 worker 退出的秒数，超时以后 SIGKILL，为 None 时一直等待
+        """
+        for worker in self.workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in self.workers:
+            worker.join(grace)
+            if worker.is_alive():
+                logger.warning('grpc worker [%s] did not exit in %ss, kill it' % (worker.pid, grace))
+                os.kill(worker.pid, signal.SIGKILL)
+                worker.join()
+            metrics.mark_worker_dead(worker.pid)
+        self.workers = []
+        if self._port_context is not None:
+            self._port_context.__exit__(None, None, None)
+            self._port_context = None
+
+
+def _wait(server, seconds):
+    if isinstance(server, PreforkServer):
+        deadline = time.time() + seconds
+        while time.time() < deadline:
+            server.check_workers()
+            time.sleep(5)
+    else:
+        time.sleep(seconds)
+
+
 if __name__ == '__main__':
     config = MyConfig()
     multiprocessing.freeze_support()
-    server = setup_grpc_server(config.grpc_port.value)
+    worker_count = get_worker_count(config)
+    if worker_count > 1:
+        server = PreforkServer(config.grpc_port.value, worker_count, config.metrics_port.value).start()
+        # worker 不是 daemon 进程，父进程收到 SIGTERM 时也要走到下面的 stop 结束所有 worker
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+    else:
+        server = setup_grpc_server(config.grpc_port.value, warm_up=bool(config.warm_up.value))
+    stop_grace = WORKER_STOP_GRACE if isinstance(server, PreforkServer) else 0
     validator = TimeValidator(datetime(year=2019, month=9, day=24), datetime(year=2029, month=9, day=25))
     try:
         while validator.validate():
-            time.sleep(60)  # 1 分钟
-        server.stop(0)
+            _wait(server, 60)  # 1 分钟
+        server.stop(stop_grace)
         while True:
             time.sleep(60 * 60 * 24)  # 1 天
     except KeyboardInterrupt:
-        server.stop(0)
+        server.stop(stop_grace)
         logger.info('grpc server stop serving')
@@ -19,7 +19,7 @@ DESCRIPTOR = _descriptor.FileDescriptor(
   package='ocr_structuring',
   syntax='proto3',
   serialized_options=None,
-  serialized_pb=_b('\n(ocr_structuring/protos/structuring.proto\x12\x0focr_structuring\"W\n\tImageData\x12\r\n\x05width\x18\x01 \x01(\x05\x12\x0e\n\x06height\x18\x02 \x01(\x05\x12\x10\n\x08\x63hannels\x18\x03 \x01(\x05\x12\x0c\n\x04\x64\x61ta\x18\x04 \x01(\x0c\x12\x0b\n\x03shm\x18\x05 \x01(\t\"{\n\nRotatedBox\x12\n\n\x02x1\x18\x01 \x01(\x05\x12\n\n\x02y1\x18\x02 \x01(\x05\x12\n\n\x02x2\x18\x03 \x01(\x05\x12\n\n\x02y2\x18\x04 \x01(\x05\x12\n\n\x02x3\x18\x05 \x01(\x05\x12\n\n\x02y3\x18\x06 \x01(\x05\x12\n\n\x02x4\x18\x07 \x01(\x05\x12\n\n\x02y4\x18\x08 \x01(\x05\x12\r\n\x05\x61ngle\x18\t \x01(\x02\"@\n\x04\x42\x42ox\x12\x0c\n\x04left\x18\x01 \x01(\x05\x12\x0b\n\x03top\x18\x02 \x01(\x05\x12\r\n\x05right\x18\x03 \x01(\x05\x12\x0e\n\x06\x62ottom\x18\x04 \x01(\x05\"t\n\x13TextFullDataRotated\x12\x0c\n\x04word\x18\x01 \x01(\t\x12)\n\x04rbox\x18\x02 \x01(\x0b\x32\x1b.ocr_structuring.RotatedBox\x12\r\n\x05label\x18\x03 \x01(\x05\x12\x15\n\rprobabilities\x18\x04 \x03(\x02\"\xe3\x02\n\x19StructuringRequestRotated\x12=\n\x0ftexts_full_data\x18\x01 \x03(\x0b\x32$.ocr_structuring.TextFullDataRotated\x12\x0f\n\x07version\x18\x02 \x01(\t\x12.\n\nimage_data\x18\x03 \x01(\x0b\x32\x1a.ocr_structuring.ImageData\x12\x12\n\nclass_name\x18\x04 \x01(\t\x12\x15\n\rprimary_class\x18\x05 \x01(\x05\x12\x17\n\x0fsecondary_class\x18\x06 \x01(\x05\x12?\n\x11labeled_bbox_list\x18\x07 \x03(\x0b\x32$.ocr_structuring.RotatedBoxWithLabel\x12\x41\n\x11\x64\x65tection_results\x18\x08 \x03(\x0b\x32&.ocr_structuring.SingleDetectionResult\"g\n\x0cTextFullData\x12\x0c\n\x04word\x18\x01 \x01(\t\x12#\n\x04\x62\x62ox\x18\x02 \x01(\x0b\x32\x15.ocr_structuring.BBox\x12\r\n\x05label\x18\x03 \x01(\x05\x12\x15\n\rprobabilities\x18\x04 \x03(\x02\"O\n\x13RotatedBoxWithLabel\x12)\n\x04\x62\x62ox\x18\x01 \x01(\x0b\x32\x1b.ocr_structuring.RotatedBox\x12\r\n\x05label\x18\x03 \x01(\x05\"\xd5\x02\n\x12StructuringRequest\x12\x36\n\x0ftexts_full_data\x18\x01 \x03(\x0b\x32\x1d.ocr_structuring.TextFullData\x12\x0f\n\x07version\x18\x02 \x01(\t\x12.\n\nimage_data\x18\x03 \x01(\x0b\x32\x1a.ocr_structuring.ImageData\x12\x12\n\nclass_name\x18\x04 \x01(\t\x12\x15\n\rprimary_class\x18\x05 \x01(\x05\x12\x17\n\x0fsecondary_class\x18\x06 \x01(\x05\x12?\n\x11labeled_bbox_list\x18\x07 \x03(\x0b\x32$.ocr_structuring.RotatedBoxWithLabel\x12\x41\n\x11\x64\x65tection_results\x18\x08 \x03(\x0b\x32&.ocr_structuring.SingleDetectionResult\"X\n\x15SingleDetectionResult\x12?\n\x11labeled_bbox_list\x18\x07 \x03(\x0b\x32$.ocr_structuring.RotatedBoxWithLabel\"+\n\x13StructuringTimeInfo\x12\x14\n\x0c\x65lapsed_time\x18\x01 \x01(\x03\"\x89\x01\n\x13StructuringResponse\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\t\x12\x37\n\ttime_info\x18\x04 \x01(\x0b\x32$.ocr_structuring.StructuringTimeInfo\x12\x0c\n\x04meta\x18\x05 \x01(\t\"\x84\x02\n\x0fSingleImageInfo\x12=\n\x0ftexts_full_data\x18\x01 \x03(\x0b\x32$.ocr_structuring.TextFullDataRotated\x12.\n\nimage_data\x18\x02 \x01(\x0b\x32\x1a.ocr_structuring.ImageData\x12?\n\x11labeled_bbox_list\x18\x03 \x03(\x0b\x32$.ocr_structuring.RotatedBoxWithLabel\x12\x41\n\x11\x64\x65tection_results\x18\x04 \x03(\x0b\x32&.ocr_structuring.SingleDetectionResult\"\x7f\n\x1cMultiImageStructuringRequest\x12:\n\x10multi_image_info\x18\x01 \x03(\x0b\x32 .ocr_structuring.SingleImageInfo\x12\x0f\n\x07version\x18\x02 \x01(\t\x12\x12\n\nclass_name\x18\x03 \x01(\t2\xb7\x02\n\x0bStructuring\x12V\n\x07Process\x12#.ocr_structuring.StructuringRequest\x1a$.ocr_structuring.StructuringResponse\"\x00\x12\x64\n\x0eProcessRotated\x12*.ocr_structuring.StructuringRequestRotated\x1a$.ocr_structuring.StructuringResponse\"\x00\x12j\n\x11ProcessMultiImage\x12-.ocr_structuring.MultiImageStructuringRequest\x1a$.ocr_structuring.StructuringResponse\"\x00\x62\x06proto3')
+  serialized_pb=_b('\n(ocr_structuring/protos/structuring.proto\x12\x0focr_structuring\"i\n\tImageData\x12\r\n\x05width\x18\x01 \x01(\x05\x12\x0e\n\x06height\x18\x02 \x01(\x05\x12\x10\n\x08\x63hannels\x18\x03 \x01(\x05\x12\x0c\n\x04\x64\x61ta\x18\x04 \x01(\x0c\x12\x0b\n\x03shm\x18\x05 \x01(\t\x12\x10\n\x08\x65ncoding\x18\x06 \x01(\t\"{\n\nRotatedBox\x12\n\n\x02x1\x18\x01 \x01(\x05\x12\n\n\x02y1\x18\x02 \x01(\x05\x12\n\n\x02x2\x18\x03 \x01(\x05\x12\n\n\x02y2\x18\x04 \x01(\x05\x12\n\n\x02x3\x18\x05 \x01(\x05\x12\n\n\x02y3\x18\x06 \x01(\x05\x12\n\n\x02x4\x18\x07 \x01(\x05\x12\n\n\x02y4\x18\x08 \x01(\x05\x12\r\n\x05\x61ngle\x18\t \x01(\x02\"@\n\x04\x42\x42ox\x12\x0c\n\x04left\x18\x01 \x01(\x05\x12\x0b\n\x03top\x18\x02 \x01(\x05\x12\r\n\x05right\x18\x03 \x01(\x05\x12\x0e\n\x06\x62ottom\x18\x04 \x01(\x05\"t\n\x13TextFullDataRotated\x12\x0c\n\x04word\x18\x01 \x01(\t\x12)\n\x04rbox\x18\x02 \x01(\x0b\x32\x1b.ocr_structuring.RotatedBox\x12\r\n\x05label\x18\x03 \x01(\x05\x12\x15\n\rprobabilities\x18\x04 \x03(\x02\"\xf2\x02\n\x19StructuringRequestRotated\x12=\n\x0ftexts_full_data\x18\x01 \x03(\x0b\x32$.ocr_structuring.TextFullDataRotated\x12\x0f\n\x07version\x18\x02 \x01(\t\x12.\n\nimage_data\x18\x03 \x01(\x0b\x32\x1a.ocr_structuring.ImageData\x12\x12\n\nclass_name\x18\x04 \x01(\t\x12\x15\n\rprimary_class\x18\x05 \x01(\x05\x12\x17\n\x0fsecondary_class\x18\x06 \x01(\x05\x12?\n\x11labeled_bbox_list\x18\x07 \x03(\x0b\x32$.ocr_structuring.RotatedBoxWithLabel\x12\x41\n\x11\x64\x65tection_results\x18\x08 \x03(\x0b\x32&.ocr_structuring.SingleDetectionResult\x12\r\n\x05\x64\x65\x62ug\x18\t \x01(\x08\"g\n\x0cTextFullData\x12\x0c\n\x04word\x18\x01 \x01(\t\x12#\n\x04\x62\x62ox\x18\x02 \x01(\x0b\x32\x15.ocr_structuring.BBox\x12\r\n\x05label\x18\x03 \x01(\x05\x12\x15\n\rprobabilities\x18\x04 \x03(\x02\"O\n\x13RotatedBoxWithLabel\x12)\n\x04\x62\x62ox\x18\x01 \x01(\x0b\x32\x1b.ocr_structuring.RotatedBox\x12\r\n\x05label\x18\x03 \x01(\x05\"\xe4\x02\n\x12StructuringRequest\x12\x36\n\x0ftexts_full_data\x18\x01 \x03(\x0b\x32\x1d.ocr_structuring.TextFullData\x12\x0f\n\x07version\x18\x02 \x01(\t\x12.\n\nimage_data\x18\x03 \x01(\x0b\x32\x1a.ocr_structuring.ImageData\x12\x12\n\nclass_name\x18\x04 \x01(\t\x12\x15\n\rprimary_class\x18\x05 \x01(\x05\x12\x17\n\x0fsecondary_class\x18\x06 \x01(\x05\x12?\n\x11labeled_bbox_list\x18\x07 \x03(\x0b\x32$.ocr_structuring.RotatedBoxWithLabel\x12\x41\n\x11\x64\x65tection_results\x18\x08 \x03(\x0b\x32&.ocr_structuring.SingleDetectionResult\x12\r\n\x05\x64\x65\x62ug\x18\t \x01(\x08\"X\n\x15SingleDetectionResult\x12?\n\x11labeled_bbox_list\x18\x07 \x03(\x0b\x32$.ocr_structuring.RotatedBoxWithLabel\"+\n\x13StructuringTimeInfo\x12\x14\n\x0c\x65lapsed_time\x18\x01 \x01(\x03\"\x89\x01\n\x13StructuringResponse\x12\x0c\n\x04\x63ode\x18\x01 \x01(\x05\x12\x0f\n\x07message\x18\x02 \x01(\t\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\t\x12\x37\n\ttime_info\x18\x04 \x01(\x0b\x32$.ocr_structuring.StructuringTimeInfo\x12\x0c\n\x04meta\x18\x05 \x01(\t\"\x84\x02\n\x0fSingleImageInfo\x12=\n\x0ftexts_full_data\x18\x01 \x03(\x0b\x32$.ocr_structuring.TextFullDataRotated\x12.\n\nimage_data\x18\x02 \x01(\x0b\x32\x1a.ocr_structuring.ImageData\x12?\n\x11labeled_bbox_list\x18\x03 \x03(\x0b\x32$.ocr_structuring.RotatedBoxWithLabel\x12\x41\n\x11\x64\x65tection_results\x18\x04 \x03(\x0b\x32&.ocr_structuring.SingleDetectionResult\"\x8e\x01\n\x1cMultiImageStructuringRequest\x12:\n\x10multi_image_info\x18\x01 \x03(\x0b\x32 .ocr_structuring.SingleImageInfo\x12\x0f\n\x07version\x18\x02 \x01(\t\x12\x12\n\nclass_name\x18\x03 \x01(\t\x12\r\n\x05\x64\x65\x62ug\x18\x04 \x01(\x08\x32\x98\x03\n\x0bStructuring\x12V\n\x07Process\x12#.ocr_structuring.StructuringRequest\x1a$.ocr_structuring.StructuringResponse\"\x00\x12\x64\n\x0eProcessRotated\x12*.ocr_structuring.StructuringRequestRotated\x1a$.ocr_structuring.StructuringResponse\"\x00\x12j\n\x11ProcessMultiImage\x12-.ocr_structuring.MultiImageStructuringRequest\x1a$.ocr_structuring.StructuringResponse\"\x00\x12_\n\x0cProcessBatch\x12#.ocr_structuring.StructuringRequest\x1a$.ocr_structuring.StructuringResponse\"\x00(\x01\x30\x01\x62\x06proto3')
 )
 
 
@@ -67,6 +67,13 @@ _IMAGEDATA = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='encoding', full_name='ocr_structuring.ImageData.encoding', index=5,
+      number=6, type=9, cpp_type=9, label=1,
+      has_default_value=False, default_value=_b("").decode('utf-8'),
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -80,7 +87,7 @@ _IMAGEDATA = _descriptor.Descriptor(
   oneofs=[
   ],
   serialized_start=61,
-  serialized_end=148,
+  serialized_end=166,
 )
 
 
@@ -166,8 +173,8 @@ _ROTATEDBOX = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=150,
-  serialized_end=273,
+  serialized_start=168,
+  serialized_end=291,
 )
 
 
@@ -218,8 +225,8 @@ _BBOX = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=275,
-  serialized_end=339,
+  serialized_start=293,
+  serialized_end=357,
 )
 
 
@@ -270,8 +277,8 @@ _TEXTFULLDATAROTATED = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=341,
-  serialized_end=457,
+  serialized_start=359,
+  serialized_end=475,
 )
 
 
@@ -338,6 +345,13 @@ _STRUCTURINGREQUESTROTATED = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='debug', full_name='ocr_structuring.StructuringRequestRotated.debug', index=8,
+      number=9, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -350,8 +364,8 @@ _STRUCTURINGREQUESTROTATED = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=460,
-  serialized_end=815,
+  serialized_start=478,
+  serialized_end=848,
 )
 
 
@@ -402,8 +416,8 @@ _TEXTFULLDATA = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=817,
-  serialized_end=920,
+  serialized_start=850,
+  serialized_end=953,
 )
 
 
@@ -440,8 +454,8 @@ _ROTATEDBOXWITHLABEL = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=922,
-  serialized_end=1001,
+  serialized_start=955,
+  serialized_end=1034,
 )
 
 
@@ -508,6 +522,13 @@ _STRUCTURINGREQUEST = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='debug', full_name='ocr_structuring.StructuringRequest.debug', index=8,
+      number=9, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -520,8 +541,8 @@ _STRUCTURINGREQUEST = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1004,
-  serialized_end=1345,
+  serialized_start=1037,
+  serialized_end=1393,
 )
 
 
@@ -551,8 +572,8 @@ _SINGLEDETECTIONRESULT = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1347,
-  serialized_end=1435,
+  serialized_start=1395,
+  serialized_end=1483,
 )
 
 
@@ -582,8 +603,8 @@ _STRUCTURINGTIMEINFO = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1437,
-  serialized_end=1480,
+  serialized_start=1485,
+  serialized_end=1528,
 )
 
 
@@ -641,8 +662,8 @@ _STRUCTURINGRESPONSE = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1483,
-  serialized_end=1620,
+  serialized_start=1531,
+  serialized_end=1668,
 )
 
 
@@ -693,8 +714,8 @@ _SINGLEIMAGEINFO = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1623,
-  serialized_end=1883,
+  serialized_start=1671,
+  serialized_end=1931,
 )
 
 
@@ -726,6 +747,13 @@ _MULTIIMAGESTRUCTURINGREQUEST = _descriptor.Descriptor(
       message_type=None, enum_type=None, containing_type=None,
       is_extension=False, extension_scope=None,
       serialized_options=None, file=DESCRIPTOR),
+    _descriptor.FieldDescriptor(
+      name='debug', full_name='ocr_structuring.MultiImageStructuringRequest.debug', index=3,
+      number=4, type=8, cpp_type=7, label=1,
+      has_default_value=False, default_value=False,
+      message_type=None, enum_type=None, containing_type=None,
+      is_extension=False, extension_scope=None,
+      serialized_options=None, file=DESCRIPTOR),
   ],
   extensions=[
   ],
@@ -738,8 +766,8 @@ _MULTIIMAGESTRUCTURINGREQUEST = _descriptor.Descriptor(
   extension_ranges=[],
   oneofs=[
   ],
-  serialized_start=1885,
-  serialized_end=2012,
+  serialized_start=1934,
+  serialized_end=2076,
 )
 
 _TEXTFULLDATAROTATED.fields_by_name['rbox'].message_type = _ROTATEDBOX
@@ -874,8 +902,8 @@ _STRUCTURING = _descriptor.ServiceDescriptor(
   file=DESCRIPTOR,
   index=0,
   serialized_options=None,
-  serialized_start=2015,
-  serialized_end=2326,
+  serialized_start=2079,
+  serialized_end=2487,
   methods=[
   _descriptor.MethodDescriptor(
     name='Process',
@@ -904,6 +932,15 @@ _STRUCTURING = _descriptor.ServiceDescriptor(
     output_type=_STRUCTURINGRESPONSE,
     serialized_options=None,
   ),
+  _descriptor.MethodDescriptor(
+    name='ProcessBatch',
+    full_name='ocr_structuring.Structuring.ProcessBatch',
+    index=3,
+    containing_service=None,
+    input_type=_STRUCTURINGREQUEST,
+    output_type=_STRUCTURINGRESPONSE,
+    serialized_options=None,
+  ),
 ])
 _sym_db.RegisterServiceDescriptor(_STRUCTURING)
 
@@ -29,6 +29,11 @@ class StructuringStub(object):
         request_serializer=ocr__structuring_dot_protos_dot_structuring__pb2.MultiImageStructuringRequest.SerializeToString,
         response_deserializer=ocr__structuring_dot_protos_dot_structuring__pb2.StructuringResponse.FromString,
         )
+    self.ProcessBatch = channel.stream_stream(
+        '/ocr_structuring.Structuring/ProcessBatch',
+        request_serializer=ocr__structuring_dot_protos_dot_structuring__pb2.StructuringRequest.SerializeToString,
+        response_deserializer=ocr__structuring_dot_protos_dot_structuring__pb2.StructuringResponse.FromString,
+        )
 
 
 class StructuringServicer(object):
@@ -56,6 +61,13 @@ class StructuringServicer(object):
     context.set_details('Method not implemented!')
     raise NotImplementedError('Method not implemented!')
 
+  def ProcessBatch(self, request_iterator, context):
+    """多页文档在一个 stream 中依次发送每一页，按请求的顺序返回结果
+    """
+    context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+    context.set_details('Method not implemented!')
+    raise NotImplementedError('Method not implemented!')
+
 
 def add_StructuringServicer_to_server(servicer, server):
   rpc_method_handlers = {
@@ -74,6 +86,11 @@ def add_StructuringServicer_to_server(servicer, server):
           request_deserializer=ocr__structuring_dot_protos_dot_structuring__pb2.MultiImageStructuringRequest.FromString,
           response_serializer=ocr__structuring_dot_protos_dot_structuring__pb2.StructuringResponse.SerializeToString,
       ),
+      'ProcessBatch': grpc.stream_stream_rpc_method_handler(
+          servicer.ProcessBatch,
+          request_deserializer=ocr__structuring_dot_protos_dot_structuring__pb2.StructuringRequest.FromString,
+          response_serializer=ocr__structuring_dot_protos_dot_structuring__pb2.StructuringResponse.SerializeToString,
+      ),
   }
   generic_handler = grpc.method_handlers_generic_handler(
       'ocr_structuring.Structuring', rpc_method_handlers)
@@ -0,0 +1,217 @@
+"""
+准入控制：每个 worker 同一时间只处理一个结构化请求，其它结构化请求按到达的顺序排队。
+排队中和处理中的请求预计需要的耗时超过预算，或者请求个数达到上限时，新的结构化请求直接返回 RESOURCE_EXHAUSTED，
+让客户端尽快重试其它 worker，而不是排队等到超时。
+
+排队的请求会占用 grpc 线程池的线程，线程池的大小为请求个数上限加上 SERVICE_THREADS，
+保证结构化请求（包括很长的 ProcessBatch stream）处理中时，健康检查和 metrics 仍然有空闲的线程可以响应。
+
+预计耗时 = 请求个数 * 最近请求的平均耗时（指数加权平均）
+
+流式请求会返回多个结果，平均耗时按单个结果的处理耗时计算，不包括等待客户端发送请求和发送结果的时间
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent import futures
+
+import grpc
+
+from ocr_structuring.utils import metrics
+from ocr_structuring.utils.logging import logger
+
+# 平均耗时的平滑系数
+EWMA_ALPHA = 0.2
+# grpc 线程池中留给健康检查、metrics 等非结构化请求的线程个数
+SERVICE_THREADS = 2
+
+
+class AdmissionController:
+    def __init__(self, budget: float, initial_cost: float = 1.0, max_pending: int = 0):
+        """
+        :param budget: 排队的工作量预算，单位秒，小于等于 0 时不限制
+        :param initial_cost: 还没有处理过请求时，假设每个请求的耗时，单位秒
+        :param max_pending: 排队中和处理中的请求个数上限，小于等于 0 时不限制
+        """
+        self.budget = budget
+        self.avg_cost = initial_cost
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._seq = 0
+        # 已经准入但是还没有开始处理的请求，key 为准入的序号
+        self._queued = OrderedDict()
+        self._running = 0
+        # 按线程开始执行请求的顺序依次处理，被取消的请求不会执行，也就不会领取号码
+        self._turn = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._queued) + self._running
+
+    def queued_work(self) -> float:
+        """
+        :return: 排队中和处理中的请求预计需要的耗时，单位秒
+        """
+        return self.pending_count * self.avg_cost
+
+    def admit(self):
+        """
+        :return: 准入的序号，超出预算时返回 None
+        """
+        with self._lock:
+            if self.budget > 0 and self.queued_work() >= self.budget:
+                return None
+            if 0 < self.max_pending <= self.pending_count:
+                return None
+            self._seq += 1
+            self._queued[self._seq] = None
+            return self._seq
+
+    def start(self, seq: int):
+        """
+        等待前面的请求处理完，再开始处理 seq。
+        线程池按照先进先出的顺序执行，开始处理 seq 时，比它早的请求要么已经开始处理，要么在排队时被客户端取消了，
+        grpc 不会再执行被取消的请求，这里一并从队列中移除
+        """
+        with self._turn:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            self._turn.wait_for(lambda: self._serving == ticket)
+
+        with self._lock:
+            while self._queued:
+                first = next(iter(self._queued))
+                if first > seq:
+                    break
+                del self._queued[first]
+            self._running += 1
+
+    def finish(self, elapsed: float, count: int = 1):
+        """
+        :param elapsed: 请求的处理耗时，单位秒
+        :param count: 请求返回的结果个数，流式请求按单个结果的耗时更新平均耗时，没有结果时不更新
+        """
+        with self._lock:
+            self._running -= 1
+            if count > 0:
+                self.avg_cost = (1 - EWMA_ALPHA) * self.avg_cost + EWMA_ALPHA * elapsed / count
+
+        with self._turn:
+            self._serving += 1
+            self._turn.notify_all()
+
+    def describe(self) -> str:
+        return '%s pending requests (max %s), queued work %.2fs (budget %.2fs)' % (
+            self.pending_count, self.max_pending, self.queued_work(), self.budget)
+
+
+class AdmissionInterceptor(grpc.ServerInterceptor):
+    """
+    intercept_service 在 grpc 的轮询线程中调用，早于请求进入线程池队列，
+    所以可以在排队之前拒绝请求
+    """
+
+    def __init__(self, controller: AdmissionController, service_name: str = 'ocr_structuring.Structuring'):
+        self.controller = controller
+        self.method_prefix = '/%s/' % service_name
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None or not handler_call_details.method.startswith(self.method_prefix):
+            return handler
+
+        seq = self.controller.admit()
+        if seq is None:
+            metrics.count_admission_rejected()
+            logger.warning('reject %s, %s' % (handler_call_details.method, self.controller.describe()))
+            return _rejected_handler(handler, self.controller)
+
+        return _tracked_handler(handler, self.controller, seq)
+
+
+def _rejected_handler(handler, controller: AdmissionController):
+    def abort(request_or_iterator, context):
+        context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, controller.describe())
+
+    if handler.request_streaming and handler.response_streaming:
+        return grpc.stream_stream_rpc_method_handler(
+            abort, handler.request_deserializer, handler.response_serializer)
+    return grpc.unary_unary_rpc_method_handler(
+        abort, handler.request_deserializer, handler.response_serializer)
+
+
+def _tracked_handler(handler, controller: AdmissionController, seq: int):
+    if handler.request_streaming and handler.response_streaming:
+        behavior = handler.stream_stream
+
+        def stream_stream(request_iterator, context):
+            controller.start(seq)
+            # 只统计生成结果的耗时，等待客户端发送请求、yield 以后等待 grpc 发送结果的时间不算在内
+            wait = [0]
+            elapsed = 0
+            count = 0
+
+            def timed_requests():
+                requests = iter(request_iterator)
+                while True:
+                    start_time = time.monotonic()
+                    try:
+                        request = next(requests)
+                    except StopIteration:
+                        return
+                    finally:
+                        wait[0] += time.monotonic() - start_time
+                    yield request
+
+            try:
+                responses = iter(behavior(timed_requests(), context))
+                while True:
+                    start_time = time.monotonic()
+                    try:
+                        response = next(responses)
+                    except StopIteration:
+                        break
+                    finally:
+                        elapsed += time.monotonic() - start_time
+                    count += 1
+                    yield response
+            finally:
+                controller.finish(max(elapsed - wait[0], 0), count)
+
+        return grpc.stream_stream_rpc_method_handler(
+            stream_stream, handler.request_deserializer, handler.response_serializer)
+
+    behavior = handler.unary_unary
+
+    def unary_unary(request, context):
+        controller.start(seq)
+        start_time = time.monotonic()
+        try:
+            return behavior(request, context)
+        finally:
+            controller.finish(time.monotonic() - start_time)
+
+    return grpc.unary_unary_rpc_method_handler(
+        unary_unary, handler.request_deserializer, handler.response_serializer)
+
+
+def create_admission_interceptors(cfg) -> list:
+    """
+    :param cfg: settings.MyConfig
+    :return: grpc.server 的 interceptors 参数
+    """
+    budget_ms = cfg.admission_budget_ms.value or 0
+    return [AdmissionInterceptor(AdmissionController(budget_ms / 1000, max_pending=get_max_pending(cfg)))]
+
+
+def get_max_pending(cfg) -> int:
+    return max(cfg.grpc_max_pending.value or 1, 1)
+
+
+def create_thread_pool(cfg) -> futures.ThreadPoolExecutor:
+    """
+    :return: grpc.server 的线程池，排队中和处理中的结构化请求各占一个线程，另外保留 SERVICE_THREADS 个线程
+    """
+    return futures.ThreadPoolExecutor(max_workers=get_max_pending(cfg) + SERVICE_THREADS)
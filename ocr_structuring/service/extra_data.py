@@ -1,16 +1,22 @@
 import os
 
 
+def _load_fields():
+    with open(os.path.join(os.path.dirname(__file__), 'extra_data_fields.txt')) as f:
+        return [line.strip() for line in f.readlines()]
+
+
+FIELDS = _load_fields()
+
+
 class ExtraData:
+    """
+    请求中除文本行以外的数据，每个请求创建一个，通过 RequestContext 传递
+    """
+
     def __init__(self):
-        self.fields = []
+        self.fields = list(FIELDS)
         self.data = {}
-        self.add_field()
-
-    def add_field(self):
-        with open(os.path.join(os.path.dirname(__file__), 'extra_data_fields.txt')) as f:
-            for line in f.readlines():
-                self.fields.append(line.strip())
 
     def read_data_from_request(self, request):
         try:
@@ -53,6 +59,3 @@ class ExtraData:
             self.data["labeled_bbox_list"] = bbox_list
         except:
             self.data["labeled_bbox_list"] = []
-
-
-extra_data = ExtraData()
@@ -2,105 +2,126 @@ import json
 import threading
 import traceback
 from datetime import datetime
+
+import grpc
+
+from ..core.utils.cancellation import CancellationToken, DeadlineExceeded
+from ..core.utils.request_context import RequestContext
 from ..protos.structuring_pb2 import StructuringResponse
 from ..protos.structuring_pb2_grpc import StructuringServicer
 from ..protos.structuring_pb2 import StructuringTimeInfo
+from ..utils.logging import logger
+from ..utils import metrics
+from . import warm_up
+
+# 请求超时或者被取消时 StructuringResponse 中的 code
+DEADLINE_EXCEEDED_CODE = 504000
 
 
 class StructuringServer(StructuringServicer):
     request_processor = None
     lock = threading.Lock()
 
+    def init_request_processor(self):
+        if self.request_processor is None:
+            with self.lock:
+                if self.request_processor is None:
+                    from ocr_structuring.settings import MyConfig
+                    from .request_processor import RequestProcessor
+                    from .result_cache import create_result_cache
+                    self.request_processor = RequestProcessor(create_result_cache(MyConfig()))
+        return self.request_processor
+
+    def warm_up(self, cfg):
+        """
+        提前加载 Session（模板、分类器等）和配置中指定的 BK-TREE、CRNN 模型，完成后健康检查才返回 SERVING。
+        预热失败时仍然开始服务，没有加载的资源在请求中再 lazy 加载
+        """
+        try:
+            warm_up.warm_up(self.init_request_processor(), cfg)
+        except Exception:
+            logger.exception('warm up failed')
+        finally:
+            warm_up.set_ready()
+
     def Process(self, request, context):
         try:
-            if self.request_processor is None:
-                with self.lock:
-                    if self.request_processor is None:
-                        from .request_processor import RequestProcessor
-                        self.request_processor = RequestProcessor()
+            self.init_request_processor()
         except Exception as e:
             traceback.print_exc()
             return StructuringResponse(
                 code=500000,
                 message='%s: %s' % (e, traceback.format_exc())
             )
-        response = StructuringResponse(code=500001, message='NOT_IMPLEMENTED')
-        start_time = datetime.now()
+        return self._process(request, "Process", context)
 
-        try:
-            structuring_data = self.request_processor.process(
-                request, "Process"
-            )
+    def ProcessRotated(self, request, context):
+        self.init_request_processor()
+        return self._process(request, "ProcessRotated", context)
 
-            response = StructuringResponse(
-                code=0,
-                message='ok',
-                data=json.dumps(structuring_data['data'], default=lambda obj: obj.__dict__),
-                meta=json.dumps(structuring_data['metadata']),
-            )
-            return
-        except BaseException as e:
-            response = StructuringResponse(
-                code=500000,
-                message='%s: %s' % (e, traceback.format_exc())
-            )
-            traceback.print_exc()
-            return
-        finally:
-            response.time_info.CopyFrom(StructuringTimeInfo(
-                elapsed_time=int((datetime.now() - start_time).total_seconds() * 10 ** 9)
-            ))
-            return response
+    def ProcessMultiImage(self, request, context):
+        self.init_request_processor()
+        return self._process(request, "ProcessMultiImage", context)
 
-    def ProcessRotated(self, request, context):
-        if self.request_processor is None:
-            from .request_processor import RequestProcessor
-            self.request_processor = RequestProcessor()
-        response = StructuringResponse(code=500001, message='NOT_IMPLEMENTED')
-        start_time = datetime.now()
+    def ProcessBatch(self, request_iterator, context):
+        """
+        多页文档在一个 stream 中依次发送每一页，按请求的顺序返回结果。
+        整个 stream 复用同一个 Session，某一页处理失败只影响这一页的 response
+        """
         try:
-            structuring_data = self.request_processor.process(
-                request, "ProcessRotated"
-            )
-
-            response = StructuringResponse(
-                code=0,
-                message='ok',
-                data=json.dumps(structuring_data['data'], default=lambda obj: obj.__dict__),
-                meta=json.dumps(structuring_data['metadata']),
-            )
-            return
-        except BaseException as e:
-            response = StructuringResponse(
+            self.init_request_processor()
+        except Exception as e:
+            traceback.print_exc()
+            yield StructuringResponse(
                 code=500000,
                 message='%s: %s' % (e, traceback.format_exc())
             )
-            traceback.print_exc()
             return
-        finally:
-            response.time_info.CopyFrom(StructuringTimeInfo(
-                elapsed_time=int((datetime.now() - start_time).total_seconds() * 10 ** 9)
-            ))
-            return response
 
-    def ProcessMultiImage(self, request, context):
-        if self.request_processor is None:
-            from .request_processor import RequestProcessor
-            self.request_processor = RequestProcessor()
+        for request in request_iterator:
+            response = self._process(request, "Process", context)
+            yield response
+            if response.code == DEADLINE_EXCEEDED_CODE:
+                # deadline 对整个 stream 生效，超时以后剩余的页也不再处理
+                return
+
+    def _process(self, request, rpc_name, context) -> StructuringResponse:
+        """
+        :param context: grpc.ServicerContext，请求的 deadline 和客户端是否断开会传给结构化流程，
+            超时或者取消时提前结束，grpc 状态码为 DEADLINE_EXCEEDED 或 CANCELLED
+        """
         response = StructuringResponse(code=500001, message='NOT_IMPLEMENTED')
         start_time = datetime.now()
+
         try:
+            cancel_token = CancellationToken.from_grpc_context(context)
+            # 在队列中等待的时候可能已经超时了
+            cancel_token.check(rpc_name)
             structuring_data = self.request_processor.process(
-                request, "ProcessMultiImage"
+                request, rpc_name, context=RequestContext(cancel_token=cancel_token)
             )
 
+            with metrics.stage_timer(metrics.STAGE_JSON_SERIALIZATION,
+                                     class_name=structuring_data['metadata']['class_name']):
+                data = json.dumps(structuring_data['data'], default=lambda obj: obj.__dict__)
+                meta = json.dumps(structuring_data['metadata'])
+
             response = StructuringResponse(
                 code=0,
                 message='ok',
-                data=json.dumps(structuring_data['data'], default=lambda obj: obj.__dict__),
-                meta=json.dumps(structuring_data['metadata']),
+                data=data,
+                meta=meta,
             )
             return
+        except DeadlineExceeded as e:
+            logger.warning('%s aborted: %s' % (rpc_name, e))
+            if context.is_active():
+                context.set_code(grpc.StatusCode.DEADLINE_EXCEEDED)
+            else:
+                context.set_code(grpc.StatusCode.CANCELLED)
+            context.set_details(str(e))
+            response = StructuringResponse(code=DEADLINE_EXCEEDED_CODE, message=str(e))
+            return
         except BaseException as e:
             response = StructuringResponse(
                 code=500000,
@@ -0,0 +1,15 @@
+from adder.service import HealthServer
+
+from .warm_up import is_ready
+
+
+class ReadinessHealthServer(HealthServer):
+    """
+    warm up 完成之前返回 NOT_SERVING，避免负载均衡在 Session 加载完之前把请求转发过来
+    """
+
+    def Check(self, request, context):
+        response = super().Check(request, context)
+        if not is_ready():
+            response.status = response.NOT_SERVING
+        return response
@@ -4,7 +4,9 @@ from ocr_structuring.core.models.structure_item import StructureItem
 from .class_names import ClassNamesBase, check_class_names_duplicated
 from ..core.structuring import Structuring
 from ..core.utils.debug_data import DebugData
+from ..core.utils.request_context import RequestContext
 from ..tfidf_classifier import TfidfClassifier
+from ..utils import metrics
 
 
 class Session:
@@ -22,7 +24,8 @@ class Session:
                 primary_class: int = None,
                 secondary_class: int = None,
                 ltrb=True,
-                debug_data: DebugData = None, **kwargs):
+                debug_data: DebugData = None,
+                context: RequestContext = None, **kwargs):
         """
         :param raw_data:
                 ltrb==False [text, x1, y1, x2, y2, x3, y3, x4, y4, angle, label, probability]
@@ -32,6 +35,7 @@ class Session:
         :param primary_class: 如果没有指定 class_name，则通过一级分类（二级分类）对所有 tfidf 支持的分类进行过滤，再使用 tfidf 分类
         :param secondary_class: 二级分类只有在指定了一级分类的情况下才有意义
         :param ltrb: raw_data 的格式
+        :param context: 请求的上下文，为 None 时创建一个新的 context
 
         :return:
             dict.
@@ -46,7 +50,8 @@ class Session:
             candidate_class_names = self._pre_classify(primary_class, secondary_class)
 
             if len(candidate_class_names) > 1:
-                res = self.classifier.eval(raw_data, candidate_class_names)
+                with metrics.stage_timer(metrics.STAGE_TFIDF_CLASSIFY):
+                    res = self.classifier.eval(raw_data, candidate_class_names)
                 if res is not None:
                     class_name, pred_class_score = res
                     print(f"TFIDF classifier result: {class_name}({pred_class_score})")
@@ -59,7 +64,8 @@ class Session:
                 raise RuntimeError('pre_classify failed')
         else:
             # 任何类型信息都没指定，直接用在全部分类中分类
-            res = self.classifier.eval(raw_data)
+            with metrics.stage_timer(metrics.STAGE_TFIDF_CLASSIFY):
+                res = self.classifier.eval(raw_data)
             if res is not None:
                 class_name, pred_class_score = res
             else:
@@ -68,7 +74,11 @@ class Session:
         if class_name not in self.structuring.supported_class_names():
             raise NotImplementedError(f'class_name [{class_name}] not supported')
 
-        result = self.structuring.process(raw_data, image, class_name, ltrb, debug_data=debug_data, **kwargs)
+        if context is None:
+            context = RequestContext(debug_data)
+        with context:
+            result = self.structuring.process(raw_data, image, class_name, ltrb,
+                                              debug_data=debug_data, context=context, **kwargs)
 
         if isinstance(result, dict):
             _result = {}
@@ -86,8 +96,22 @@ class Session:
 
         return self._make_response_result(result, class_name, pred_class_score)
 
-    def process_multi(self, raw_datas, images, class_name):
-        result = self.structuring.process_multi(raw_datas, images, class_name)
+    def warm_up_classifier(self):
+        """
+        创建全部分类和每个一级分类的候选类别对应的 tfidf 分类器，
+        指定了二级分类时只有一个候选类别，不需要分类器
+        """
+        self.classifier.prepare()
+        for primary_class_enum in ClassNamesBase.subclasses.values():
+            candidate_class_names = self._pre_classify(primary_class_enum.code.value)
+            if len(candidate_class_names) > 1:
+                self.classifier.prepare(candidate_class_names)
+
+    def process_multi(self, raw_datas, images, class_name, context: RequestContext = None):
+        if context is None:
+            context = RequestContext()
+        with context:
+            result = self.structuring.process_multi(raw_datas, images, class_name)
         if hasattr(result, "to_dict"):
             return self._make_response_result(result.to_dict(), class_name, 1)
         elif isinstance(result, dict):
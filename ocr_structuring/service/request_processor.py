@@ -4,6 +4,7 @@ import traceback
 from datetime import datetime
 
 from ..core.utils.debug_data import DebugData
+from ..core.utils.request_context import RequestContext
 from ..protos.structuring_pb2 import (
     StructuringResponse,
     StructuringRequest,
@@ -12,33 +13,60 @@ from ..protos.structuring_pb2 import (
 from ..protos.structuring_pb2_grpc import StructuringServicer
 from ..protos.structuring_pb2 import StructuringTimeInfo
 from .util import image_from_image_data, images_from_image_datas
-from ocr_structuring.service.extra_data import extra_data
+from ..utils import metrics
+from ocr_structuring.service.extra_data import ExtraData
+from .result_cache import ResultCache, make_key
 
 
 class RequestProcessor:
     session = None
     lock = threading.Lock()
 
-    def process(self, request, rpc_name, preload_tpl=True, **kwargs):
+    def __init__(self, result_cache: ResultCache = None):
+        """
+        :param result_cache: 结构化结果的缓存，为 None 时不缓存
+        """
+        self.result_cache = result_cache
+
+    def process(self, request, rpc_name, preload_tpl=True, context: RequestContext = None, **kwargs):
+        """
+        :param context: 请求的上下文，为 None 时为每个请求创建一个新的 context
+        :param kwargs:
+            - item_name: 结构化工具调试时传入的文件名
+        """
         structuring_data = None
-        debug_data = DebugData()
-        debug_data.fid = kwargs.get('item_name', '')
+        item_name = kwargs.get('item_name', '')
+        # 只有结构化工具调试或者请求中指定了 debug 时才收集调试数据，生产环境不创建 DebugData
+        debug_data = None
+        if item_name or request.debug:
+            debug_data = DebugData()
+            debug_data.fid = item_name
+        extra_data = ExtraData()
+        if context is None:
+            context = RequestContext()
+        context.debug_data = debug_data
+        context.extra_data = extra_data
         # grpc string empty value is ''
         class_name = request.class_name if request.class_name != "" else None
 
         try:
-            if self.session is None:
-                with self.lock:
-                    if self.session is None:
-                        from .main import Session
-                        if debug_data.fid:  # 结构化工具调试模式，只加载当前class_name对应模板
-                            self.session = Session(preload_tpl, class_name)
-                        else:  # 生产逻辑
-                            self.session = Session(preload_tpl)
+            if item_name:  # 结构化工具调试模式，只加载当前class_name对应模板
+                self.init_session(preload_tpl, class_name)
+            else:  # 生产逻辑
+                self.init_session(preload_tpl)
         except Exception as e:
             traceback.print_exc()
             return None
 
+        # 调试请求需要完整地跑一遍结构化，不使用缓存
+        cache_key = None
+        if self.result_cache is not None and debug_data is None and rpc_name in ["Process", "ProcessRotated"]:
+            cache_key = make_key(request)
+            if cache_key is not None:
+                cached_data = self.result_cache.get(cache_key)
+                if cached_data is not None:
+                    return cached_data
+
         if rpc_name in ["Process", "ProcessRotated"]:
             # grpc int empty value 0
             primary_class = (
@@ -50,21 +78,22 @@ class RequestProcessor:
             )
 
         if rpc_name == "Process":
-            label_list = []
-            for text in request.texts_full_data:
-                label_list.append(
-                    [
-                        text.word,
-                        text.bbox.left,
-                        text.bbox.top,
-                        text.bbox.right,
-                        text.bbox.bottom,
-                        text.label,
-                        *text.probabilities,
-                    ]
-                )
-            # 读取raw_data中的表格数据，存入extra_data单例中
-            extra_data.read_data_from_request(request)
+            with metrics.stage_timer(metrics.STAGE_PROTO_TO_RAW_DATA, class_name=class_name):
+                label_list = []
+                for text in request.texts_full_data:
+                    label_list.append(
+                        [
+                            text.word,
+                            text.bbox.left,
+                            text.bbox.top,
+                            text.bbox.right,
+                            text.bbox.bottom,
+                            text.label,
+                            *text.probabilities,
+                        ]
+                    )
+                # 读取raw_data中的表格数据，存入当前请求的extra_data中
+                extra_data.read_data_from_request(request)
 
             with image_from_image_data(request.image_data) as image:
                 structuring_data = self.session.process(
@@ -74,16 +103,18 @@ class RequestProcessor:
                     primary_class=primary_class,
                     secondary_class=secondary_class,
                     ltrb=True,
-                    debug_data=debug_data
+                    debug_data=debug_data,
+                    context=context,
                 )
 
         elif rpc_name == "ProcessRotated":
-            label_list = []
-            for text in request.texts_full_data:
-                label_list.append(self._TextFullDataRotated_to_raw(text))
-                # 读取raw_data中的表格数据，存入extra_data单例中
+            with metrics.stage_timer(metrics.STAGE_PROTO_TO_RAW_DATA, class_name=class_name):
+                label_list = []
+                for text in request.texts_full_data:
+                    label_list.append(self._TextFullDataRotated_to_raw(text))
 
-            extra_data.read_data_from_request(request)
+                # 读取raw_data中的表格数据，存入当前请求的extra_data中
+                extra_data.read_data_from_request(request)
 
             with image_from_image_data(request.image_data) as image:
                 structuring_data = self.session.process(
@@ -93,28 +124,45 @@ class RequestProcessor:
                     primary_class=primary_class,
                     secondary_class=secondary_class,
                     ltrb=False,
-                    debug_data=debug_data
+                    debug_data=debug_data,
+                    context=context,
                 )
 
         elif rpc_name == "ProcessMultiImage":
-            raw_datas = []
-            image_datas = []
-            extra_data.read_data_from_request(request)
-
-            for single in request.multi_image_info:
-                raw_data = []
-                for text in single.texts_full_data:
-                    raw_data.append(self._TextFullDataRotated_to_raw(text))
-                raw_datas.append(raw_data)
-                image_datas.append(single.image_data)
+            with metrics.stage_timer(metrics.STAGE_PROTO_TO_RAW_DATA, class_name=class_name):
+                raw_datas = []
+                image_datas = []
+                extra_data.read_data_from_request(request)
+
+                for single in request.multi_image_info:
+                    raw_data = []
+                    for text in single.texts_full_data:
+                        raw_data.append(self._TextFullDataRotated_to_raw(text))
+                    raw_datas.append(raw_data)
+                    image_datas.append(single.image_data)
 
             with images_from_image_datas(image_datas) as images:
                 structuring_data = self.session.process_multi(
-                    raw_datas=raw_datas, images=images, class_name=class_name
+                    raw_datas=raw_datas, images=images, class_name=class_name, context=context
                 )
 
+        if cache_key is not None and structuring_data is not None:
+            self.result_cache.put(cache_key, structuring_data)
+
         return structuring_data
 
+    def init_session(self, preload_tpl=True, class_name=None):
+        """
+        初始化 Session，多次调用只会初始化一次。
+        多进程模式下每个 worker 进程启动时会主动调用，避免第一个请求承担加载模板的耗时
+        """
+        if self.session is None:
+            with self.lock:
+                if self.session is None:
+                    from .main import Session
+                    self.session = Session(preload_tpl, class_name)
+        return self.session
+
     def _TextFullDataRotated_to_raw(self, text_full_data_rotated):
         return [
             text_full_data_rotated.word,
@@ -0,0 +1,191 @@
+"""
+结构化结果的缓存。上游的重试和重复提交会带来内容完全相同的请求，命中缓存时直接返回上一次的结构化结果。
+
+缓存的 key 是请求内容的哈希：class_name、一二级分类、texts_full_data、表格检测结果、图片的摘要，
+以及模板配置文件的版本，修改模板配置以后之前的缓存自然失效
+"""
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from ocr_structuring.core.template.loader import CONFIG_DIR
+from ocr_structuring.utils import metrics
+from ocr_structuring.utils.logging import logger
+
+
+def _template_conf_version() -> str:
+    md5 = hashlib.md5()
+    for path in sorted(glob.glob(os.path.join(CONFIG_DIR, '*.yml'))):
+        md5.update(os.path.basename(path).encode('utf-8'))
+        with open(path, 'rb') as f:
+            md5.update(f.read())
+    return md5.hexdigest()
+
+
+TEMPLATE_CONF_VERSION = _template_conf_version()
+
+
+def make_key(request):
+    """
+    :param request: StructuringRequest 或者 StructuringRequestRotated
+    :return: 请求内容的哈希。使用共享内存传输图片的请求无法低成本地计算图片摘要，返回 None 表示不缓存
+    """
+    image_data = request.image_data
+    if image_data.shm:
+        return None
+
+    sha = hashlib.sha256()
+    sha.update(TEMPLATE_CONF_VERSION.encode('utf-8'))
+    sha.update(type(request).__name__.encode('utf-8'))
+    sha.update(('%s|%s|%s' % (request.class_name, request.primary_class, request.secondary_class)).encode('utf-8'))
+
+    for text in request.texts_full_data:
+        sha.update(text.SerializeToString(deterministic=True))
+    for labeled_bbox in request.labeled_bbox_list:
+        sha.update(labeled_bbox.SerializeToString(deterministic=True))
+    for detection_result in request.detection_results:
+        sha.update(detection_result.SerializeToString(deterministic=True))
+
+    sha.update(('%s|%s|%s|%s' % (image_data.width, image_data.height, image_data.channels,
+                                 image_data.encoding)).encode('utf-8'))
+    sha.update(hashlib.sha1(image_data.data).digest())
+    return sha.hexdigest()
+
+
+class ResultCache:
+    """
+    LRU + TTL 的内存缓存，设置了 cache_dir 时同时写入磁盘，服务重启以后之前的结果仍然有效。
+    多进程模式下每个 worker 有各自的内存缓存，磁盘缓存是共享的
+    """
+
+    def __init__(self, max_size: int, ttl: int, cache_dir: str = None):
+        """
+        :param max_size: 内存和磁盘中各自最多缓存的结果个数
+        :param ttl: 缓存的有效期，单位秒
+        :param cache_dir: 磁盘缓存的目录，为空时只使用内存缓存
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._disk_count = 0
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._disk_count = len(self._disk_files())
+            metrics.set_result_cache_size('disk', self._disk_count)
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None:
+                expire_at, result = item
+                if expire_at > now:
+                    self._memory.move_to_end(key)
+                    metrics.count_result_cache('hit')
+                    return result
+                del self._memory[key]
+
+        result = self._get_from_disk(key, now)
+        if result is None:
+            metrics.count_result_cache('miss')
+            return None
+
+        metrics.count_result_cache('hit')
+        self._put_to_memory(key, result, now + self.ttl)
+        return result
+
+    def put(self, key: str, result):
+        expire_at = time.time() + self.ttl
+        self._put_to_memory(key, result, expire_at)
+        if self.cache_dir:
+            self._put_to_disk(key, result, expire_at)
+
+    def _put_to_memory(self, key, result, expire_at):
+        with self._lock:
+            self._memory[key] = (expire_at, result)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_size:
+                self._memory.popitem(last=False)
+            metrics.set_result_cache_size('memory', len(self._memory))
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def _disk_files(self):
+        return glob.glob(os.path.join(self.cache_dir, '*.json'))
+
+    def _get_from_disk(self, key, now):
+        if not self.cache_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            with open(path, mode='r', encoding='utf-8') as f:
+                item = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if item['expire_at'] <= now:
+            self._remove(path)
+            return None
+        return item['result']
+
+    def _put_to_disk(self, key, result, expire_at):
+        path = self._disk_path(key)
+        try:
+            # 先写临时文件再 rename，其它 worker 不会读到写了一半的文件
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, mode='w', encoding='utf-8') as f:
+                json.dump({'expire_at': expire_at, 'result': result}, f, ensure_ascii=False,
+                          default=lambda obj: obj.__dict__)
+            existed = os.path.exists(path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning('Failed to write result cache %s: %s' % (path, e))
+            return
+
+        with self._lock:
+            if not existed:
+                self._disk_count += 1
+            should_prune = self._disk_count > self.max_size
+
+        if should_prune:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """
+        删除最旧的 10% 缓存文件
+        """
+        files = sorted(self._disk_files(), key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+        remove_count = len(files) - self.max_size + max(1, self.max_size // 10)
+        for path in files[:max(0, remove_count)]:
+            self._remove(path)
+
+        with self._lock:
+            self._disk_count = len(self._disk_files())
+            metrics.set_result_cache_size('disk', self._disk_count)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def create_result_cache(cfg):
+    """
+    :param cfg: settings.MyConfig
+    :return: 没有开启缓存时返回 None
+    """
+    if not cfg.result_cache_size.value or cfg.result_cache_size.value <= 0:
+        return None
+    return ResultCache(cfg.result_cache_size.value, cfg.result_cache_ttl.value, cfg.result_cache_dir.value or None)
@@ -3,14 +3,27 @@ import contextlib
 import logging
 import sys
 
+import cv2
 import numpy as np
 import shm_utils.numpy
 
+from ..core.utils.lazy_image import LazyImage
 from ..protos.structuring_pb2 import ImageData
 
+ENCODING_RAW = 'raw'
 
-def dump_image(image):
+
+def dump_image(image, encoding=None):
+    """
+    :param encoding: 为 None 时传输原始像素，否则按照指定的格式编码后传输，例如 jpeg、png、webp
+    """
     shape = image.shape
+    if encoding and encoding != ENCODING_RAW:
+        ok, buf = cv2.imencode('.' + encoding, image)
+        if not ok:
+            raise AssertionError('cannot encode image to %s' % encoding)
+        return ImageData(data=buf.tobytes(), height=shape[0], width=shape[1], encoding=encoding)
+
     raw_data = image.tobytes()
     if len(shape) == 3:
         return ImageData(data=raw_data, height=shape[0], width=shape[1], channels=shape[2])
@@ -27,7 +40,17 @@ def get_shape(image_data):
     return shape
 
 
+def is_encoded(image_data) -> bool:
+    return bool(image_data.encoding) and image_data.encoding != ENCODING_RAW
+
+
 def load_image(image_data):
+    """
+    :return: 原始像素返回 ndarray，编码后的图片返回 LazyImage，在第一次访问像素时才解码
+    """
+    if is_encoded(image_data):
+        return LazyImage(image_data.data, image_data.height, image_data.width)
+
     shape = get_shape(image_data)
     return np.frombuffer(image_data.data, dtype=np.uint8).reshape(shape)
 
@@ -0,0 +1,126 @@
+"""
+服务启动时的预热：提前加载模板、BK-TREE、CRNN 模型和 tfidf 分类器，并用合成的请求跑一遍结构化，
+避免服务刚启动时的请求承担这些加载耗时而超时。
+模板默认在第一次使用时加载，预热 TEMPLATE_PRELOAD 和 WARM_UP_CLASS_NAMES 中的模板，
+需要全部加载时设置 TEMPLATE_PRELOAD=all。
+预热完成之前 ReadinessHealthServer 返回 NOT_SERVING
+"""
+import threading
+import time
+from typing import List
+
+import numpy as np
+
+from ocr_structuring.utils.logging import logger
+
+_ready = threading.Event()
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+def set_ready():
+    _ready.set()
+
+
+def split_names(value: str) -> List[str]:
+    """
+    解析逗号分隔的配置
+    """
+    if not value:
+        return []
+    return [it.strip() for it in value.split(',') if it.strip()]
+
+
+def warm_up_bk_trees(tree_names: List[str]):
+    """
+    :param tree_names: bk_tree.MEMORY 中的名称，为 ['all'] 时加载全部的树。加载失败不影响服务启动
+    """
+    from ocr_structuring.core.utils import bk_tree
+
+    if tree_names == ['all']:
+        tree_names = list(bk_tree.MEMORY.keys())
+
+    for tree_name in tree_names:
+        try:
+            bk_tree.get_tree(tree_name)
+        except Exception:
+            logger.exception(f'warm up BK-TREE [{tree_name}] failed')
+
+
+def warm_up_templates(template_structuring, class_names: List[str]):
+    """
+    :param template_structuring: core.template.main.TemplateStructuring，为 None 时不加载
+    :param class_names: 模板名称，包含 all 时加载全部模板，不是模板的类别直接跳过。加载失败不影响服务启动
+    """
+    if template_structuring is None:
+        return
+
+    supported = template_structuring.subclasses
+    if 'all' in class_names:
+        class_names = sorted(supported.keys())
+
+    for class_name in dict.fromkeys(class_names):
+        if class_name not in supported:
+            continue
+        try:
+            template_structuring.get_template(class_name)
+        except Exception:
+            logger.exception(f'warm up template [{class_name}] failed')
+
+
+def template_names_to_warm_up(cfg) -> List[str]:
+    """
+    只加载 TEMPLATE_PRELOAD 和 WARM_UP_CLASS_NAMES 中的模板，每个 worker 都会预热，不默认加载全部模板
+    """
+    return split_names(cfg.template_preload.value) + split_names(cfg.warm_up_class_names.value)
+
+
+def warm_up_crnn_models(model_names: List[str]):
+    """
+    :param model_names: CRNNUtil.run_xxx 中的 xxx，除了加载模型以外，还会用空白图片跑一次 forward。
+                        不存在的模型和加载失败的模型直接跳过，不影响服务启动
+    """
+    from ocr_structuring.core.utils.crnn.crnn_util import CRNNUtil
+
+    crnn_util = CRNNUtil()
+    img = np.full((32, 128, 3), 255, dtype=np.uint8)
+    roi = [0, 0, 128, 32]
+    for model_name in model_names:
+        run_func = getattr(crnn_util, 'run_' + model_name, None)
+        if run_func is None:
+            logger.error(f'CRNN model [{model_name}] is not implemented')
+            continue
+        try:
+            run_func(img, roi)
+        except Exception:
+            logger.exception(f'warm up CRNN model [{model_name}] failed')
+
+
+def run_synthetic_requests(session, class_names: List[str]):
+    """
+    用合成的数据对每个类别跑一遍结构化，处理失败不影响服务启动
+    """
+    img = np.full((1000, 1000, 3), 255, dtype=np.uint8)
+    raw_data = [['warm up', 100, 100, 300, 140, 1, 1.0]]
+    for class_name in class_names:
+        try:
+            session.process(raw_data, img, class_name=class_name, ltrb=True)
+        except Exception:
+            logger.exception(f'warm up request of [{class_name}] failed')
+
+
+def warm_up(request_processor, cfg):
+    """
+    :param request_processor: service.request_processor.RequestProcessor
+    :param cfg: settings.MyConfig
+    """
+    start_time = time.time()
+    session = request_processor.init_session()
+    session.warm_up_classifier()
+    warm_up_templates(session.structuring.template, template_names_to_warm_up(cfg))
+    warm_up_bk_trees(split_names(cfg.warm_up_bk_trees.value))
+    warm_up_crnn_models(split_names(cfg.warm_up_crnn_models.value))
+    run_synthetic_requests(session, split_names(cfg.warm_up_class_names.value))
+    logger.info('warm up finished in %.2fs' % (time.time() - start_time))
@@ -9,6 +9,39 @@ class MyConfig(Config):
     grpc_port = StringField('GRPC_PORT', '50051')
     grpc_max_message_length = IntField('GRPC_MAX_MESSAGE_LENGTH', '104857600')  # 100M
     grpc_max_concurrent = IntField('GRPC_MAX_CONCURRENT', None)
+    # 多进程模式下父进程以 HTTP 导出所有 worker 汇总的 metrics 的端口，0 表示不导出，
+    # 需要同时设置环境变量 PROMETHEUS_MULTIPROC_DIR，见 utils/metrics.py
+    metrics_port = IntField('METRICS_PORT', '0')
+    # 每个 worker 排队中和处理中的结构化请求个数上限，超过时返回 RESOURCE_EXHAUSTED，见 service/admission.py
+    grpc_max_pending = IntField('GRPC_MAX_PENDING', '16')
+    # 预先 fork 的 worker 进程个数，0 表示根据 cgroup 的 CPU 配额确定，1 表示单进程模式
+    grpc_workers = IntField('GRPC_WORKERS', '0')
+    # 启动时预先加载模型、BK-TREE 等资源，完成之前健康检查返回 NOT_SERVING
+    warm_up = IntField('WARM_UP', '1')
+    # 以下配置均为逗号分隔的列表。BK-TREE 为 bk_tree 中的文件名，all 表示全部加载；
+    # CRNN 模型为 CRNNUtil.run_xxx 中的 xxx；CLASS_NAMES 中的每个类别会用一个合成的请求跑一遍结构化
+    warm_up_bk_trees = StringField('WARM_UP_BK_TREES', '')
+    warm_up_crnn_models = StringField('WARM_UP_CRNN_MODELS', '')
+    warm_up_class_names = StringField('WARM_UP_CLASS_NAMES', '')
+    # 结构化结果缓存，RESULT_CACHE_SIZE 为 0 时不缓存；RESULT_CACHE_DIR 不为空时同时缓存到磁盘，重启后仍然有效
+    result_cache_size = IntField('RESULT_CACHE_SIZE', '0')
+    result_cache_ttl = IntField('RESULT_CACHE_TTL', '3600')
+    result_cache_dir = StringField('RESULT_CACHE_DIR', '')
+    # 准入控制，排队中的请求预计耗时超过预算（毫秒）时直接拒绝新的请求，0 表示不限制
+    admission_budget_ms = IntField('ADMISSION_BUDGET_MS', '0')
+    # 每个 BK-TREE 缓存的 search_one 结果个数，0 表示不缓存
+    bk_tree_cache_size = IntField('BK_TREE_CACHE_SIZE', '4096')
+    # 二进制树文件的目录，为空时使用 bk_tree/.tree；BK_TREE_BUILD_ON_MISS 为 0 时只加载预先生成的树文件，
+    # 不在请求时生成，见 scripts/cache_all_bk_trees.py
+    bk_tree_dir = StringField('BK_TREE_DIR', '')
+    bk_tree_build_on_miss = IntField('BK_TREE_BUILD_ON_MISS', '1')
+    # 编译后的模板配置的缓存目录，为空时使用 template/.plan，见 core/template/plan.py
+    template_plan_dir = StringField('TEMPLATE_PLAN_DIR', '')
+    # 模板在第一次使用时才加载。TEMPLATE_PRELOAD 为启动时加载的模板，逗号分隔，all 表示全部加载；
+    # TEMPLATE_CACHE_SIZE 为最多常驻内存的模板个数，超过以后淘汰最久没有使用的，0 表示不限制。
+    # 开启 WARM_UP 时预热阶段加载 TEMPLATE_PRELOAD 和 WARM_UP_CLASS_NAMES 中的模板
+    template_preload = StringField('TEMPLATE_PRELOAD', '')
+    template_cache_size = IntField('TEMPLATE_CACHE_SIZE', '0')
     ner_ip_addr = StringField('NER_IP','172.18.192.17')
     ner_port_in = IntField('NER_PORT_IN',32767)
     ner_port_out = IntField('NER_PORT_OUT',31801)
@@ -0,0 +1,133 @@
+import threading
+import time
+import unittest
+from collections import namedtuple
+from types import SimpleNamespace
+
+import grpc
+
+from ocr_structuring.protos.structuring_pb2 import StructuringRequest, StructuringResponse
+from ocr_structuring.protos.structuring_pb2_grpc import (StructuringServicer, StructuringStub,
+                                                         add_StructuringServicer_to_server)
+from ocr_structuring.service.admission import (AdmissionController, AdmissionInterceptor,
+                                               create_admission_interceptors, create_thread_pool)
+
+HandlerCallDetails = namedtuple('HandlerCallDetails', 'method invocation_metadata')
+
+
+class TestAdmissionController(unittest.TestCase):
+    def test_budget(self):
+        controller = AdmissionController(budget=2.5, initial_cost=1.0)
+        seqs = [controller.admit() for _ in range(3)]
+        self.assertEqual([1, 2, 3], seqs)
+        self.assertIsNone(controller.admit())
+
+        controller.start(1)
+        controller.finish(1.0)
+        self.assertEqual(2, controller.pending_count)
+        self.assertIsNotNone(controller.admit())
+
+    def test_skip_cancelled_in_queue(self):
+        controller = AdmissionController(budget=0)
+        for _ in range(3):
+            controller.admit()
+        # 第 1、2 个请求在排队时被取消，grpc 不会执行它们
+        controller.start(3)
+        self.assertEqual(1, controller.pending_count)
+        controller.finish(0.5)
+        self.assertEqual(0, controller.pending_count)
+        self.assertAlmostEqual(0.9, controller.avg_cost)
+
+    def test_stream_cost_per_response(self):
+        controller = AdmissionController(budget=0.25, initial_cost=0.1)
+        interceptor = AdmissionInterceptor(controller)
+
+        def process_batch(request_iterator, context):
+            for request in request_iterator:
+                time.sleep(0.05)
+                yield request
+
+        def slow_requests():
+            for i in range(20):
+                # 客户端发送请求的时间不算在处理耗时中
+                time.sleep(0.01)
+                yield i
+
+        stream_handler = interceptor.intercept_service(
+            lambda _: grpc.stream_stream_rpc_method_handler(process_batch),
+            HandlerCallDetails('/ocr_structuring.Structuring/ProcessBatch', ()))
+        self.assertEqual(list(range(20)), list(stream_handler.stream_stream(slow_requests(), None)))
+        self.assertEqual(0, controller.pending_count)
+        self.assertLess(controller.avg_cost, 0.1)
+
+        # 整个 stream 的耗时不会计入平均耗时，之后的单个请求仍然可以准入
+        unary_handler = interceptor.intercept_service(
+            lambda _: grpc.unary_unary_rpc_method_handler(lambda request, context: request),
+            HandlerCallDetails('/ocr_structuring.Structuring/Process', ()))
+        self.assertEqual(1, unary_handler.unary_unary(1, None))
+
+    def test_empty_stream(self):
+        controller = AdmissionController(budget=0, initial_cost=0.3)
+        controller.admit()
+        controller.start(1)
+        controller.finish(2.0, count=0)
+        self.assertEqual(0, controller.pending_count)
+        self.assertAlmostEqual(0.3, controller.avg_cost)
+
+
+class BlockingStructuringServer(StructuringServicer):
+    def __init__(self):
+        self.release = threading.Event()
+        self.order = []
+
+    def Process(self, request, context):
+        self.order.append('Process')
+        return StructuringResponse(code=0)
+
+    def ProcessBatch(self, request_iterator, context):
+        for _ in request_iterator:
+            yield StructuringResponse(code=0)
+            self.release.wait(10)
+        self.order.append('ProcessBatch')
+
+
+class TestServerThreads(unittest.TestCase):
+    def test_health_during_batch_stream(self):
+        cfg = SimpleNamespace(admission_budget_ms=SimpleNamespace(value=0), grpc_max_pending=SimpleNamespace(value=4))
+        server = grpc.server(create_thread_pool(cfg), interceptors=create_admission_interceptors(cfg))
+        servicer = BlockingStructuringServer()
+        add_StructuringServicer_to_server(servicer, server)
+        server.add_generic_rpc_handlers([grpc.method_handlers_generic_handler('grpc.health.v1.Health', {
+            'Check': grpc.unary_unary_rpc_method_handler(lambda request, context: b'SERVING')})])
+        port = server.add_insecure_port('localhost:0')
+        server.start()
+        channel = grpc.insecure_channel('localhost:%s' % port)
+        try:
+            stub = StructuringStub(channel)
+            responses = stub.ProcessBatch(iter([StructuringRequest()] * 2))
+            next(responses)
+
+            # stream 处理中，健康检查不需要排队
+            check = channel.unary_unary('/grpc.health.v1.Health/Check')
+            self.assertEqual(b'SERVING', check(b'', timeout=5))
+
+            # 结构化请求仍然一个一个处理
+            process = stub.Process.future(StructuringRequest())
+            time.sleep(0.2)
+            self.assertFalse(process.done())
+            servicer.release.set()
+            self.assertEqual(2, len(list(responses)) + 1)
+            process.result(timeout=5)
+            self.assertEqual(['ProcessBatch', 'Process'], servicer.order)
+        finally:
+            servicer.release.set()
+            channel.close()
+            server.stop(0)
+
+    def test_max_pending(self):
+        controller = AdmissionController(budget=0, max_pending=2)
+        self.assertEqual([1, 2, None], [controller.admit() for _ in range(3)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -159,6 +159,45 @@ class TestDummy(unittest.TestCase):
             print("template result", pred)
             self.assertEqual(pred["money"]["content"], "42")
 
+    def test_process_batch(self):
+        image = cv2.imread(dummy_tpl_img_path)
+
+        with grpc.insecure_channel(
+            "localhost:%s" % GRPC_PORT,
+            options=[
+                ("grpc.max_receive_message_length", 104857600),
+                ("grpc.max_send_message_length", 104857600),
+            ],
+        ) as channel:
+            stub = StructuringStub(channel)
+
+            requests = []
+            for class_name in ["dummy_tpl", "dummy_non_tpl", "not_exist"]:
+                request = StructuringRequest(
+                    class_name=class_name, image_data=util.dump_image(image),
+                )
+                for it in raw_data:
+                    request.texts_full_data.add(
+                        bbox=BBox(
+                            left=it["points"][0]["x"],
+                            top=it["points"][0]["y"],
+                            right=it["points"][2]["x"],
+                            bottom=it["points"][2]["y"],
+                        ),
+                        word=it["content"],
+                        label=1,
+                        probabilities=it["probabilities"],
+                    )
+                requests.append(request)
+
+            responses = list(stub.ProcessBatch(iter(requests), timeout=30))
+            self.assertEqual(len(responses), 3)
+            for response in responses[:2]:
+                self.assertEqual(response.code, 0)
+                self.assertEqual(json.loads(response.data)["money"]["content"], "42")
+            # 单页失败不影响其它页
+            self.assertEqual(responses[2].code, 500000)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+from unittest import mock
+
+import cv2
+import numpy as np
+
+from ocr_structuring.core.template.parser.tpl_based import TplBased
+from ocr_structuring.protos.structuring_pb2 import ImageData, StructuringRequest
+from ocr_structuring.service.request_processor import RequestProcessor
+
+
+class TestEncodedImage(unittest.TestCase):
+    def test_template_func_calls_cv2(self):
+        img = np.full((1600, 1800, 3), 255, dtype=np.uint8)
+        cv2.rectangle(img, (143, 256), (340, 313), (0, 0, 255), -1)
+        _, data = cv2.imencode('.png', img)
+        request = StructuringRequest(class_name='tpl_based', image_data=ImageData(
+            data=data.tobytes(), width=1800, height=1600, encoding='png'))
+        text = request.texts_full_data.add()
+        text.word = '权利人'
+        text.bbox.left, text.bbox.top, text.bbox.right, text.bbox.bottom = 143, 256, 340, 313
+        text.probabilities.append(1.0)
+
+        decoded, gray_images = [], []
+
+        def tmpl_post_proc(self, structure_items, fg_items, img):
+            # matcher 和 fg_item 只用到图片的大小，到这里还没有解码
+            decoded.append(img.decoded)
+            gray_images.append(cv2.cvtColor(np.asarray(img), cv2.COLOR_BGR2GRAY))
+            return structure_items
+
+        with mock.patch.object(TplBased, 'tmpl_post_proc', tmpl_post_proc):
+            result = RequestProcessor().process(request, 'Process', item_name='encoded_image')
+
+        self.assertEqual('tpl_based', result['metadata']['class_name'])
+        self.assertEqual([False], decoded)
+        np.testing.assert_array_equal(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), gray_images[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from ocr_structuring.utils import metrics
+
+WORKER_CODE = '''
+import os
+from ocr_structuring.utils import metrics
+metrics.count_admission_rejected()
+metrics.set_result_cache_size('memory', 3)
+print(os.getpid())
+'''
+
+
+@unittest.skipIf(metrics.Histogram is None, 'prometheus_client is not installed')
+class TestMultiprocessMetrics(unittest.TestCase):
+    def test_aggregate_workers(self):
+        with tempfile.TemporaryDirectory() as path:
+            # 上次运行留下的文件在启动时清空
+            with open(os.path.join(path, 'counter_0.db'), 'wb') as f:
+                f.write(b'stale')
+            with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': path}):
+                metrics.prepare_multiprocess_dir()
+                self.assertEqual([], os.listdir(path))
+
+                # worker 在 import 之前就有 PROMETHEUS_MULTIPROC_DIR 环境变量
+                pids = [int(subprocess.check_output([sys.executable, '-c', WORKER_CODE], env=dict(os.environ)))
+                        for _ in range(2)]
+
+                registry = metrics.multiprocess_registry()
+                self.assertEqual(2, registry.get_sample_value('structuring_admission_rejected_total'))
+                self.assertEqual(6, registry.get_sample_value('structuring_result_cache_size', {'backend': 'memory'}))
+
+                metrics.mark_worker_dead(pids[0])
+                registry = metrics.multiprocess_registry()
+                self.assertEqual(3, registry.get_sample_value('structuring_result_cache_size', {'backend': 'memory'}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import multiprocessing
+import signal
+import time
+import unittest
+from unittest import mock
+
+from ocr_structuring import main
+
+
+def _run_child():
+    pass
+
+
+def _run_worker_with_child(port):
+    # 例如 BK-TREE 的进程池、run_structure 的 mp.Pool，daemon 进程中会抛出 AssertionError
+    child = multiprocessing.get_context('fork').Process(target=_run_child)
+    child.start()
+    child.join()
+    raise SystemExit(child.exitcode)
+
+
+def _run_worker_forever(port):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    while True:
+        time.sleep(1)
+
+
+class TestPreforkServer(unittest.TestCase):
+    def test_worker_can_create_child_process(self):
+        with mock.patch.object(main, '_run_worker', _run_worker_with_child):
+            worker = main._start_worker(0)
+        worker.join(10)
+        self.assertFalse(worker.daemon)
+        self.assertEqual(0, worker.exitcode)
+
+    def test_stop_joins_workers(self):
+        with mock.patch.object(main, '_run_worker', _run_worker_forever):
+            server = main.PreforkServer(0, 2).start()
+        workers = list(server.workers)
+        self.assertTrue(all(it.is_alive() for it in workers))
+
+        server.stop(5)
+        self.assertEqual([], server.workers)
+        self.assertTrue(all(it.exitcode is not None for it in workers))
+
+
+if __name__ == "__main__":
+    unittest.main()
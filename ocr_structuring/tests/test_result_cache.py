@@ -0,0 +1,48 @@
+import tempfile
+import time
+import unittest
+
+from ocr_structuring.protos.structuring_pb2 import StructuringRequest, BBox
+from ocr_structuring.service.result_cache import ResultCache, make_key
+
+
+def make_request(word):
+    request = StructuringRequest(class_name="dummy_tpl")
+    request.image_data.data = b"\x00" * 12
+    request.image_data.height = 2
+    request.image_data.width = 2
+    request.image_data.channels = 3
+    request.texts_full_data.add(bbox=BBox(left=1, top=2, right=3, bottom=4), word=word, label=1)
+    return request
+
+
+class TestResultCache(unittest.TestCase):
+    def test_make_key(self):
+        self.assertEqual(make_key(make_request("金额")), make_key(make_request("金额")))
+        self.assertNotEqual(make_key(make_request("金额")), make_key(make_request("日期")))
+
+        request = make_request("金额")
+        request.image_data.shm = "token"
+        self.assertIsNone(make_key(request))
+
+    def test_lru_and_ttl(self):
+        cache = ResultCache(max_size=2, ttl=1)
+        cache.put("a", {"data": 1})
+        cache.put("b", {"data": 2})
+        cache.get("a")
+        cache.put("c", {"data": 3})
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual({"data": 1}, cache.get("a"))
+
+        cache.ttl = -1
+        cache.put("d", {"data": 4})
+        self.assertIsNone(cache.get("d"))
+
+    def test_disk(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            ResultCache(max_size=2, ttl=60, cache_dir=cache_dir).put("a", {"data": 1})
+            self.assertEqual({"data": 1}, ResultCache(max_size=2, ttl=60, cache_dir=cache_dir).get("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
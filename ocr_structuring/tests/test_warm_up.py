@@ -0,0 +1,43 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from ocr_structuring.service import warm_up
+
+
+def make_cfg(bk_trees='', crnn_models='', class_names=''):
+    return SimpleNamespace(template_preload=SimpleNamespace(value=''),
+                           warm_up_class_names=SimpleNamespace(value=class_names),
+                           warm_up_bk_trees=SimpleNamespace(value=bk_trees),
+                           warm_up_crnn_models=SimpleNamespace(value=crnn_models))
+
+
+class FakeCRNNUtil:
+    calls = []
+
+    def run_ok(self, img, roi):
+        self.calls.append('ok')
+
+    def run_broken(self, img, roi):
+        raise RuntimeError('model file not found')
+
+
+class TestWarmUp(unittest.TestCase):
+    def test_skip_failed_items(self):
+        session = mock.MagicMock()
+        session.structuring.template = None
+        request_processor = mock.MagicMock()
+        request_processor.init_session.return_value = session
+
+        # 不存在的 BK-TREE、CRNN 模型和加载失败的模型只记录日志，后面的预热照常进行
+        cfg = make_cfg(bk_trees='not_a_tree', crnn_models='not_a_model,broken,ok', class_names='tpl_based')
+        with mock.patch('ocr_structuring.core.utils.crnn.crnn_util.CRNNUtil', FakeCRNNUtil):
+            warm_up.warm_up(request_processor, cfg)
+
+        self.assertEqual(['ok'], FakeCRNNUtil.calls)
+        self.assertEqual(1, session.process.call_count)
+        self.assertEqual('tpl_based', session.process.call_args[1]['class_name'])
+
+
+if __name__ == "__main__":
+    unittest.main()
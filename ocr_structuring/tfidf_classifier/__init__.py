@@ -38,13 +38,7 @@ class TfidfClassifier:
         if not raw_data:
             return None
 
-        if input_classes is None:
-            input_classes = self.supported_class_names
-        else:
-            # 过滤掉 tfidf 不支持的分类 TODO：是否要 raise exception？
-            input_classes = list(filter(lambda x: x in self.supported_class_names, input_classes))
-            input_classes.sort()
-
+        input_classes = self._filter_classes(input_classes)
         if len(input_classes) == 0:
             return None
 
@@ -64,12 +58,30 @@ class TfidfClassifier:
 
         return class_name, cos_similarities[pred_class_idx]
 
+    def prepare(self, input_classes: List[str] = None):
+        """
+        提前创建 input_classes 对应的分类器，避免第一个请求承担 fit 的耗时
+        """
+        input_classes = self._filter_classes(input_classes)
+        if len(input_classes) == 0:
+            return
+        self._get_transformer_vec_tfidf(input_classes)
+
     def support(self, class_name) -> bool:
         """
         检查一个模板类型是否支持 tfidf 分类
         """
         return class_name in self.supported_class_names
 
+    def _filter_classes(self, input_classes: List[str] = None) -> List[str]:
+        if input_classes is None:
+            return self.supported_class_names
+
+        # 过滤掉 tfidf 不支持的分类 TODO：是否要 raise exception？
+        input_classes = list(filter(lambda x: x in self.supported_class_names, input_classes))
+        input_classes.sort()
+        return input_classes
+
     def _get_transformer_vec_tfidf(self, class_names):
         cache_key = ''.join(class_names)
 
@@ -0,0 +1,202 @@
+"""
+结构化各个阶段的耗时统计。
+
+直方图注册在 prometheus_client 默认的 registry 中，由 adder 的 MetricsServer 统一导出，
+标签为 stage（阶段）、class_name（结构化类型）和 name（字段名、CRNN 模型名等，没有时为空）。
+另外还有结构化结果缓存和 BK-TREE 搜索缓存的命中次数、准入控制拒绝的请求数。
+没有安装 prometheus_client 时不做统计
+
+多进程模式（GRPC_WORKERS > 1）下每个 worker 有各自的 registry，MetricsServer 只能导出接到请求的那个 worker 的统计，
+所以使用 prometheus_client 的 multiprocess 模式：启动服务前设置环境变量 PROMETHEUS_MULTIPROC_DIR，
+worker 把统计写到这个目录下的文件中，父进程在 METRICS_PORT 上以 HTTP 导出所有 worker 汇总后的结果。
+prometheus_client 在导入时根据这个环境变量决定是否使用 multiprocess 模式，所以只能通过环境变量设置，不能在代码中设置
+"""
+import contextlib
+import functools
+import glob
+import os
+import time
+
+from ocr_structuring.core.utils.request_context import get_request_context
+
+try:
+    from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, start_http_server
+    from prometheus_client import multiprocess
+except ImportError:
+    Counter = Gauge = Histogram = None
+
+# 单位：秒
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+# 阶段名称
+STAGE_PROTO_TO_RAW_DATA = 'proto_to_raw_data'
+STAGE_NODE_ITEM = 'node_item'
+STAGE_TFIDF_CLASSIFY = 'tfidf_classify'
+STAGE_BG_SCALE = 'bg_scale'
+STAGE_ABOVE_OFFSET = 'above_offset'
+STAGE_PRE_FUNC = 'pre_func'
+STAGE_REGEX_FILTER = 'regex_filter'
+STAGE_POST_FUNC = 'post_func'
+STAGE_REGION_ITEM = 'region_item'
+STAGE_TMPL_POST_PROC = 'tmpl_post_proc'
+STAGE_CRNN = 'crnn'
+STAGE_JSON_SERIALIZATION = 'json_serialization'
+
+if Histogram is not None:
+    STAGE_LATENCY = Histogram(
+        'structuring_stage_latency_seconds',
+        'Latency of each structuring stage',
+        ['stage', 'class_name', 'name'],
+        buckets=BUCKETS,
+    )
+    RESULT_CACHE_REQUESTS = Counter(
+        'structuring_result_cache_requests_total',
+        'Result cache lookups',
+        ['result'],
+    )
+    RESULT_CACHE_SIZE = Gauge(
+        'structuring_result_cache_size',
+        'Number of cached structuring results',
+        ['backend'],
+        # 每个 worker 有各自的缓存，多进程模式下导出所有存活 worker 的总和
+        multiprocess_mode='livesum',
+    )
+    ADMISSION_REJECTED = Counter(
+        'structuring_admission_rejected_total',
+        'Requests rejected because queued work exceeds the budget',
+    )
+    FUZZY_INDEX_CACHE_REQUESTS = Counter(
+        'structuring_fuzzy_index_cache_requests_total',
+        'BK-tree search_one cache lookups',
+        ['tree', 'result'],
+    )
+else:
+    STAGE_LATENCY = None
+    RESULT_CACHE_REQUESTS = None
+    RESULT_CACHE_SIZE = None
+    ADMISSION_REJECTED = None
+    FUZZY_INDEX_CACHE_REQUESTS = None
+
+
+def observe(stage: str, seconds: float, name: str = '', class_name: str = None):
+    """
+    :param class_name: 为 None 时使用当前请求上下文中的 class_name
+    """
+    if STAGE_LATENCY is None:
+        return
+
+    if class_name is None:
+        class_name = get_request_context().class_name
+    STAGE_LATENCY.labels(stage, class_name or '', name or '').observe(seconds)
+
+
+@contextlib.contextmanager
+def stage_timer(stage: str, name: str = '', class_name: str = None):
+    """
+    with stage_timer(STAGE_BG_SCALE):
+        ...
+    """
+    if STAGE_LATENCY is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start, name, class_name)
+
+
+def timed(stage: str, name_attr: str = None):
+    """
+    统计方法耗时的装饰器
+    :param name_attr: name 标签从 self 的这个属性中获取，例如 FGItem 的 item_name
+    """
+
+    def decorator(func):
+        if STAGE_LATENCY is None:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            name = getattr(self, name_attr, '') if name_attr else ''
+            with stage_timer(stage, name):
+                return func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count_result_cache(result: str):
+    """
+    :param result: hit 或者 miss
+    """
+    if RESULT_CACHE_REQUESTS is not None:
+        RESULT_CACHE_REQUESTS.labels(result).inc()
+
+
+def set_result_cache_size(backend: str, size: int):
+    """
+    :param backend: memory 或者 disk
+    """
+    if RESULT_CACHE_SIZE is not None:
+        RESULT_CACHE_SIZE.labels(backend).set(size)
+
+
+def count_admission_rejected():
+    if ADMISSION_REJECTED is not None:
+        ADMISSION_REJECTED.inc()
+
+
+def count_fuzzy_index_cache(tree: str, result: str):
+    """
+    :param tree: BK-TREE 的源文件名
+    :param result: hit 或者 miss
+    """
+    if FUZZY_INDEX_CACHE_REQUESTS is not None:
+        FUZZY_INDEX_CACHE_REQUESTS.labels(tree, result).inc()
+
+
+def multiprocess_dir() -> str:
+    """
+    :return: prometheus_client multiprocess 模式的目录，没有设置时为 None
+    """
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR') or os.environ.get('prometheus_multiproc_dir') or None
+
+
+def prepare_multiprocess_dir():
+    """
+    在父进程 fork worker 之前调用，清空上次运行留下的统计文件
+    """
+    path = multiprocess_dir()
+    if Histogram is None or path is None:
+        return
+    os.makedirs(path, exist_ok=True)
+    for file_path in glob.glob(os.path.join(path, '*.db')):
+        os.remove(file_path)
+
+
+def mark_worker_dead(pid: int):
+    """
+    worker 退出以后调用，livesum 类型的 Gauge 不再统计这个 worker
+    """
+    if Histogram is not None and multiprocess_dir() is not None:
+        multiprocess.mark_process_dead(pid)
+
+
+def multiprocess_registry(path: str = None):
+    """
+    :param path: 默认为 PROMETHEUS_MULTIPROC_DIR
+    :return: 汇总所有 worker 统计的 registry
+    """
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=path or multiprocess_dir())
+    return registry
+
+
+def start_multiprocess_http_server(port: int):
+    """
+    在父进程中以 HTTP 导出所有 worker 汇总后的统计
+    """
+    start_http_server(port, registry=multiprocess_registry())
@@ -0,0 +1,23 @@
+import os
+
+
+def get_available_cpu_count() -> int:
+    """
+    获取可用的CPU个数，如果使用了cgroup来控制cpu使用配额，从读取该值，否则使用系统提供的获取cpu
+    部署在docker中后，实际可用的CPU个数可能比机器的CPU个数少
+    :return:
+    """
+    # cgroup v1
+    if os.path.isfile('/sys/fs/cgroup/cpu/cpu.cfs_quota_us'):
+        cpu_quota = int(open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us').read().rstrip())
+        if cpu_quota != -1 and os.path.isfile('/sys/fs/cgroup/cpu/cpu.cfs_period_us'):
+            cpu_period = int(open('/sys/fs/cgroup/cpu/cpu.cfs_period_us').read().rstrip())
+            return max(1, int(cpu_quota / cpu_period))
+
+    # cgroup v2: 内容为 "$MAX $PERIOD"，不限制时 $MAX 为 max
+    if os.path.isfile('/sys/fs/cgroup/cpu.max'):
+        cpu_max = open('/sys/fs/cgroup/cpu.max').read().split()
+        if len(cpu_max) == 2 and cpu_max[0] != 'max':
+            return max(1, int(int(cpu_max[0]) / int(cpu_max[1])))
+
+    return os.cpu_count()
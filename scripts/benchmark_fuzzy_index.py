@@ -0,0 +1,105 @@
+"""
+对比 BK-TREE 与 n-gram 倒排索引的召回率和耗时
+
+查询词从词典中随机抽取，再随机做 0 ~ max_edits 次增删改。以 BK-TREE 的搜索结果为准，
+recall 为 n-gram 索引的结果覆盖 BK-TREE 结果的比例（两者都是精确搜索，应当为 1），
+search_one 一致率为两者 search_one 返回相同结果的比例（编辑距离和最长公共子序列都相同时，两者的顺序可能不同）
+
+.. code:: bash
+
+    PYTHONPATH=`pwd` python3 scripts/benchmark_fuzzy_index.py --trees medical_drug.txt medical_equi.txt
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+from tabulate import tabulate
+
+from ocr_structuring.core.utils.bk_tree import CURRENT_DIR, MEDICAL_DRUG, MEDICAL_EQUI, BEIJING_HOSPITAL_NAME
+from ocr_structuring.core.utils.bk_tree.loader import load_from_disk, ENGINE_BK_TREE, ENGINE_NGRAM
+
+
+def make_queries(words, num_queries, max_edits, seed):
+    rnd = random.Random(seed)
+    chars = list(set(''.join(words)))
+    queries = []
+    for word in rnd.sample(words, min(num_queries, len(words))):
+        query = list(word)
+        for _ in range(rnd.randint(0, max_edits)):
+            op = rnd.choice(['insert', 'delete', 'replace'])
+            pos = rnd.randint(0, len(query))
+            if op == 'insert':
+                query.insert(pos, rnd.choice(chars))
+            elif query and pos < len(query):
+                if op == 'delete':
+                    del query[pos]
+                else:
+                    query[pos] = rnd.choice(chars)
+        queries.append(''.join(query))
+    return queries
+
+
+def timeit(func, queries):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(func(query))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, latencies
+
+
+def benchmark(tree_name, search_dists, num_queries, max_edits, seed):
+    start = time.perf_counter()
+    bk_tree = load_from_disk(CURRENT_DIR, tree_name, engine=ENGINE_BK_TREE)
+    bk_load = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ngram = load_from_disk(CURRENT_DIR, tree_name, engine=ENGINE_NGRAM)
+    ngram_load = time.perf_counter() - start
+
+    queries = make_queries(ngram.words, num_queries, max_edits, seed)
+
+    rows = []
+    for search_dist in search_dists:
+        bk_results, bk_latencies = timeit(lambda q: bk_tree.search(q, search_dist), queries)
+        ngram_results, ngram_latencies = timeit(lambda q: ngram.search(q, search_dist), queries)
+
+        expected = sum(len(it) for it in bk_results)
+        found = sum(len({it['word'] for it in a} & {it['word'] for it in b})
+                    for a, b in zip(bk_results, ngram_results))
+
+        bk_one, _ = timeit(lambda q: bk_tree.search_one(q, search_dist, min_len=0), queries)
+        ngram_one, _ = timeit(lambda q: ngram.search_one(q, search_dist, min_len=0), queries)
+        same = sum(a == b for a, b in zip(bk_one, ngram_one))
+
+        for engine, latencies in [(ENGINE_BK_TREE, bk_latencies), (ENGINE_NGRAM, ngram_latencies)]:
+            rows.append([
+                tree_name, len(ngram), search_dist, engine,
+                '%.2f' % (bk_load if engine == ENGINE_BK_TREE else ngram_load),
+                '%.3f' % np.mean(latencies),
+                '%.3f' % np.percentile(latencies, 50),
+                '%.3f' % np.percentile(latencies, 99),
+                '%.4f' % (found / expected if expected else 1.0) if engine == ENGINE_NGRAM else '',
+                '%.4f' % (same / len(queries)) if engine == ENGINE_NGRAM else '',
+            ])
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trees', nargs='+', default=[MEDICAL_DRUG, MEDICAL_EQUI, BEIJING_HOSPITAL_NAME],
+                        help='bk_tree/data 中的文件名')
+    parser.add_argument('--search_dists', nargs='+', type=int, default=[2, 3, 4])
+    parser.add_argument('--num_queries', type=int, default=200)
+    parser.add_argument('--max_edits', type=int, default=3, help='查询词相对于原词最多的编辑次数')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rows = []
+    for tree_name in args.trees:
+        rows.extend(benchmark(tree_name, args.search_dists, args.num_queries, args.max_edits, args.seed))
+
+    print(tabulate(rows, headers=['tree', 'words', 'search_dist', 'engine', 'load(s)',
+                                  'mean(ms)', 'p50(ms)', 'p99(ms)', 'recall', 'search_one same']))
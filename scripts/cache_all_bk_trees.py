@@ -1,17 +1,65 @@
+"""
+离线生成所有 BK-TREE 的二进制树文件，每棵树在单独的进程中生成，写入时先写临时文件再 rename，
+和正在运行的服务或者其它构建进程同时写同一个目录也是安全的。
+
+制作镜像时可以在单独的一层中生成，并关闭服务在请求时生成树：
+
+.. code:: dockerfile
+
+    RUN PYTHONPATH=/app python3 scripts/cache_all_bk_trees.py --tree_dir /opt/bk_tree --check
+    ENV BK_TREE_DIR=/opt/bk_tree BK_TREE_BUILD_ON_MISS=0
+
+使用 n-gram 索引的词典（bk_tree.ENGINES）加载时不需要树文件，默认跳过，需要时通过 --trees 指定
+"""
+import argparse
 import os
+import sys
+import time
 from concurrent import futures
-from datetime import datetime
-from ocr_structuring.core.utils.bk_tree import CURRENT_DIR
-from ocr_structuring.core.utils.bk_tree.loader import load_from_disk, SOURCE_DIR_NAME
+
+from ocr_structuring.core.utils.bk_tree import CURRENT_DIR, ENGINES
+from ocr_structuring.core.utils.bk_tree.loader import SOURCE_DIR_NAME, ENGINE_BK_TREE, build_flat, load_flat
+
+
+def build(tree_name, tree_dir, force, check):
+    start = time.time()
+    flat_file_path = build_flat(CURRENT_DIR, tree_name, force=force, tree_dir=tree_dir)
+    if check:
+        # 确认生成的文件可以正常加载
+        load_flat(flat_file_path)
+    return flat_file_path, time.time() - start
+
 
 if __name__ == '__main__':
-    print('Start loading bk-trees')
-    start_time = datetime.now()
-    count = 0
-    pool = futures.ProcessPoolExecutor()
-    fs = []
-    for filename in os.listdir(os.path.join(CURRENT_DIR, SOURCE_DIR_NAME)):
-        fs.append(pool.submit(load_from_disk, CURRENT_DIR, filename, force=False))
-        count += 1
-    futures.wait(fs)
-    print(f'Complete loading bk-trees[{count}]: {(datetime.now() - start_time).total_seconds()}s')
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trees', nargs='+', default=None,
+                        help='bk_tree/data 中的文件名，默认为所有使用 BK-TREE 的词典')
+    parser.add_argument('--tree_dir', default=None, help='树文件的输出目录，默认为 bk_tree/.tree')
+    parser.add_argument('--processes', type=int, default=None, help='进程个数，默认为 CPU 个数')
+    parser.add_argument('--force', action='store_true', help='树文件已经存在时也重新生成')
+    parser.add_argument('--check', action='store_true', help='生成以后加载一遍，确认文件可用')
+    args = parser.parse_args()
+
+    tree_names = args.trees
+    if tree_names is None:
+        tree_names = sorted(it for it in os.listdir(os.path.join(CURRENT_DIR, SOURCE_DIR_NAME))
+                            if it.endswith('.txt') and ENGINES.get(it, ENGINE_BK_TREE) == ENGINE_BK_TREE)
+
+    print('Start building bk-trees[%d]' % len(tree_names))
+    start_time = time.time()
+    failed = []
+    with futures.ProcessPoolExecutor(args.processes) as pool:
+        fs = {pool.submit(build, name, args.tree_dir, args.force, args.check): name for name in tree_names}
+        for f in futures.as_completed(fs):
+            name = fs[f]
+            try:
+                flat_file_path, elapsed = f.result()
+                print('%s -> %s: %.2fs' % (name, flat_file_path, elapsed))
+            except Exception as e:
+                failed.append(name)
+                print('%s failed: %r' % (name, e), file=sys.stderr)
+
+    print('Complete building bk-trees[%d]: %.2fs' % (len(tree_names) - len(failed), time.time() - start_time))
+    if failed:
+        print('Failed bk-trees: %s' % ', '.join(failed), file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,44 @@
+"""
+预先编译所有模板并写入缓存，同时构造一遍解析器和 TemplateMatcher，配置错误在这里就会报错，见 core/template/plan.py
+
+.. code:: bash
+
+    PYTHONPATH=`pwd` python3 scripts/compile_templates.py --plan_dir /opt/template_plan
+"""
+import argparse
+import sys
+import time
+import traceback
+
+from ocr_structuring.core.template import plan
+from ocr_structuring.core.template.main import CONFIG_DIR, import_parsers
+from ocr_structuring.core.template.matcher import TemplateMatcher
+from ocr_structuring.core.template.parser_base import ParseBase
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--class_names', nargs='+', default=None, help='模板名称，默认为所有模板')
+    parser.add_argument('--plan_dir', default=None, help='缓存目录，默认为 template/.plan，与 TEMPLATE_PLAN_DIR 一致')
+    args = parser.parse_args()
+
+    import_parsers()
+    class_names = args.class_names or sorted(ParseBase.subclasses.keys())
+
+    failed = []
+    for class_name in class_names:
+        start = time.time()
+        try:
+            parse_class = ParseBase.subclasses[class_name]
+            template_plan = plan.load_plan(class_name, parse_class, CONFIG_DIR, args.plan_dir)
+            # 构造时会检查 pre/post func 等配置
+            parse_class(class_name, template_plan.conf)
+            TemplateMatcher(template_plan.conf)
+            print('%s: %.2fs' % (class_name, time.time() - start))
+        except Exception:
+            failed.append(class_name)
+            print('%s failed:' % class_name, file=sys.stderr)
+            traceback.print_exc()
+
+    if failed:
+        print('Failed templates: %s' % ', '.join(failed), file=sys.stderr)
+        sys.exit(1)